@@ -0,0 +1,77 @@
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from peewee import SqliteDatabase
+
+from pwizard.generate import Generator
+from pwizard.generate.introspect import BulkIntrospector
+
+
+def generate(tables: int, fanout: int, cycles: float, seed: int) -> SqliteDatabase:
+    """
+    creates a database of tables each referencing up to fanout earlier
+    tables, one of which is always the previous table so that the chain
+    of references is as deep as the schema, with the given fraction of
+    tables also referencing a later table to form cycles
+    """
+    rng = random.Random(seed)
+    database = SqliteDatabase(":memory:")
+    with database.atomic():
+        for n in range(tables):
+            dests = {n - 1} if n > 0 else set()
+            dests.update(
+                rng.randrange(n) for _ in range(rng.randint(0, fanout - 1)) if n
+            )
+            if n < tables - 1 and rng.random() < cycles:
+                dests.add(rng.randrange(n + 1, tables))
+            columns = ["id INTEGER PRIMARY KEY"]
+            columns.extend(
+                f"t{dest}_id INTEGER REFERENCES t{dest}(id)" for dest in sorted(dests)
+            )
+            database.execute_sql(f"CREATE TABLE t{n} ({', '.join(columns)})")
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="times model generation on a synthetic foreign key graph"
+    )
+    parser.add_argument("--tables", type=int, default=10000)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument(
+        "--cycles",
+        type=float,
+        default=0.01,
+        help="fraction of tables with a reference forming a cycle",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    database = generate(args.tables, args.fanout, args.cycles, args.seed)
+    print(f"{args.tables} tables created in {time.perf_counter() - start:.3f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = Generator(Path(tmp) / "models.py")
+
+        start = time.perf_counter()
+        introspector = BulkIntrospector.from_database(database)
+        metadata = introspector.introspect()
+        print(f"introspect: {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        order, deferred = generator._order_tables(metadata)
+        print(f"order:      {time.perf_counter() - start:.3f}s")
+        references = sum(len(fks) for fks in metadata.foreign_keys.values())
+        print(f"{references} foreign keys, {len(deferred)} deferred")
+
+        start = time.perf_counter()
+        generator.generate(database)
+        print(f"generate:   {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
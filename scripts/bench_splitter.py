@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+from pathlib import Path
+
+from pwizard.migrate.scanner import ScanningSplitter
+from pwizard.migrate.splitter import Splitter, SqlparseSplitter
+
+STATEMENTS = [
+    "CREATE TABLE t{n} (id INTEGER PRIMARY KEY, name TEXT DEFAULT 'a;b');",
+    "INSERT INTO t{n} (id, name) VALUES ({n}, 'it''s row {n}'); -- note",
+    '/* block; comment */ UPDATE t{n} SET name = "x" WHERE id = {n};',
+    "CREATE TRIGGER tr{n} AFTER INSERT ON t{n} BEGIN\n"
+    "    UPDATE t{n} SET name = 'y';\nEND;",
+    "CREATE FUNCTION f{n}() RETURNS TEXT AS $$ SELECT ';'; $$ LANGUAGE sql;",
+]
+
+
+def generate(size: int, seed: int) -> str:
+    "generates roughly size characters of SQL"
+    rng = random.Random(seed)
+    parts: list[str] = []
+    total = 0
+    n = 0
+    while total < size:
+        statement = rng.choice(STATEMENTS).format(n=n)
+        parts.append(statement)
+        total += len(statement) + 1
+        n += 1
+    return "\n".join(parts)
+
+
+def chunks(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def bench(splitter: Splitter, text: str, chunk_size: int) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    statements = list(splitter.split(chunks(text, chunk_size)))
+    return time.perf_counter() - start, statements
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compares the speed of the statement splitters"
+    )
+    parser.add_argument("files", nargs="*", type=Path, help="SQL files to split")
+    parser.add_argument(
+        "--size", type=int, default=1 << 20, help="size of generated SQL"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1 << 16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.files:
+        text = "\n".join(path.read_text() for path in args.files)
+    else:
+        text = generate(args.size, args.seed)
+
+    baseline, expected = bench(SqlparseSplitter(), text, args.chunk_size)
+    elapsed, statements = bench(ScanningSplitter(), text, args.chunk_size)
+    if statements != expected:
+        raise SystemExit("scanning splitter output differs from sqlparse")
+
+    print(f"{len(text)} characters, {len(expected)} statements")
+    print(f"sqlparse: {baseline:.3f}s")
+    print(f"scan:     {elapsed:.3f}s ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
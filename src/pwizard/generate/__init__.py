@@ -1,4 +1,5 @@
 import configparser
+import heapq
 import os
 import re
 import typing as t
@@ -10,6 +11,14 @@ import jinja2
 import peewee
 from playhouse.reflection import DatabaseMetadata, Introspector
 
+from pwizard import __version__
+from pwizard.generate.filters import TableFilter
+from pwizard.generate.fingerprint import (
+    FINGERPRINT_PREFIX,
+    read_fingerprint,
+    schema_fingerprint,
+)
+from pwizard.generate.introspect import BulkIntrospector
 from pwizard.generate.types import Column, DatabaseType, Index, Table
 from pwizard.utils.split import split_relist
 
@@ -40,6 +49,7 @@ class Generator:
         self.snake_case = snake_case
         self.include_tables = include_tables
         self.exclude_tables = exclude_tables
+        self.table_filter = TableFilter(include_tables, exclude_tables)
         self.custom_column_types = (
             {} if custom_column_types is None else dict(custom_column_types)
         )
@@ -78,7 +88,13 @@ class Generator:
 
         return cls(**kwargs)
 
-    def generate(self, database: peewee.Database):
+    def generate(self, database: peewee.Database, force: bool = False) -> bool:
+        """
+        generates the models of the database, unless the output was already
+        generated from the same schema, template and options, which is
+        checked with the fingerprint on its first line. Returns whether the
+        output was written
+        """
         driver = self.driver
         if driver is None:
             if isinstance(database, peewee.PostgresqlDatabase):
@@ -90,16 +106,36 @@ class Generator:
             else:
                 driver = DatabaseType.Proxy
 
+        introspector = BulkIntrospector.from_database(database)
+        for colname, coltype in self.custom_column_types.items():
+            introspector.metadata.column_map[colname] = coltype
+
+        # skip the work if nothing the output depends on has changed
+        fingerprint = schema_fingerprint(
+            introspector,
+            self.template_path.read_bytes(),
+            self._fingerprint_options(driver),
+        )
+        if not force and read_fingerprint(self.output_path) == fingerprint:
+            return False
+
         # create the template
         loader = jinja2.FileSystemLoader(self.template_path.parent)
         jinja = jinja2.Environment(loader=loader)
         template = jinja.get_template(self.template_path.name)
 
         # get the data for the template from the database
-        introspector = Introspector.from_database(database)
-        for colname, coltype in self.custom_column_types.items():
-            introspector.metadata.column_map[colname] = coltype
+        # the filters are applied before introspection, so that only the
+        # selected tables and those they reference are reflected
+        table_names = None
+        if self.table_filter:
+            table_names = [
+                table
+                for table in introspector.get_table_names(self.include_views)
+                if not self.table_filter.skip(table)
+            ]
         metadata = introspector.introspect(
+            table_names=table_names,
             include_views=self.include_views,
             snake_case=self.snake_case,
         )
@@ -107,8 +143,27 @@ class Generator:
 
         # generate the output
         with open(self.output_path, "w") as f:
+            f.write(f"{FINGERPRINT_PREFIX}{fingerprint}\n")
             for s in template.generate(**data):
                 f.write(s)
+        return True
+
+    def _fingerprint_options(self, driver: DatabaseType) -> dict[str, t.Any]:
+        def pattern(p: str | re.Pattern) -> str:
+            return f"/{p.pattern}/" if isinstance(p, re.Pattern) else p
+
+        return {
+            "version": __version__,
+            "driver": driver.value,
+            "include_views": self.include_views,
+            "snake_case": self.snake_case,
+            "include_tables": [pattern(p) for p in self.include_tables],
+            "exclude_tables": [pattern(p) for p in self.exclude_tables],
+            "custom_column_types": {
+                name: f"{field.__module__}.{field.__qualname__}"
+                for name, field in self.custom_column_types.items()
+            },
+        }
 
     def _get_template_data(
         self,
@@ -122,11 +177,12 @@ class Generator:
             imports["peewee"].add("Database")
             imports["playhouse.db_url"].add("connect")
         tables: dict[str, Table] = {}
-        for table in sorted(metadata.model_names.keys()):
+        order, deferred = self._order_tables(metadata)
+        for table in order:
             self._parse_table(
                 table,
+                deferred,
                 tables,
-                [],
                 imports,
                 introspector,
                 metadata,
@@ -138,48 +194,80 @@ class Generator:
             "tables": tables,
         }
 
+    def _order_tables(
+        self, metadata: DatabaseMetadata
+    ) -> tuple[list[str], set[tuple[str, str]]]:
+        """
+        orders the tables which are not skipped so that each comes after
+        the tables its foreign keys reference, with Kahn's algorithm, taking
+        them in name order where there is a choice. Reference cycles are
+        broken first, within each strongly connected component of the
+        references, by deferring one foreign key for each cycle found by a
+        depth first search of it. The deferred foreign keys are returned as
+        (table, column) pairs
+        """
+        tables = sorted(
+            table for table in metadata.model_names if not self.table_filter.skip(table)
+        )
+        included = set(tables)
+        dependencies: dict[str, set[str]] = {}
+        dependents: defaultdict[str, list[str]] = defaultdict(list)
+        for table in tables:
+            dests = set()
+            for foreign_key in metadata.foreign_keys[table]:
+                dest = foreign_key.dest_table
+                if dest == table:
+                    continue
+                if dest not in included:
+                    raise RuntimeError(
+                        f"cannot exclude table '{dest}' as it is required "
+                        "by a foreign key relation"
+                    )
+                dests.add(dest)
+            dependencies[table] = dests
+            for dest in dests:
+                dependents[dest].append(table)
+
+        # tables mostly reference tables created before them, which the
+        # natural order of their names approximates, so each cycle is
+        # searched for from its last table, following the references to
+        # the latest tables first. A cycle is then usually closed by the
+        # one reference to a later table, and only that is deferred
+        deferred: set[tuple[str, str]] = set()
+        for component in _strongly_connected_components(tables, dependencies):
+            if len(component) == 1:
+                continue
+            for table, dest in _back_edges(component, dependencies):
+                dependencies[table].discard(dest)
+                for foreign_key in metadata.foreign_keys[table]:
+                    if foreign_key.dest_table == dest:
+                        deferred.add((table, foreign_key.column))
+
+        # the number of dependencies of each table which are not yet ordered
+        waiting = {table: len(dests) for table, dests in dependencies.items()}
+        ready = [table for table in tables if waiting[table] == 0]
+        order: list[str] = []
+        while ready:
+            table = heapq.heappop(ready)
+            order.append(table)
+            for dependent in dependents[table]:
+                if table not in dependencies[dependent]:
+                    continue
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+
+        return order, deferred
+
     def _parse_table(
         self,
         table: str,
+        deferred: set[tuple[str, str]],
         tables: dict[str, Table],
-        accum: list[str],
         imports: defaultdict[str, set[str]],
         introspector: Introspector,
         metadata: DatabaseMetadata,
     ):
-        if table in tables:
-            # already parsed
-            return
-
-        if self._skip_table(table):
-            # check if trying to skip a table which is a foreign key relation
-            if len(accum) > 0:
-                raise RuntimeError(
-                    "cannot exclude table '"
-                    + table
-                    + "' as it is required by a foreign key relation"
-                )
-
-            # exclude from output
-            return
-
-        # ensure all tables to foreign keys have been parsed
-        for foreign_key in metadata.foreign_keys[table]:
-            dest = foreign_key.dest_table
-            # prevent reference cycles
-            if dest in accum and table not in accum:
-                raise RuntimeError("reference cycle: " + dest)
-            if dest not in tables and dest not in accum:
-                if dest != table:
-                    self._parse_table(
-                        dest,
-                        tables,
-                        accum + [table],
-                        imports,
-                        introspector,
-                        metadata,
-                    )
-
         primary_keys = metadata.primary_keys[table]
         if len(primary_keys) > 1:
             imports["peewee"].add("CompositeKey")
@@ -196,14 +284,19 @@ class Generator:
 
             if col.primary_key and len(primary_keys) > 1:
                 col.primary_key = False
+            field_class = col.field_class
             field_params = {}
             for key, value in col.get_field_parameters().items():
                 if isclass(value) and issubclass(value, peewee.Field):
                     value = value.__name__
                 field_params[key] = value
+            if (table, name) in deferred:
+                # the referenced model is defined later, so it is named
+                field_class = peewee.DeferredForeignKey
+                field_params["rel_model_name"] = f"'{field_params.pop('model')}'"
             column = Column(
                 col.name,
-                col.field_class,
+                field_class,
                 field_params,
             )
             columns.append(column)
@@ -233,28 +326,94 @@ class Generator:
 
         tables[metadata.model_names[table]] = table_model
 
-    def _skip_table(self, table: str) -> bool:
-        # return True if it is not in the list of
-        # included tables
-        if len(self.include_tables) > 0:
-            for pat in self.include_tables:
-                if isinstance(pat, re.Pattern):
-                    if pat.match(table):
-                        break
-                else:
-                    if pat == table:
-                        break
 
+def _strongly_connected_components(
+    nodes: t.Iterable[str], edges: t.Mapping[str, t.Collection[str]]
+) -> list[set[str]]:
+    """
+    returns the strongly connected components of a graph with Tarjan's
+    algorithm, iteratively so that long chains do not hit the recursion
+    limit
+    """
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    components: list[set[str]] = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(sorted(edges[root])))]
+        while work:
+            node, dests = work[-1]
+            for dest in dests:
+                if dest not in index:
+                    index[dest] = lowlink[dest] = len(index)
+                    stack.append(dest)
+                    on_stack.add(dest)
+                    work.append((dest, iter(sorted(edges[dest]))))
+                    break
+                if dest in on_stack:
+                    lowlink[node] = min(lowlink[node], index[dest])
             else:
-                return True
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def _back_edges(
+    component: set[str], edges: t.Mapping[str, t.Collection[str]]
+) -> list[tuple[str, str]]:
+    """
+    returns the edges of a strongly connected component which lead back
+    to a node on the path of a depth first search of it. Each closes a
+    cycle with the path, and the component has no cycles without them
+    """
+    visited: set[str] = set()
+    path: set[str] = set()
+    back: list[tuple[str, str]] = []
+
+    def successors(node: str) -> t.Iterator[str]:
+        return iter(
+            sorted(component.intersection(edges[node]), key=_natural_key, reverse=True)
+        )
 
-        # return True if it is in the list of excluded tables
-        for pat in self.exclude_tables:
-            if isinstance(pat, re.Pattern):
-                if pat.match(table):
-                    return True
+    for root in sorted(component, key=_natural_key, reverse=True):
+        if root in visited:
+            continue
+        visited.add(root)
+        path.add(root)
+        work = [(root, successors(root))]
+        while work:
+            node, dests = work[-1]
+            for dest in dests:
+                if dest in path:
+                    back.append((node, dest))
+                elif dest not in visited:
+                    visited.add(dest)
+                    path.add(dest)
+                    work.append((dest, successors(dest)))
+                    break
             else:
-                if pat == table:
-                    return True
+                work.pop()
+                path.discard(node)
+    return back
+
 
-        return False
+def _natural_key(name: str) -> list[str | int]:
+    "sorts names with the numbers in them compared by value, so t9 is before t10"
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
@@ -1,13 +1,26 @@
+import os
 from pathlib import Path
 
 import click
 from playhouse.db_url import connect
 
 from pwizard.generate import Generator
+from pwizard.generate.introspect import BulkIntrospector
 from pwizard.utils.catch import catch_exception
 
 
 @click.command("generate")
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Regenerate the models even if the schema, template and options are unchanged",
+)
+@click.option(
+    "--explain",
+    is_flag=True,
+    help="Print the filter rule which includes or skips each table instead of generating",
+)
 @click.argument(
     "config_file",
     type=click.Path(
@@ -21,7 +34,14 @@ from pwizard.utils.catch import catch_exception
     type=str,
 )
 @catch_exception(Exception)
-def generate_cmd(config_file: Path, db_url: str):
+def generate_cmd(config_file: Path, db_url: str, force: bool, explain: bool):
     generator = Generator.from_config(config_file)
     with connect(db_url) as database:
-        generator.generate(database)
+        if explain:
+            introspector = BulkIntrospector.from_database(database)
+            for table in introspector.get_table_names(generator.include_views):
+                decision = generator.table_filter.decide(table)
+                click.echo(f"{table}: {decision}")
+            return
+        if not generator.generate(database, force=force):
+            click.echo(f"{os.fsdecode(generator.output_path)} is up to date")
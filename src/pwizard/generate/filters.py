@@ -0,0 +1,126 @@
+import re
+import typing as t
+from dataclasses import dataclass
+
+Pattern = str | re.Pattern
+
+# a pattern referring back to one of its own groups cannot be joined with
+# others, as the numbers of the groups would shift, and neither can one
+# naming its groups, as another pattern may use the same names
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+class PatternSet:
+    """
+    A list of table names and regular expressions compiled for matching
+    many tables: the names are kept in a frozenset, and the expressions
+    are joined into one alternation, so that a table is checked against
+    all of them at once. Expressions which cannot be joined, as they have
+    flags of their own, named groups or back references, are checked one
+    at a time
+    """
+
+    def __init__(self, patterns: t.Iterable[Pattern]):
+        self.patterns = list(patterns)
+        self.literals = frozenset(p for p in self.patterns if isinstance(p, str))
+        self.regexes = [p for p in self.patterns if isinstance(p, re.Pattern)]
+
+        default_flags = re.compile("").flags
+        joined: list[re.Pattern] = []
+        self.separate: list[re.Pattern] = []
+        for regex in self.regexes:
+            if (
+                isinstance(regex.pattern, str)
+                and regex.flags == default_flags
+                and not regex.groupindex
+                and not _BACKREFERENCE.search(regex.pattern)
+            ):
+                joined.append(regex)
+            else:
+                self.separate.append(regex)
+        self.combined = (
+            re.compile("|".join(f"(?:{regex.pattern})" for regex in joined))
+            if joined
+            else None
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def matches(self, table: str) -> bool:
+        "returns whether any of the patterns matches the table"
+        if table in self.literals:
+            return True
+        if self.combined is not None and self.combined.match(table):
+            return True
+        return any(regex.match(table) for regex in self.separate)
+
+    def rule(self, table: str) -> Pattern | None:
+        "returns the first pattern which matches the table, if any"
+        if not self.matches(table):
+            return None
+        for pattern in self.patterns:
+            if isinstance(pattern, str):
+                if pattern == table:
+                    return pattern
+            elif pattern.match(table):
+                return pattern
+        return None
+
+
+@dataclass(frozen=True)
+class Decision:
+    "whether a table is skipped by a filter, and the rule which decided it"
+
+    table: str
+    skipped: bool
+    option: str | None = None
+    rule: Pattern | None = None
+
+    def __str__(self) -> str:
+        rule = None
+        if isinstance(self.rule, re.Pattern):
+            rule = f"/{self.rule.pattern}/"
+        elif self.rule is not None:
+            rule = self.rule
+        if self.option is None:
+            return "included as no filters are set"
+        if self.option == "exclude_tables":
+            return f"excluded by {rule} in exclude_tables"
+        if rule is None:
+            return "skipped as it matches nothing in include_tables"
+        return f"included by {rule} in include_tables"
+
+
+class TableFilter:
+    """
+    The include_tables and exclude_tables of a generator compiled for
+    matching. A table is skipped when include_tables is set and none of
+    its patterns match, or when any pattern of exclude_tables matches
+    """
+
+    def __init__(
+        self,
+        include_tables: t.Iterable[Pattern] = (),
+        exclude_tables: t.Iterable[Pattern] = (),
+    ):
+        self.include = PatternSet(include_tables)
+        self.exclude = PatternSet(exclude_tables)
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def skip(self, table: str) -> bool:
+        "returns whether the table is left out of the generated output"
+        if self.include and not self.include.matches(table):
+            return True
+        return self.exclude.matches(table)
+
+    def decide(self, table: str) -> Decision:
+        "returns whether the table is skipped along with the rule deciding it"
+        if (rule := self.exclude.rule(table)) is not None:
+            return Decision(table, True, "exclude_tables", rule)
+        if self.include:
+            rule = self.include.rule(table)
+            return Decision(table, rule is None, "include_tables", rule)
+        return Decision(table, False)
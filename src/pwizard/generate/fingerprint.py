@@ -0,0 +1,42 @@
+import hashlib
+import json
+import typing as t
+
+from pwizard.generate.introspect import BulkIntrospector
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+# the first line of a generated file, which records what it was generated from
+FINGERPRINT_PREFIX = "# pwizard fingerprint: "
+
+
+def schema_fingerprint(
+    introspector: BulkIntrospector,
+    template: bytes,
+    options: t.Mapping[str, t.Any],
+) -> str:
+    """
+    returns a digest of the definitions in the catalog of the schema, the
+    source of the template and the options of the generator, which are
+    everything the generated file depends on
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(options, sort_keys=True, default=str).encode() + b"\n")
+    h.update(hashlib.sha256(template).digest())
+    schema = introspector.schema or introspector.metadata.default_schema
+    for row in introspector.metadata.catalog(schema):
+        h.update(json.dumps(row, default=str).encode() + b"\n")
+    return h.hexdigest()
+
+
+def read_fingerprint(path: "StrOrBytesPath") -> str | None:
+    "returns the fingerprint recorded in a generated file, if there is one"
+    try:
+        with open(path, encoding="utf-8") as f:
+            line = f.readline()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+    if not line.startswith(FINGERPRINT_PREFIX):
+        return None
+    return line[len(FINGERPRINT_PREFIX) :].strip()
@@ -0,0 +1,676 @@
+import abc
+import re
+import typing as t
+from collections import OrderedDict, defaultdict
+
+import peewee
+from playhouse import reflection
+from playhouse.reflection import DatabaseMetadata, Introspector, UnknownField
+
+# playhouse's column, which type checkers mistake for peewee's as the
+# module star imports peewee
+Column: t.Any = reflection.Column
+
+# the field classes of the data types reported by the information schema
+# of MySQL, matching those playhouse maps from the type codes of the driver
+MYSQL_DATA_TYPES: dict[str, type[peewee.Field]] = {
+    "tinyint": peewee.IntegerField,
+    "smallint": peewee.IntegerField,
+    "mediumint": peewee.IntegerField,
+    "int": peewee.IntegerField,
+    "bigint": peewee.BigIntegerField,
+    "decimal": peewee.DecimalField,
+    "float": peewee.FloatField,
+    "double": peewee.FloatField,
+    "char": peewee.CharField,
+    "varchar": peewee.CharField,
+    "binary": peewee.CharField,
+    "varbinary": peewee.CharField,
+    "enum": peewee.CharField,
+    "set": peewee.CharField,
+    "tinytext": peewee.TextField,
+    "text": peewee.TextField,
+    "mediumtext": peewee.TextField,
+    "longtext": peewee.TextField,
+    "tinyblob": peewee.TextField,
+    "blob": peewee.TextField,
+    "mediumblob": peewee.TextField,
+    "longblob": peewee.TextField,
+    "date": peewee.DateField,
+    "datetime": peewee.DateTimeField,
+    "timestamp": peewee.DateTimeField,
+    "time": peewee.TimeField,
+}
+
+# the field class of each column, and any extra parameters of the field
+ColumnTypes = dict[str, tuple[type, dict[str, t.Any] | None]]
+
+
+class BulkMetadata(reflection.Metadata, abc.ABC):
+    """
+    Reads each category of the catalog (columns, primary keys, foreign keys
+    and indexes) for all the tables of a schema with a single query, where
+    playhouse queries the catalog once per table and category. Each query
+    may be restricted to some of the tables, by default it reads them all
+    """
+
+    default_schema: str | None = None
+
+    @abc.abstractmethod
+    def all_columns(
+        self, schema: str | None, tables: t.Collection[str] | None = None
+    ) -> dict[str, list[peewee.ColumnMetadata]]:
+        "returns the columns of the tables and views, in their order"
+        ...
+
+    @abc.abstractmethod
+    def all_column_types(
+        self, schema: str | None, tables: t.Collection[str] | None = None
+    ) -> dict[str, ColumnTypes]:
+        "returns the field classes of the columns of the tables and views"
+        ...
+
+    @abc.abstractmethod
+    def all_primary_keys(
+        self, schema: str | None, tables: t.Collection[str] | None = None
+    ) -> dict[str, list[str]]:
+        "returns the primary key columns of the tables"
+        ...
+
+    @abc.abstractmethod
+    def all_foreign_keys(
+        self, schema: str | None, tables: t.Collection[str] | None = None
+    ) -> dict[str, list[peewee.ForeignKeyMetadata]]:
+        "returns the foreign keys of the tables"
+        ...
+
+    @abc.abstractmethod
+    def all_indexes(
+        self, schema: str | None, tables: t.Collection[str] | None = None
+    ) -> dict[str, list[peewee.IndexMetadata]]:
+        "returns the indexes of the tables"
+        ...
+
+    @abc.abstractmethod
+    def catalog(self, schema: str | None) -> t.Iterator[tuple]:
+        """
+        yields rows describing the definitions of the tables, views and
+        indexes of the schema in a stable order, which change whenever
+        any definition does
+        """
+        ...
+
+    def build_columns(
+        self,
+        column_data: list[peewee.ColumnMetadata],
+        column_types: ColumnTypes,
+        pk_names: list[str],
+    ) -> OrderedDict[str, t.Any]:
+        "builds the columns of a table as playhouse's get_columns does"
+        types = {name: field_class for name, (field_class, _) in column_types.items()}
+        if len(pk_names) == 1:
+            pk = pk_names[0]
+            if types.get(pk) is peewee.IntegerField:
+                types[pk] = peewee.AutoField
+            elif types.get(pk) is peewee.BigIntegerField:
+                types[pk] = peewee.BigAutoField
+
+        columns: OrderedDict[str, t.Any] = OrderedDict()
+        for data in column_data:
+            field_class = types.get(data.name, UnknownField)
+            columns[data.name] = Column(
+                data.name,
+                field_class=field_class,
+                raw_column_type=data.data_type,
+                nullable=data.null,
+                primary_key=data.name in pk_names,
+                column_name=data.name,
+                default=self._clean_default(field_class, data.default),
+                extra_parameters=column_types.get(data.name, (None, None))[1],
+            )
+        return columns
+
+    def _in_tables(
+        self, column: str, tables: t.Collection[str] | None
+    ) -> tuple[str, list[str]]:
+        # returns a condition restricting a query to the tables, if any, and
+        # the parameters of the condition
+        if tables is None:
+            return "", []
+        if not tables:
+            return " AND 0 = 1", []
+        placeholders = ", ".join([self.database.param] * len(tables))
+        return f" AND {column} IN ({placeholders})", list(tables)
+
+    def _group(self, rows: t.Iterable[tuple], make: t.Callable) -> dict[str, list]:
+        # groups rows whose first value is the table name, keeping the order
+        # of the rows within each table
+        grouped: defaultdict[str, list] = defaultdict(list)
+        for table, *values in rows:
+            grouped[table].append(make(table, *values))
+        return grouped
+
+
+class PostgresqlBulkMetadata(BulkMetadata, reflection.PostgresqlMetadata):
+    default_schema = "public"
+
+    def all_columns(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT table_name, column_name, is_nullable, data_type, column_default
+            FROM information_schema.columns
+            WHERE table_schema = %s{condition}
+            ORDER BY table_name, ordinal_position""",
+            schema,
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, name, null, dt, df: peewee.ColumnMetadata(
+                name, dt, null == "YES", False, table, df
+            ),
+        )
+
+    def all_column_types(self, schema, tables=None):
+        condition, params = self._in_tables("c.relname", tables)
+        extension_types = (
+            {
+                reflection.postgres_ext.ArrayField,
+                reflection.postgres_ext.BinaryJSONField,
+                reflection.postgres_ext.JSONField,
+                reflection.postgres_ext.TSVectorField,
+                reflection.postgres_ext.HStoreField,
+            }
+            if reflection.postgres_ext is not None
+            else set()
+        )
+        cursor = self.execute(
+            f"""
+            SELECT c.relname, a.attname, a.atttypid
+            FROM pg_catalog.pg_attribute AS a
+            INNER JOIN pg_catalog.pg_class AS c ON c.oid = a.attrelid
+            INNER JOIN pg_catalog.pg_namespace AS n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+                AND a.attnum > 0 AND NOT a.attisdropped{condition}""",
+            schema,
+            *params,
+        )
+        column_types: defaultdict[str, ColumnTypes] = defaultdict(dict)
+        for table, name, oid in cursor.fetchall():
+            field_class = self.column_map.get(oid, UnknownField)
+            if field_class in extension_types:
+                self.requires_extension = True
+            extra = None
+            if oid in self.array_types:
+                extra = {"field_class": self.array_types[oid]}
+            column_types[table][name] = (field_class, extra)
+        return column_types
+
+    def all_primary_keys(self, schema, tables=None):
+        condition, params = self._in_tables("kc.table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT kc.table_name, kc.column_name
+            FROM information_schema.table_constraints AS tc
+            INNER JOIN information_schema.key_column_usage AS kc ON (
+                tc.table_name = kc.table_name AND
+                tc.table_schema = kc.table_schema AND
+                tc.constraint_name = kc.constraint_name)
+            WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = %s{condition}
+            ORDER BY kc.table_name, kc.ordinal_position""",
+            schema,
+            *params,
+        )
+        return self._group(cursor.fetchall(), lambda table, name: name)
+
+    def all_foreign_keys(self, schema, tables=None):
+        condition, params = self._in_tables("tc.table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT DISTINCT
+                tc.table_name, kcu.column_name, ccu.table_name, ccu.column_name
+            FROM information_schema.table_constraints AS tc
+            JOIN information_schema.key_column_usage AS kcu
+                ON (tc.constraint_name = kcu.constraint_name AND
+                    tc.constraint_schema = kcu.constraint_schema AND
+                    tc.table_name = kcu.table_name AND
+                    tc.table_schema = kcu.table_schema)
+            JOIN information_schema.constraint_column_usage AS ccu
+                ON (ccu.constraint_name = tc.constraint_name AND
+                    ccu.constraint_schema = tc.constraint_schema)
+            WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_schema = %s{condition}""",
+            schema,
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, column, dest_table, dest_column: peewee.ForeignKeyMetadata(
+                column, dest_table, dest_column, table
+            ),
+        )
+
+    def all_indexes(self, schema, tables=None):
+        condition, params = self._in_tables("t.relname", tables)
+        cursor = self.execute(
+            f"""
+            SELECT
+                t.relname, i.relname, idxs.indexdef, idx.indisunique,
+                array_to_string(ARRAY(
+                    SELECT pg_get_indexdef(idx.indexrelid, k + 1, TRUE)
+                    FROM generate_subscripts(idx.indkey, 1) AS k
+                    ORDER BY k), ',')
+            FROM pg_catalog.pg_class AS t
+            INNER JOIN pg_catalog.pg_index AS idx ON t.oid = idx.indrelid
+            INNER JOIN pg_catalog.pg_class AS i ON idx.indexrelid = i.oid
+            INNER JOIN pg_catalog.pg_indexes AS idxs ON
+                (idxs.tablename = t.relname AND idxs.indexname = i.relname)
+            WHERE t.relkind = 'r' AND idxs.schemaname = %s{condition}
+            ORDER BY t.relname, idx.indisunique DESC, i.relname""",
+            schema,
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, name, sql, unique, columns: peewee.IndexMetadata(
+                name, sql.rstrip(" ;"), columns.split(","), unique, table
+            ),
+        )
+
+    def catalog(self, schema):
+        for query in (
+            """
+            SELECT c.relname, c.relkind, a.attnum, a.attname,
+                format_type(a.atttypid, a.atttypmod), a.attnotnull,
+                pg_get_expr(d.adbin, d.adrelid)
+            FROM pg_catalog.pg_attribute AS a
+            INNER JOIN pg_catalog.pg_class AS c ON c.oid = a.attrelid
+            INNER JOIN pg_catalog.pg_namespace AS n ON n.oid = c.relnamespace
+            LEFT JOIN pg_catalog.pg_attrdef AS d
+                ON (d.adrelid = a.attrelid AND d.adnum = a.attnum)
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+                AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY c.relname, a.attnum""",
+            """
+            SELECT c.relname, k.conname, pg_get_constraintdef(k.oid)
+            FROM pg_catalog.pg_constraint AS k
+            INNER JOIN pg_catalog.pg_class AS c ON c.oid = k.conrelid
+            INNER JOIN pg_catalog.pg_namespace AS n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            ORDER BY c.relname, k.conname""",
+            """
+            SELECT tablename, indexname, indexdef
+            FROM pg_catalog.pg_indexes
+            WHERE schemaname = %s
+            ORDER BY tablename, indexname""",
+        ):
+            yield from self.execute(query, schema).fetchall()
+
+
+class CockroachDBBulkMetadata(PostgresqlBulkMetadata, reflection.CockroachDBMetadata):
+    pass
+
+
+class MySQLBulkMetadata(BulkMetadata, reflection.MySQLMetadata):
+    def all_columns(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT table_name, column_name, is_nullable, data_type, column_default
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE(){condition}
+            ORDER BY table_name, ordinal_position""",
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, name, null, dt, df: peewee.ColumnMetadata(
+                name, dt, null == "YES", False, table, df
+            ),
+        )
+
+    def all_column_types(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        # the types are read from the information schema rather than from
+        # the description of a query on each table, as playhouse does
+        cursor = self.execute(
+            f"""
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE(){condition}""",
+            *params,
+        )
+        column_types: defaultdict[str, ColumnTypes] = defaultdict(dict)
+        for table, name, data_type in cursor.fetchall():
+            data_type = data_type.lower()
+            field_class = self.column_map.get(data_type)
+            if field_class is None:
+                field_class = MYSQL_DATA_TYPES.get(data_type, UnknownField)
+            column_types[table][name] = (field_class, None)
+        return column_types
+
+    def all_primary_keys(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT table_name, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND index_name = 'PRIMARY'{condition}
+            ORDER BY table_name, seq_in_index""",
+            *params,
+        )
+        return self._group(cursor.fetchall(), lambda table, name: name)
+
+    def all_foreign_keys(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT table_name, column_name, referenced_table_name, referenced_column_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE()
+                AND referenced_table_name IS NOT NULL
+                AND referenced_column_name IS NOT NULL{condition}""",
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, column, dest_table, dest_column: peewee.ForeignKeyMetadata(
+                column, dest_table, dest_column, table
+            ),
+        )
+
+    def all_indexes(self, schema, tables=None):
+        condition, params = self._in_tables("table_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT table_name, index_name, non_unique, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE(){condition}
+            ORDER BY table_name, index_name, seq_in_index""",
+            *params,
+        )
+        indexes: defaultdict[str, dict[str, peewee.IndexMetadata]] = defaultdict(dict)
+        for table, name, non_unique, column in cursor.fetchall():
+            if name not in indexes[table]:
+                indexes[table][name] = peewee.IndexMetadata(
+                    name, None, [], not int(non_unique), table
+                )
+            indexes[table][name].columns.append(column)
+        return {table: list(named.values()) for table, named in indexes.items()}
+
+    def catalog(self, schema):
+        for query in (
+            """
+            SELECT table_name, table_type
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name""",
+            """
+            SELECT table_name, ordinal_position, column_name, column_type,
+                is_nullable, column_default, extra
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, ordinal_position""",
+            """
+            SELECT table_name, index_name, seq_in_index, non_unique, column_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, index_name, seq_in_index""",
+            """
+            SELECT table_name, constraint_name, ordinal_position, column_name,
+                referenced_table_name, referenced_column_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE()
+            ORDER BY table_name, constraint_name, ordinal_position""",
+        ):
+            yield from self.execute(query).fetchall()
+
+
+class SqliteBulkMetadata(BulkMetadata, reflection.SqliteMetadata):
+    default_schema = "main"
+
+    # the columns, their types and the primary keys all come from
+    # table_info, which is read for all the tables and views at once
+    def _table_info(self, schema: str, tables: t.Collection[str] | None) -> list[tuple]:
+        condition, params = self._in_tables("m.name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT m.name, p.name, p.type, p."notnull", p.dflt_value, p.pk
+            FROM "{schema}".sqlite_master AS m
+            JOIN pragma_table_info(m.name, ?) AS p
+            WHERE m.type IN ('table', 'view'){condition}
+            ORDER BY m.name, p.cid""",
+            schema,
+            *params,
+        )
+        return cursor.fetchall()
+
+    def all_columns(self, schema, tables=None):
+        return self._group(
+            self._table_info(schema, tables),
+            lambda table, name, type, notnull, default, pk: peewee.ColumnMetadata(
+                name, type, not notnull, bool(pk), table, default
+            ),
+        )
+
+    def all_column_types(self, schema, tables=None):
+        column_types: defaultdict[str, ColumnTypes] = defaultdict(dict)
+        for table, name, type, *_ in self._table_info(schema, tables):
+            column_types[table][name] = (self._map_col(type), None)
+        return column_types
+
+    def all_primary_keys(self, schema, tables=None):
+        return self._group(
+            (row for row in self._table_info(schema, tables) if row[-1]),
+            lambda table, name, *_: name,
+        )
+
+    def all_foreign_keys(self, schema, tables=None):
+        condition, params = self._in_tables("m.name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT m.name, f."from", f."table", f."to"
+            FROM "{schema}".sqlite_master AS m
+            JOIN pragma_foreign_key_list(m.name, ?) AS f
+            WHERE m.type = 'table'{condition}""",
+            schema,
+            *params,
+        )
+        return self._group(
+            cursor.fetchall(),
+            lambda table, column, dest_table, dest_column: peewee.ForeignKeyMetadata(
+                column, dest_table, dest_column, table
+            ),
+        )
+
+    def all_indexes(self, schema, tables=None):
+        condition, params = self._in_tables("m.tbl_name", tables)
+        cursor = self.execute(
+            f"""
+            SELECT m.tbl_name, m.name, m.sql, l."unique", i.name
+            FROM "{schema}".sqlite_master AS m
+            JOIN pragma_index_list(m.tbl_name, ?) AS l ON l.name = m.name
+            JOIN pragma_index_info(m.name, ?) AS i
+            WHERE m.type = 'index'{condition}
+            ORDER BY m.tbl_name, m.name, i.seqno""",
+            schema,
+            schema,
+            *params,
+        )
+        indexes: defaultdict[str, dict[str, peewee.IndexMetadata]] = defaultdict(dict)
+        for table, name, sql, unique, column in cursor.fetchall():
+            if name not in indexes[table]:
+                indexes[table][name] = peewee.IndexMetadata(
+                    name, sql, [], int(unique) == 1, table
+                )
+            indexes[table][name].columns.append(column)
+        return {table: list(named.values()) for table, named in indexes.items()}
+
+    def catalog(self, schema):
+        # the statements creating each object are kept up to date by
+        # SQLite, and describe it entirely
+        cursor = self.execute(f"""
+            SELECT type, name, tbl_name, sql
+            FROM "{schema}".sqlite_master
+            ORDER BY type, name""")
+        yield from cursor.fetchall()
+
+
+class BulkIntrospector(Introspector):
+    """
+    An introspector which reads the catalog with one query per category
+    rather than one per table, and builds the same DatabaseMetadata as
+    playhouse's introspector
+    """
+
+    metadata: BulkMetadata
+
+    @classmethod
+    def from_database(cls, database: peewee.Database, schema: str | None = None):
+        if isinstance(database, peewee.Proxy):
+            if database.obj is None:
+                raise ValueError("cannot introspect an uninitialized proxy")
+            database = database.obj
+        metadata: BulkMetadata
+        if reflection.CockroachDatabase is not None and isinstance(
+            database, reflection.CockroachDatabase
+        ):
+            metadata = CockroachDBBulkMetadata(database)
+        elif isinstance(database, peewee.PostgresqlDatabase):
+            metadata = PostgresqlBulkMetadata(database)
+        elif isinstance(database, peewee.MySQLDatabase):
+            metadata = MySQLBulkMetadata(database)
+        elif isinstance(database, peewee.SqliteDatabase):
+            metadata = SqliteBulkMetadata(database)
+        else:
+            raise ValueError(f"cannot introspect {type(database).__name__} databases")
+        return cls(metadata, schema=schema)
+
+    def get_table_names(self, include_views: bool = False) -> list[str]:
+        "returns the names of the tables, and views if included, in the schema"
+        database = self.metadata.database
+        tables: list[str] = database.get_tables(schema=self.schema)
+        if include_views:
+            tables.extend(view.name for view in database.get_views(schema=self.schema))
+        return tables
+
+    def introspect(
+        self,
+        table_names: t.Collection[str] | None = None,
+        literal_column_names: bool = False,
+        include_views: bool = False,
+        snake_case: bool = True,
+    ) -> DatabaseMetadata:
+        """
+        reads the metadata of the tables, by default all of them. As with
+        playhouse, the tables referenced by the foreign keys of the given
+        table_names are reflected too, however many references away, even
+        if they were filtered out
+        """
+        schema = self.schema or self.metadata.default_schema
+        tables = self.get_table_names(include_views)
+
+        if table_names is None:
+            all_foreign_keys = self.metadata.all_foreign_keys(schema)
+        else:
+            # the tables referenced by the selected ones are added before
+            # anything else is read, so that their foreign keys resolve,
+            # following the references one level at a time
+            all_foreign_keys = {}
+            tables = [table for table in tables if table in table_names]
+            table_set = set(tables)
+            frontier = tables
+            while frontier:
+                found = self.metadata.all_foreign_keys(schema, frontier)
+                all_foreign_keys.update(found)
+                frontier = []
+                for table in found:
+                    for foreign_key in found[table]:
+                        if foreign_key.dest_table not in table_set:
+                            frontier.append(foreign_key.dest_table)
+                            table_set.add(foreign_key.dest_table)
+                tables = tables + frontier
+
+        # only the surviving tables are reflected
+        reflected = None if table_names is None else tables
+        all_columns = self.metadata.all_columns(schema, reflected)
+        all_column_types = self.metadata.all_column_types(schema, reflected)
+        all_primary_keys = self.metadata.all_primary_keys(schema, reflected)
+        all_indexes = self.metadata.all_indexes(schema, reflected)
+
+        columns: dict[str, OrderedDict[str, t.Any]] = {}
+        primary_keys: dict[str, list[str]] = {}
+        foreign_keys: dict[str, list[peewee.ForeignKeyMetadata]] = {}
+        model_names: dict[str, str] = {}
+        indexes: dict[str, list[peewee.IndexMetadata]] = {}
+
+        for table in tables:
+            primary_keys[table] = all_primary_keys.get(table, [])
+            foreign_keys[table] = all_foreign_keys.get(table, [])
+            indexes[table] = all_indexes.get(table, [])
+            table_columns = self.metadata.build_columns(
+                all_columns.get(table, []),
+                all_column_types.get(table, {}),
+                primary_keys[table],
+            )
+            model_names[table] = self.make_model_name(table, snake_case)
+
+            # name the fields as playhouse does, so that a column "parent"
+            # and a foreign key "parent_id" do not produce the same field
+            lower_col_names = {name.lower() for name in table_columns}
+            fks = {foreign_key.column for foreign_key in foreign_keys[table]}
+            for col_name, column in table_columns.items():
+                if literal_column_names:
+                    new_name = re.sub(r"[^\w]+", "_", col_name)
+                else:
+                    new_name = self.make_column_name(
+                        col_name, col_name in fks, snake_case
+                    )
+                lower_name = col_name.lower()
+                if lower_name.endswith("_id") and new_name in lower_col_names:
+                    new_name = lower_name
+                column.name = new_name
+
+            for index in indexes[table]:
+                if len(index.columns) == 1 and index.columns[0] in table_columns:
+                    table_columns[index.columns[0]].unique = index.unique
+                    table_columns[index.columns[0]].index = True
+
+            columns[table] = table_columns
+
+        # give a related name to all but the first of the foreign keys of a
+        # table which reference the same table
+        related_names: dict[t.Any, str] = {}
+        for table in tables:
+            referenced: set[str] = set()
+            for foreign_key in sorted(foreign_keys[table], key=lambda fk: fk.column):
+                column = columns[table].get(foreign_key.column)
+                if column is None:
+                    continue
+                if foreign_key.dest_table in referenced:
+                    related_names[column] = (
+                        f"{foreign_key.dest_table}_{column.name}_set"
+                    )
+                else:
+                    referenced.add(foreign_key.dest_table)
+
+        for table in tables:
+            for foreign_key in foreign_keys[table]:
+                src = columns[foreign_key.table][foreign_key.column]
+                dest = columns.get(foreign_key.dest_table, {}).get(
+                    foreign_key.dest_column
+                )
+                src.set_foreign_key(
+                    foreign_key=foreign_key,
+                    model_names=model_names,
+                    dest=dest,
+                    related_name=related_names.get(src),
+                )
+
+        return DatabaseMetadata(
+            columns,
+            primary_keys,
+            foreign_keys,
+            model_names,
+            indexes,
+        )
@@ -1,17 +1,55 @@
+import copy
+import os
+import time
 import typing as t
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from time import time_ns
+from time import perf_counter_ns, time_ns
 
 import peewee
 
+from pwizard import __version__
+from pwizard.migrate.checkpoint import (
+    BackfillCheckpoint,
+    Checkpoint,
+    ResumePoint,
+    checkpoint_key,
+    statement_hash,
+)
+from pwizard.migrate.digest import chain_digest, hash_migrations
 from pwizard.migrate.hooks import MigrationHooksBase
-from pwizard.migrate.internal import AppliedMigration
-from pwizard.migrate.migration import Migration
+from pwizard.migrate.internal import AppliedMigration, MigrationRecord
+from pwizard.migrate.lock import migration_lock
+from pwizard.migrate.manifest import Manifest
+from pwizard.migrate.migration import (
+    BackfillMigration,
+    Migration,
+    SQLMigration,
+    TransactionMode,
+)
+from pwizard.migrate.schemas import (
+    SchemaMigrationReport,
+    SchemaSwitcher,
+    batched,
+    quote_name,
+)
+from pwizard.migrate.squash import Baseline
+from pwizard.migrate.timeouts import (
+    is_lock_timeout,
+    jittered_delay,
+    session_timeouts,
+)
 from pwizard.migrate.warnings import (
     HashesDifferWarning,
     MigrationWarning,
     ParentDiffersWarning,
 )
+from pwizard.utils.hashing import hash_algorithm
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+_R = t.TypeVar("_R", bound=ResumePoint)
 
 
 class Migrator:
@@ -22,16 +60,56 @@ class Migrator:
         text_type: str = "TEXT",
         fix_warnings: bool = False,
         hooks: MigrationHooksBase | None = None,
+        hash_workers: int | None = None,
+        schema: str | None = None,
+        lock: bool = False,
+        lock_timeout: timedelta | None = None,
+        statement_timeout: timedelta | None = None,
+        lock_retries: int = 3,
+        retry_delay: timedelta = timedelta(seconds=1),
+        checkpoints: bool = True,
+        baseline: Baseline | None = None,
     ):
         self.migrations = list(migrations or [])
         self.table_name = table_name
         self.text_type = text_type
         self.fix_warnings = fix_warnings
         self.hooks = hooks if hooks is not None else MigrationHooksBase()
+        self.hash_workers = hash_workers
+        # the schema which holds the migrations table, if not the default
+        self.schema = schema
+        # take a lock so that concurrent processes migrate one at a time,
+        # which on sqlite requires that migrate is not called inside an
+        # existing transaction. On sqlite the lock is the chain transaction,
+        # so it only serialises runs whose migrations all use it: it is
+        # released while a migration with its own transaction, or none, is
+        # applied
+        self.lock = lock
+        # limits for each migration, unless the migration sets its own
+        self.lock_timeout = lock_timeout
+        self.statement_timeout = statement_timeout
+        # how many times a migration which timed out waiting for a lock is
+        # retried, after a random delay which doubles on each attempt
+        self.lock_retries = lock_retries
+        self.retry_delay = retry_delay
+        # record the last statement of SQL migrations whose statements
+        # are committed as they run, so that a failed one can be resumed
+        self.checkpoints = checkpoints
+        # applied to empty databases instead of the migrations it squashes
+        self.baseline = baseline
 
     def set_migrations(self, migrations: t.Iterable[Migration]):
         self.migrations = list(migrations)
 
+    def load_manifest(self, path: "StrOrBytesPath", **kwargs):
+        """
+        sets the migrations from a manifest, whose paths are relative to
+        the manifest. The keyword arguments are passed to file_migration
+        """
+        manifest = Manifest.load(path)
+        base_dir = os.path.dirname(os.fsdecode(path))
+        self.set_migrations(manifest.migrations(base_dir, **kwargs))
+
     def migrate(self, database: peewee.Database, transaction_type: str | None = None):
         self.hooks.on_begin_migrations(len(self.migrations))
 
@@ -41,29 +119,84 @@ class Migrator:
         parent: str | None = None
         start_time = time_ns()
 
+        # if the stored chain digest matches the local one then every
+        # migration has already been applied and there is nothing to do
+        if self._chain_applied(database):
+            elapsed = timedelta(seconds=(time_ns() - start_time) / 1e9)
+            self.hooks.on_finish_migrations(len(self.migrations), 0, 0, elapsed)
+            return
+
+        # sqlite takes its write lock when the transaction begins
+        if (
+            self.lock
+            and transaction_type is None
+            and isinstance(database, peewee.SqliteDatabase)
+        ):
+            transaction_type = "IMMEDIATE"
         if transaction_type is None:
             atomic_args = ()
         else:
             atomic_args = (transaction_type,)
-        with database.atomic(*atomic_args):
+
+        lock_start = perf_counter_ns()
+        if self.lock:
+            lock: t.ContextManager = migration_lock(
+                database, self._qualified(database, self.table_name)
+            )
+        else:
+            lock = nullcontext()
+        # migrations which need their own transaction, or none, commit the
+        # chain transaction so far and it is begun again after them. On
+        # sqlite the lock is the chain transaction itself, so it is not
+        # held while such a migration is applied
+        with lock, _ChainTransaction(database, atomic_args) as chain:
+            if self.lock:
+                waited = timedelta(microseconds=(perf_counter_ns() - lock_start) / 1e3)
+                self.hooks.on_lock_acquired(waited)
+
+                # another process may have applied the migrations while
+                # this one was waiting for the lock
+                if self._chain_applied(database):
+                    elapsed = timedelta(seconds=(time_ns() - start_time) / 1e9)
+                    self.hooks.on_finish_migrations(len(self.migrations), 0, 0, elapsed)
+                    return
+
             self._ensure_migrations_table(database)
+            applied_migrations = self._get_applied_migrations(database)
+            if self.baseline is not None and not applied_migrations:
+                applied_migrations = self._apply_baseline(database, self.baseline)
+            # pending migrations are hashed as they are read to be applied
+            hash_migrations(
+                [m for m in self.migrations if m.name() in applied_migrations],
+                self.hash_workers,
+            )
+            fixes: list[tuple[str | None, str, str]] = []
             for migration in self.migrations:
                 self.hooks.on_before_migration(migration)
+                migration_start = perf_counter_ns()
 
                 was_applied = False
                 warning: MigrationWarning | None = None
                 fixed = False
-                applied_migration = self._get_migration(database, migration)
+                applied_migration = applied_migrations.get(migration.name())
                 if applied_migration is None:
-                    self._apply_migration(database, migration, parent)
+                    mode = migration.transaction_mode()
+                    if mode is not TransactionMode.Chain:
+                        chain.commit()
+                    self._apply_attempts(database, migration, parent, mode, atomic_args)
+                    if mode is not TransactionMode.Chain:
+                        chain.begin()
                     was_applied = True
                 else:
                     warning, fixed = self._skip_migration(
-                        database,
                         migration,
                         parent,
                         applied_migration,
+                        fixes,
                     )
+                migration_elapsed = timedelta(
+                    microseconds=(perf_counter_ns() - migration_start) / 1e3
+                )
 
                 if was_applied:
                     applied += 1
@@ -78,35 +211,306 @@ class Migrator:
                     warning,
                     fixed,
                 )
+                self.hooks.on_migration_timed(
+                    migration,
+                    was_applied,
+                    migration_elapsed,
+                )
 
                 parent = migration.name()
 
+            self._fix_migrations(database, fixes)
+
+            # only record the digest if the migrations table is now
+            # consistent with the chain, otherwise the warnings would be
+            # hidden by the fast path on the next run
+            unfixed = warned - len(fixes)
+            self._set_chain_digest(
+                database, chain_digest(self.migrations) if unfixed == 0 else None
+            )
+
         elapsed = timedelta(seconds=(time_ns() - start_time) / 1e9)
         self.hooks.on_finish_migrations(skipped, warned, applied, elapsed)
 
     def _ensure_migrations_table(self, database: peewee.Database):
         self.hooks.on_check_migration_table_exists()
 
-        exists = database.table_exists(self.table_name)
+        exists = database.table_exists(self.table_name, self.schema)
         if not exists:
             stmt = create_migrations_table_sql.format(
-                table_name=self.table_name,
+                table_name=self._qualified(database, self.table_name),
+                text_type=self.text_type,
+            )
+            database.execute_sql(stmt)
+        else:
+            self._upgrade_migrations_table(database)
+
+        if not database.table_exists(self.state_table_name, self.schema):
+            stmt = create_state_table_sql.format(
+                table_name=self._qualified(database, self.state_table_name),
                 text_type=self.text_type,
             )
             database.execute_sql(stmt)
 
         self.hooks.on_checked_migration_table_exists(not exists)
 
+    def _upgrade_migrations_table(self, database: peewee.Database):
+        "adds any columns missing from tables created by older versions"
+        columns = {
+            c.name.lower() for c in database.get_columns(self.table_name, self.schema)
+        }
+        for column, column_type in stats_columns:
+            if column in columns:
+                continue
+            stmt = add_column_sql.format(
+                table_name=self._qualified(database, self.table_name),
+                column=column,
+                column_type=column_type.format(text_type=self.text_type),
+            )
+            database.execute_sql(stmt)
+
+    def history(self, database: peewee.Database) -> list[MigrationRecord]:
+        "returns the applied migrations in the order they were applied"
+        if not database.table_exists(self.table_name, self.schema):
+            return []
+        # tables created by older versions lack the statistics, which are
+        # reported as missing rather than added as migrate would
+        columns = {
+            c.name.lower() for c in database.get_columns(self.table_name, self.schema)
+        }
+        stmt = get_history_sql.format(
+            table_name=self._qualified(database, self.table_name),
+            stats_columns=",\n    ".join(
+                column if column in columns else f"NULL AS {column}"
+                for column, _ in stats_columns
+            ),
+        )
+        rows = database.execute_sql(stmt).fetchall()
+        return [
+            MigrationRecord(
+                name=row[0],
+                parent=row[1],
+                hash=row[2],
+                applied_at=datetime_from_string(row[3]),
+                duration=(
+                    timedelta(milliseconds=row[4]) if row[4] is not None else None
+                ),
+                statement_count=row[5],
+                pwizard_version=row[6],
+            )
+            for row in rows
+        ]
+
+    def migrate_schemas(
+        self,
+        database: peewee.Database,
+        schemas: t.Iterable[str],
+        batch_size: int | None = None,
+        transaction_type: str | None = None,
+    ) -> SchemaMigrationReport:
+        """
+        Applies the migrations to each schema in turn over the same
+        connection, switching the search path (or database on MySQL) so
+        that unqualified names in the migrations refer to the schema. Each
+        schema has its own migrations table. If batch_size is given then
+        that many schemas are committed together, otherwise each schema is
+        committed on its own
+        """
+        schemas = list(schemas)
+        start = perf_counter_ns()
+        switcher = SchemaSwitcher(database)
+        migrator = copy.copy(self)
+        if transaction_type is None:
+            atomic_args: tuple[str, ...] = ()
+        else:
+            atomic_args = (transaction_type,)
+        try:
+            for batch in batched(schemas, batch_size or 1):
+                if batch_size is not None:
+                    ctx: t.ContextManager = database.atomic(*atomic_args)
+                else:
+                    ctx = nullcontext()
+                with ctx:
+                    for schema in batch:
+                        self.hooks.on_begin_schema(schema)
+                        switcher.use(schema)
+                        migrator.schema = schema
+                        migrator.migrate(database, transaction_type)
+        finally:
+            switcher.restore()
+
+        elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+        return SchemaMigrationReport(len(schemas), elapsed)
+
+    def _qualified(self, database: peewee.Database, table_name: str) -> str:
+        "returns the table name, qualified by the schema if there is one"
+        if self.schema is None:
+            return table_name
+        return quote_name(database, self.schema) + "." + table_name
+
+    @property
+    def state_table_name(self) -> str:
+        "name of the companion table which stores the chain digest"
+        return self.table_name + "_state"
+
+    def _get_chain_digest(self, database: peewee.Database) -> str | None:
+        return self._get_state(database, CHAIN_DIGEST_KEY)
+
+    def _set_chain_digest(self, database: peewee.Database, digest: str | None):
+        # the length of the chain is stored with its digest, so that a
+        # longer chain is known to have pending migrations without hashing
+        if digest is not None:
+            digest = f"{len(self.migrations)}:{digest}"
+        self._set_state(database, CHAIN_DIGEST_KEY, digest)
+
+    def _chain_applied(self, database: peewee.Database) -> bool:
+        """
+        returns whether the stored chain digest is that of the migrations,
+        which are only hashed if the stored chain is as long
+        """
+        stored = self._get_chain_digest(database)
+        if stored is None:
+            return False
+        length, _, digest = stored.partition(":")
+        if length != str(len(self.migrations)):
+            return False
+        hash_migrations(self.migrations, self.hash_workers)
+        return digest == chain_digest(self.migrations)
+
+    def _get_state(self, database: peewee.Database, key: str) -> str | None:
+        stmt = get_state_sql.format(
+            table_name=self._qualified(database, self.state_table_name),
+            param=database.param,
+        )
+        # use a savepoint if already inside a transaction, so that a
+        # missing table does not abort the enclosing transaction
+        if database.in_transaction():
+            ctx: t.ContextManager = database.atomic()
+        else:
+            ctx = nullcontext()
+        try:
+            with ctx:
+                cursor = database.execute_sql(stmt, (key,))
+                row = cursor.fetchone()
+        except peewee.DatabaseError:
+            # the state table has not been created yet
+            return None
+        if row is None:
+            return None
+        return row[0]
+
+    def _set_state(self, database: peewee.Database, key: str, value: str | None):
+        stmt = delete_state_sql.format(
+            table_name=self._qualified(database, self.state_table_name),
+            param=database.param,
+        )
+        database.execute_sql(stmt, (key,))
+        if value is not None:
+            stmt = insert_state_sql.format(
+                table_name=self._qualified(database, self.state_table_name),
+                param=database.param,
+            )
+            database.execute_sql(stmt, (key, value))
+
+    def _checkpointed(
+        self,
+        database: peewee.Database,
+        migration: Migration,
+        mode: TransactionMode,
+    ) -> bool:
+        """
+        returns whether checkpoints are recorded for the migration. For
+        SQL migrations this is only useful if the statements are committed
+        as they run: when applied without a transaction, or on MySQL where
+        DDL statements commit implicitly. Backfills commit each batch
+        """
+        if not self.checkpoints:
+            return False
+        if isinstance(migration, BackfillMigration):
+            return True
+        return isinstance(migration, SQLMigration) and (
+            mode is TransactionMode.Disabled
+            or isinstance(database, peewee.MySQLDatabase)
+        )
+
+    def _resume_checkpoint(
+        self,
+        database: peewee.Database,
+        migration: Migration,
+        parse: t.Callable[[str], _R],
+    ) -> _R | None:
+        "returns the checkpoint to resume the migration from, if there is one"
+        value = self._get_state(database, checkpoint_key(migration.name()))
+        if value is None:
+            return None
+        checkpoint = parse(value)
+        algorithm = hash_algorithm(checkpoint.migration_hash)
+        if migration.hash_with(algorithm) != checkpoint.migration_hash:
+            raise RuntimeError(
+                f"migration {migration.name()} cannot be resumed as it has "
+                "changed since it was partly applied"
+            )
+        self.hooks.on_migration_resumed(migration, checkpoint.skipped())
+        return checkpoint
+
+    def _record_checkpoint(
+        self, database: peewee.Database, migration: Migration, checkpoint: ResumePoint
+    ):
+        key = checkpoint_key(migration.name())
+        self._set_state(database, key, checkpoint.format())
+
     def _apply_migration(
         self,
         database: peewee.Database,
         migration: Migration,
         parent: str | None,
+        checkpointed: bool = False,
     ):
-        migration.execute(database)
+        # only SQL migrations report the statements they execute
+        start = perf_counter_ns()
+        statement_count: int | None = None
+        if isinstance(migration, SQLMigration):
+            resume: Checkpoint | None = None
+            record: t.Callable[[int, str], None] | None = None
+            if checkpointed:
+                resume = self._resume_checkpoint(database, migration, Checkpoint.parse)
+                # each checkpoint records the hash of the whole migration,
+                # which is only known after a read of the file, so it is
+                # computed once before the statements are streamed
+                migration_hash = migration.hash()
+
+                def record(index: int, statement: str):
+                    checkpoint = Checkpoint(
+                        index, statement_hash(statement), migration_hash
+                    )
+                    self._record_checkpoint(database, migration, checkpoint)
+
+            statement_count = migration.execute(
+                database, hooks=self.hooks, resume=resume, record=record
+            )
+        elif isinstance(migration, BackfillMigration):
+            backfill_resume: BackfillCheckpoint | None = None
+            backfill_record: t.Callable[[BackfillCheckpoint], None] | None = None
+            if checkpointed:
+                backfill_resume = self._resume_checkpoint(
+                    database, migration, BackfillCheckpoint.parse
+                )
+
+                def backfill_record(checkpoint: BackfillCheckpoint):
+                    self._record_checkpoint(database, migration, checkpoint)
+
+            migration.execute(
+                database,
+                hooks=self.hooks,
+                resume=backfill_resume,
+                record=backfill_record,
+            )
+        else:
+            migration.execute(database)
+        duration_ms = (perf_counter_ns() - start) // 1_000_000
 
         stmt = insert_migration_sql.format(
-            table_name=self.table_name,
+            table_name=self._qualified(database, self.table_name),
             param=database.param,
         )
         values = (
@@ -114,31 +518,150 @@ class Migrator:
             parent,
             migration.hash(),
             datetime_to_string(datetime.now()),
+            duration_ms,
+            statement_count,
+            __version__,
         )
         database.execute_sql(stmt, values)
+        # the checkpoint is only removed once the migration is recorded
+        if checkpointed:
+            self._set_state(database, checkpoint_key(migration.name()), None)
 
-    def _skip_migration(
+    def _apply_baseline(
+        self, database: peewee.Database, baseline: Baseline
+    ) -> dict[str, AppliedMigration]:
+        """
+        applies the baseline to an empty database and records each of the
+        migrations it squashes as applied, returning them as they would be
+        loaded from the migrations table
+        """
+        if not baseline.matches(self.migrations):
+            raise ValueError(
+                f"baseline {baseline.migration.name()} does not match the "
+                f"first {baseline.squashed} migrations"
+            )
+        start = perf_counter_ns()
+        baseline.migration.execute(database, hooks=self.hooks)
+
+        applied_at = datetime.now()
+        rows: list[tuple] = []
+        applied: dict[str, AppliedMigration] = {}
+        parent: str | None = None
+        for migration in self.migrations[: baseline.squashed]:
+            rows.append(
+                (
+                    migration.name(),
+                    parent,
+                    migration.hash(),
+                    datetime_to_string(applied_at),
+                    None,
+                    None,
+                    __version__,
+                )
+            )
+            applied[migration.name()] = AppliedMigration(
+                parent, migration.hash(), applied_at
+            )
+            parent = migration.name()
+        stmt = insert_migration_sql.format(
+            table_name=self._qualified(database, self.table_name),
+            param=database.param,
+        )
+        database.cursor().executemany(stmt, rows)
+
+        elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+        self.hooks.on_baseline_applied(baseline.squashed, elapsed)
+        return applied
+
+    def _apply_attempts(
         self,
         database: peewee.Database,
         migration: Migration,
         parent: str | None,
+        mode: TransactionMode,
+        atomic_args: tuple[str, ...],
+    ):
+        """
+        applies a migration in the given transaction mode, retrying it if
+        it times out waiting for a lock. A migration without a transaction
+        is never retried, as it may have been partly applied. On MySQL,
+        where DDL statements commit implicitly and destroy savepoints, a
+        migration is only retried when it resumes from a checkpoint
+        """
+        if mode is TransactionMode.Disabled and database.in_transaction():
+            raise RuntimeError(
+                f"migration {migration.name()} cannot be applied inside a "
+                "transaction"
+            )
+        lock_timeout = migration.lock_timeout() or self.lock_timeout
+        statement_timeout = migration.statement_timeout() or self.statement_timeout
+        checkpointed = self._checkpointed(database, migration, mode)
+        implicit_commits = isinstance(database, peewee.MySQLDatabase)
+        retryable = mode is not TransactionMode.Disabled and (
+            checkpointed or not implicit_commits
+        )
+
+        attempt = 0
+        while True:
+            attempt += 1
+            # a savepoint lets a failed attempt be rolled back without
+            # aborting the rest of the chain. Where statements commit
+            # implicitly, releasing it would fail as it no longer exists, and
+            # a retry resumes after the last committed statement instead
+            ctx: t.ContextManager = nullcontext()
+            if mode is TransactionMode.Own:
+                ctx = database.atomic(*atomic_args)
+            elif (
+                mode is TransactionMode.Chain
+                and self.lock_retries > 0
+                and not implicit_commits
+            ):
+                ctx = database.atomic()
+
+            start = perf_counter_ns()
+            try:
+                with ctx, session_timeouts(database, lock_timeout, statement_timeout):
+                    self._apply_migration(database, migration, parent, checkpointed)
+            except peewee.DatabaseError as e:
+                elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+                delay: timedelta | None = None
+                if (
+                    retryable
+                    and attempt <= self.lock_retries
+                    and is_lock_timeout(database, e)
+                ):
+                    delay = jittered_delay(attempt, self.retry_delay)
+                self.hooks.on_migration_attempt(migration, attempt, elapsed, e, delay)
+                if delay is None:
+                    raise
+                time.sleep(delay.total_seconds())
+            else:
+                elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+                self.hooks.on_migration_attempt(migration, attempt, elapsed, None, None)
+                return
+
+    def _skip_migration(
+        self,
+        migration: Migration,
+        parent: str | None,
         applied_migration: AppliedMigration,
+        fixes: list[tuple[str | None, str, str]],
     ) -> tuple[MigrationWarning | None, bool]:
         warning: MigrationWarning | None = None
         fixed = False
-        if applied_migration.hash != migration.hash():
+        # compare using the algorithm the applied migration was recorded
+        # with, so that changing algorithm does not invalidate old rows
+        algorithm = hash_algorithm(applied_migration.hash)
+        if applied_migration.hash != migration.hash_with(algorithm):
             warning = HashesDifferWarning(
                 migration.hash(),
                 applied_migration.hash,
                 applied_migration.applied_at,
             )
             if self.fix_warnings:
-                stmt = set_migration_hash_sql.format(
-                    table_name=self.table_name,
-                    param=database.param,
+                fixes.append(
+                    (applied_migration.parent, migration.hash(), migration.name())
                 )
-                hash_params = (migration.hash(), migration.name())
-                database.execute_sql(stmt, hash_params)
                 fixed = True
         elif applied_migration.parent != parent:
             warning = ParentDiffersWarning(
@@ -147,30 +670,75 @@ class Migrator:
                 applied_migration.applied_at,
             )
             if self.fix_warnings:
-                stmt = set_migration_parent_sql.format(
-                    table_name=self.table_name,
-                    param=database.param,
-                )
-                parent_params = (parent, migration.name())
-                database.execute_sql(stmt, parent_params)
+                fixes.append((parent, applied_migration.hash, migration.name()))
                 fixed = True
 
         return warning, fixed
 
-    def _get_migration(
+    def _fix_migrations(
         self,
         database: peewee.Database,
-        migration: Migration,
-    ) -> AppliedMigration | None:
-        stmt = get_migration_sql.format(
-            table_name=self.table_name,
+        fixes: list[tuple[str | None, str, str]],
+    ):
+        if len(fixes) == 0:
+            return
+
+        # all fixes are written with a single batched statement
+        stmt = fix_migration_sql.format(
+            table_name=self._qualified(database, self.table_name),
             param=database.param,
         )
-        cursor = database.execute_sql(stmt, (migration.name(),))
-        row = cursor.fetchone()
-        if row is None:
-            return None
-        return AppliedMigration(row[0], row[1], datetime_from_string(row[2]))
+        cursor = database.cursor()
+        cursor.executemany(stmt, fixes)
+
+    def _get_applied_migrations(
+        self,
+        database: peewee.Database,
+    ) -> dict[str, AppliedMigration]:
+        stmt = get_migrations_sql.format(
+            table_name=self._qualified(database, self.table_name)
+        )
+        cursor = database.execute_sql(stmt)
+        return {
+            row[0]: AppliedMigration(row[1], row[2], datetime_from_string(row[3]))
+            for row in cursor.fetchall()
+        }
+
+
+class _ChainTransaction:
+    """
+    The transaction shared by consecutive migrations, which can be
+    committed and begun again around migrations that are applied outside
+    of it. Within an enclosing transaction it is a savepoint
+    """
+
+    def __init__(self, database: peewee.Database, atomic_args: tuple[str, ...]):
+        self.database = database
+        self.atomic_args = atomic_args
+        self._atomic: t.ContextManager | None = None
+
+    def __enter__(self) -> "_ChainTransaction":
+        self.begin()
+        return self
+
+    def __exit__(self, *exc_info):
+        atomic, self._atomic = self._atomic, None
+        if atomic is not None:
+            return atomic.__exit__(*exc_info)
+
+    def begin(self):
+        if self._atomic is None:
+            atomic = self.database.atomic(*self.atomic_args)
+            atomic.__enter__()
+            self._atomic = atomic
+
+    def commit(self):
+        atomic, self._atomic = self._atomic, None
+        if atomic is not None:
+            atomic.__exit__(None, None, None)
+
+
+CHAIN_DIGEST_KEY = "chain_digest"
 
 
 def datetime_from_string(s: str) -> datetime:
@@ -186,40 +754,99 @@ CREATE TABLE {table_name}(
     name {text_type} NOT NULL PRIMARY KEY,
     parent {text_type},
     hash {text_type} NOT NULL,
-    applied_at {text_type} NOT NULL
+    applied_at {text_type} NOT NULL,
+    duration_ms INTEGER,
+    statement_count INTEGER,
+    pwizard_version {text_type}
+);
+"""
+
+# columns added after the migrations table was first released, which
+# are added to existing tables automatically
+stats_columns = [
+    ("duration_ms", "INTEGER"),
+    ("statement_count", "INTEGER"),
+    ("pwizard_version", "{text_type}"),
+]
+
+add_column_sql = """
+ALTER TABLE
+    {table_name}
+ADD COLUMN
+    {column} {column_type}
+"""
+
+create_state_table_sql = """
+CREATE TABLE {table_name}(
+    name {text_type} NOT NULL PRIMARY KEY,
+    value {text_type}
 );
 """
 
 insert_migration_sql = """
 INSERT INTO
-    {table_name} (name, parent, hash, applied_at)
+    {table_name} (
+        name,
+        parent,
+        hash,
+        applied_at,
+        duration_ms,
+        statement_count,
+        pwizard_version
+    )
 VALUES
-    ({param}, {param}, {param}, {param})
+    ({param}, {param}, {param}, {param}, {param}, {param}, {param})
 """
 
-get_migration_sql = """
+get_migrations_sql = """
 SELECT
-    parent, hash, applied_at
+    name, parent, hash, applied_at
 FROM
     {table_name}
-WHERE
-    name = {param}
 """
 
-set_migration_hash_sql = """
+get_history_sql = """
+SELECT
+    name,
+    parent,
+    hash,
+    applied_at,
+    {stats_columns}
+FROM
+    {table_name}
+ORDER BY
+    applied_at
+"""
+
+fix_migration_sql = """
 UPDATE
     {table_name}
 SET
+    parent = {param},
     hash = {param}
 WHERE
     name = {param}
 """
 
-set_migration_parent_sql = """
-UPDATE
+get_state_sql = """
+SELECT
+    value
+FROM
+    {table_name}
+WHERE
+    name = {param}
+"""
+
+insert_state_sql = """
+INSERT INTO
+    {table_name} (name, value)
+VALUES
+    ({param}, {param})
+"""
+
+delete_state_sql = """
+DELETE FROM
     {table_name}
-SET
-    parent = {param}
 WHERE
     name = {param}
 """
@@ -0,0 +1,239 @@
+import json
+import os
+import struct
+import tempfile
+import threading
+import typing as t
+from pathlib import Path
+from time import time_ns
+
+from pwizard.utils.hashing import file_hash
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+DEFAULT_CACHE_DIR = ".pwizard-cache"
+HASH_CACHE_FILE = "hashes.json"
+
+# the header of a cache entry, which is followed by each statement as a
+# length-prefixed UTF-8 string and terminated by END_MARKER
+MAGIC = b"PWSC\x01"
+END_MARKER = 0xFFFFFFFF
+
+_LENGTH = struct.Struct(">I")
+_SUFFIX = ".stmts"
+
+# files modified this recently may be modified again without their size
+# or mtime changing, so their hashes are not cached
+_RACY_NS = 2_000_000_000
+
+
+class StatementCache:
+    """
+    An on-disk cache of the statements of SQL migrations, keyed by the
+    hash of the migration file and the splitter which produced them
+    """
+
+    def __init__(self, directory: "StrOrBytesPath" = DEFAULT_CACHE_DIR):
+        self.directory = Path(os.fsdecode(directory))
+
+    def path(self, hash: str, key: str) -> Path:
+        return self.directory / f"{_file_part(hash)}.{key}{_SUFFIX}"
+
+    def get(self, hash: str, key: str) -> "StatementReader | None":
+        """
+        returns a reader streaming the cached statements, or None if there
+        is no valid entry
+        """
+        path = self.path(hash, key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+        try:
+            count = _scan(f)
+        except BaseException:
+            f.close()
+            raise
+        if count is None:
+            # corrupt or written by an incompatible version
+            f.close()
+            path.unlink(missing_ok=True)
+            return None
+        return StatementReader(f, path, count)
+
+    def writer(self, key: str) -> "StatementWriter":
+        return StatementWriter(self, key)
+
+    def prune(self, hashes: t.Iterable[str]) -> int:
+        """
+        removes all entries whose hash is not in the given hashes,
+        returning the number of entries removed
+        """
+        keep = {_file_part(hash) for hash in hashes}
+        removed = 0
+        try:
+            paths = list(self.directory.glob("*" + _SUFFIX))
+        except FileNotFoundError:
+            return 0
+        for path in paths:
+            hash = path.name.split(".", 1)[0]
+            if hash not in keep:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class StatementReader:
+    """
+    Reads the statements of a cache entry one at a time, so that only
+    the statement being executed is held in memory. The framing of the
+    entry is checked before it is returned, so a truncated entry is
+    never partly executed
+    """
+
+    def __init__(self, file: t.BinaryIO, path: Path, count: int):
+        self._file = file
+        self._path = path
+        # the number of statements in the entry
+        self.count = count
+
+    def __enter__(self) -> "StatementReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self) -> t.Iterator[str]:
+        self._file.seek(len(MAGIC))
+        for _ in range(self.count):
+            (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+            try:
+                yield self._file.read(length).decode()
+            except UnicodeDecodeError:
+                self._path.unlink(missing_ok=True)
+                raise RuntimeError(f"corrupt statement cache entry {self._path}")
+
+    def close(self):
+        self._file.close()
+
+
+class StatementWriter:
+    """
+    Writes statements to a temporary file as they are produced, which
+    only becomes a cache entry once it is committed under the hash of
+    the migration
+    """
+
+    def __init__(self, cache: StatementCache, key: str):
+        self._cache = cache
+        self._key = key
+        self._file: t.BinaryIO | None = None
+
+    def __enter__(self) -> "StatementWriter":
+        self._cache.directory.mkdir(parents=True, exist_ok=True)
+        self._file = t.cast(
+            t.BinaryIO,
+            tempfile.NamedTemporaryFile(
+                dir=self._cache.directory, suffix=".tmp", delete=False
+            ),
+        )
+        self._file.write(MAGIC)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            # never committed, so discard the partial entry
+            self._file.close()
+            os.unlink(self._file.name)
+            self._file = None
+
+    def write(self, statement: str):
+        assert self._file is not None
+        data = statement.encode()
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+
+    def commit(self, hash: str):
+        assert self._file is not None
+        self._file.write(_LENGTH.pack(END_MARKER))
+        self._file.close()
+        os.replace(self._file.name, self._cache.path(hash, self._key))
+        self._file = None
+
+
+class HashCache:
+    """
+    A persistent cache of file hashes keyed by the path, size and
+    modification time of the file, so that unchanged files are not read.
+    The cache is loaded when it is created and written back by save,
+    which only keeps the entries used since loading
+    """
+
+    def __init__(self, path: "StrOrBytesPath"):
+        self.path = Path(os.fsdecode(path))
+        self._lock = threading.Lock()
+        self._used: dict[str, list] = {}
+        try:
+            with open(self.path) as f:
+                self._entries: dict[str, list] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def hash(self, path: "StrOrBytesPath", algorithm: str) -> str:
+        "returns the hash of a file, only reading it if it has changed"
+        path = os.path.abspath(os.fsdecode(path))
+        key = f"{algorithm}:{path}"
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            hash = entry[2]
+        else:
+            started = time_ns()
+            hash = file_hash(path, algorithm)
+            if stat.st_mtime_ns >= started - _RACY_NS:
+                return hash
+            entry = [stat.st_size, stat.st_mtime_ns, hash]
+        with self._lock:
+            self._entries[key] = self._used[key] = entry
+        return hash
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._used, separators=(",", ":"))
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(data)
+        os.replace(tmp, self.path)
+
+
+def _file_part(hash: str) -> str:
+    "returns a hash in a form which can be used in a file name"
+    return hash.replace(":", "-")
+
+
+def _scan(f: t.BinaryIO) -> int | None:
+    """
+    returns the number of statements in a cache entry by following their
+    lengths to the end marker, or None if it is not a valid entry
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    size = os.fstat(f.fileno()).st_size
+    count = 0
+    while True:
+        data = f.read(_LENGTH.size)
+        if len(data) != _LENGTH.size:
+            return None
+        (length,) = _LENGTH.unpack(data)
+        if length == END_MARKER:
+            break
+        pos = f.seek(length, os.SEEK_CUR)
+        if pos > size:
+            return None
+        count += 1
+    if f.tell() != size:
+        return None
+    return count
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import typing as t
+from dataclasses import dataclass
+
+# prefix of the keys in the state table which hold checkpoints
+CHECKPOINT_KEY_PREFIX = "checkpoint:"
+
+
+class ResumePoint(t.Protocol):
+    "the progress of a partly applied migration, stored in the state table"
+
+    migration_hash: str
+
+    def skipped(self) -> int:
+        "returns how many statements or rows are skipped when resuming"
+        ...
+
+    def format(self) -> str: ...
+
+
+@dataclass
+class Checkpoint:
+    """
+    The last statement of a partly applied SQL migration which completed,
+    along with the hash of the migration it was recorded against
+    """
+
+    index: int
+    statement_hash: str
+    migration_hash: str
+
+    @classmethod
+    def parse(cls, value: str) -> "Checkpoint":
+        # the migration hash goes last as it may contain a colon
+        index, statement_hash, migration_hash = value.split(":", 2)
+        return cls(int(index), statement_hash, migration_hash)
+
+    def format(self) -> str:
+        return f"{self.index}:{self.statement_hash}:{self.migration_hash}"
+
+    def skipped(self) -> int:
+        return self.index + 1
+
+
+@dataclass
+class BackfillCheckpoint:
+    """
+    The key of the last row of a backfill whose batch was committed, and
+    the number of rows updated up to then
+    """
+
+    after: t.Any
+    rows: int
+    migration_hash: str
+
+    @classmethod
+    def parse(cls, value: str) -> "BackfillCheckpoint":
+        data = json.loads(value)
+        return cls(data["after"], data["rows"], data["hash"])
+
+    def format(self) -> str:
+        # keys which JSON cannot represent, e.g. UUIDs, are resumed from
+        # their string form, which the database converts back
+        data = {"after": self.after, "rows": self.rows, "hash": self.migration_hash}
+        return json.dumps(data, default=str)
+
+    def skipped(self) -> int:
+        return self.rows
+
+
+def checkpoint_key(migration: str) -> str:
+    "returns the key in the state table of the checkpoint of a migration"
+    return CHECKPOINT_KEY_PREFIX + migration
+
+
+def statement_hash(statement: str) -> str:
+    return hashlib.sha256(statement.encode()).hexdigest()
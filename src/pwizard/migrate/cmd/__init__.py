@@ -1,7 +1,10 @@
 import click
 
+from pwizard.migrate.cmd.history import migrate_history_cmd
+from pwizard.migrate.cmd.manifest import migrate_manifest_cmd
 from pwizard.migrate.cmd.new import migrate_new_cmd
 from pwizard.migrate.cmd.run import migrate_run_cmd
+from pwizard.migrate.cmd.squash import migrate_squash_cmd
 
 
 @click.group("migrate")
@@ -9,5 +12,8 @@ def migrate_cmd():
     pass
 
 
+migrate_cmd.add_command(migrate_history_cmd)
+migrate_cmd.add_command(migrate_manifest_cmd)
 migrate_cmd.add_command(migrate_new_cmd)
 migrate_cmd.add_command(migrate_run_cmd)
+migrate_cmd.add_command(migrate_squash_cmd)
@@ -0,0 +1,58 @@
+import sys
+
+import click
+from playhouse.db_url import connect
+
+from pwizard.migrate import Migrator
+from pwizard.migrate.history import dump_history
+from pwizard.utils.catch import catch_exception
+from pwizard.utils.duration import format_timedelta
+
+
+@click.command("history")
+@click.option(
+    "--table-name",
+    "-t",
+    default="migrations",
+    help="The name of the migrations table in the database",
+)
+@click.option(
+    "--json",
+    "-j",
+    "as_json",
+    is_flag=True,
+    help="Print the history as JSON, which can be passed to `migrate run --timings`",
+)
+@click.argument("db_url", type=str)
+@catch_exception(Exception)
+def migrate_history_cmd(db_url: str, table_name: str, as_json: bool):
+    migrator = Migrator(table_name=table_name)
+    with connect(db_url) as database:
+        records = migrator.history(database)
+
+    if as_json:
+        dump_history(records, sys.stdout)
+        return
+
+    rows = [("name", "applied at", "duration", "statements", "version")]
+    for record in records:
+        rows.append(
+            (
+                record.name,
+                record.applied_at.isoformat(sep=" ", timespec="seconds"),
+                (
+                    format_timedelta(record.duration)
+                    if record.duration is not None
+                    else "-"
+                ),
+                (
+                    str(record.statement_count)
+                    if record.statement_count is not None
+                    else "-"
+                ),
+                record.pwizard_version or "-",
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
@@ -0,0 +1,54 @@
+import os
+import typing as t
+from glob import glob
+
+import click
+
+from pwizard.migrate.manifest import Manifest
+from pwizard.migrate.migration import FileMigration, file_migration
+from pwizard.utils.catch import catch_exception
+
+
+@click.command("manifest")
+@click.option(
+    "--migration",
+    "-m",
+    multiple=True,
+    help="A glob pattern for files to be used as migrations",
+)
+@click.option(
+    "--output",
+    "-o",
+    default="-",
+    type=click.File("w"),
+    help="The file to write the manifest to, which defaults to stdout",
+)
+@click.option(
+    "--hash-algorithm",
+    "-H",
+    default="sha256",
+    type=click.Choice(["sha256", "blake2b"]),
+    help="The algorithm used to hash the migrations",
+)
+@catch_exception(Exception)
+def migrate_manifest_cmd(
+    migration: list[str],
+    output: t.TextIO,
+    hash_algorithm: str,
+):
+    # collect all migrations in the same order and of the same kinds as
+    # `migrate run`
+    migrations: list[FileMigration] = []
+    for pat in migration:
+        migrations.extend(
+            file_migration(f, algorithm=hash_algorithm) for f in sorted(glob(pat))
+        )
+
+    # paths are recorded relative to the manifest
+    if output.name == "-":
+        base_dir = "."
+    else:
+        base_dir = os.path.dirname(os.path.abspath(output.name))
+
+    manifest = Manifest.from_migrations(migrations, base_dir)
+    manifest.dump(output)
@@ -1,18 +1,51 @@
+import os
+import tempfile
+import threading
+import typing as t
+from contextlib import ExitStack
+from datetime import timedelta
 from glob import glob
 
 import click
+import peewee
+from colorama import Fore, Style
 from colorama import init as init_colorama
 from playhouse.db_url import connect
 
 from pwizard.migrate import Migrator
+from pwizard.migrate.cache import (
+    DEFAULT_CACHE_DIR,
+    HASH_CACHE_FILE,
+    HashCache,
+    StatementCache,
+)
+from pwizard.migrate.history import load_timings
 from pwizard.migrate.hooks import (
     MigrationHooksBase,
+    MigrationHooksProfiler,
     MigrationHooksSummary,
     MigrationHooksVerbose,
     MigrationHooksWarnings,
 )
-from pwizard.migrate.migration import Migration, SQLMigration
+from pwizard.migrate.manifest import Manifest
+from pwizard.migrate.migration import Migration, SQLMigration, file_migration
+from pwizard.migrate.multi import DatabaseResult, migrate_databases, read_url_file
+from pwizard.migrate.scanner import ScanningSplitter
+from pwizard.migrate.splitter import Dialect, Splitter, SqlparseSplitter
+from pwizard.migrate.squash import Baseline
 from pwizard.utils.catch import catch_exception
+from pwizard.utils.duration import format_timedelta, parse_duration
+
+
+def _parse_duration_option(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> timedelta | None:
+    if value is None:
+        return None
+    try:
+        return parse_duration(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
 
 
 @click.command("run")
@@ -51,18 +84,151 @@ from pwizard.utils.catch import catch_exception
     "--migration",
     "-m",
     multiple=True,
-    help="A glob pattern for files to be used as migrations",
+    help="A glob pattern for files to be used as migrations, which may be "
+    "compressed with gzip, bzip2 or xz",
+)
+@click.option(
+    "--splitter",
+    "-s",
+    default="sqlparse",
+    type=click.Choice(["sqlparse", "scan"]),
+    help="The engine used to split SQL migrations into statements",
+)
+@click.option(
+    "--cache-dir",
+    "-C",
+    default=None,
+    help="Cache the statements of SQL migrations in this directory, "
+    f"e.g. {DEFAULT_CACHE_DIR}, along with the hashes of unchanged files",
+)
+@click.option(
+    "--hash-algorithm",
+    "-H",
+    default="sha256",
+    type=click.Choice(["sha256", "blake2b"]),
+    help="The algorithm used to hash newly applied SQL migrations",
+)
+@click.option(
+    "--manifest",
+    "-M",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="A manifest written by `migrate manifest` to use instead of -m patterns",
+)
+@click.option(
+    "--baseline",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="A baseline written by `migrate squash` to apply to empty databases "
+    "instead of the migrations it squashes",
+)
+@click.option(
+    "--profile",
+    "-p",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Print this many of the slowest migrations and statements",
 )
-@click.argument("db_url", type=str)
+@click.option(
+    "--timings",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Estimate the time remaining with -vvv from a history exported "
+    "by `migrate history --json`",
+)
+@click.option(
+    "--url-file",
+    "-U",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="A file of database URLs to migrate, one per line",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=None,
+    type=click.IntRange(min=1),
+    help="The number of databases to migrate concurrently",
+)
+@click.option(
+    "--schema",
+    "-S",
+    "schema_names",
+    multiple=True,
+    help="Apply the migrations to this schema over a single connection, "
+    "which can be specified many times",
+)
+@click.option(
+    "--schema-file",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="A file of schemas to migrate, one per line",
+)
+@click.option(
+    "--batch-size",
+    "-b",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Commit this many schemas at a time rather than one by one",
+)
+@click.option(
+    "--lock",
+    "-L",
+    is_flag=True,
+    help="Lock the database so that concurrent runs migrate one at a time",
+)
+@click.option(
+    "--lock-timeout",
+    default=None,
+    callback=_parse_duration_option,
+    help="How long a statement may wait for a lock, e.g. 5s or 500ms, "
+    "unless a migration sets its own",
+)
+@click.option(
+    "--statement-timeout",
+    default=None,
+    callback=_parse_duration_option,
+    help="How long a statement may run, e.g. 1m, unless a migration sets its own",
+)
+@click.option(
+    "--lock-retries",
+    default=3,
+    type=click.IntRange(min=0),
+    help="How many times to retry a migration which timed out waiting for a lock",
+)
+@click.option(
+    "--checkpoints/--no-checkpoints",
+    default=True,
+    help="Record the progress of SQL migrations whose statements commit as "
+    "they run, so that a failed migration resumes where it stopped",
+)
+@click.argument("db_url", type=str, nargs=-1)
 @catch_exception(Exception)
 def migrate_run_cmd(
-    db_url: str,
+    db_url: tuple[str, ...],
     verbose: int,
     table_name: str,
     text_type: str,
     fix: bool,
     color: str,
     migration: list[str],
+    splitter: str,
+    cache_dir: str | None,
+    hash_algorithm: str,
+    manifest: str | None,
+    baseline: str | None,
+    profile: int,
+    timings: str | None,
+    url_file: str | None,
+    jobs: int | None,
+    schema_names: tuple[str, ...],
+    schema_file: str | None,
+    batch_size: int | None,
+    lock: bool,
+    lock_timeout: timedelta | None,
+    statement_timeout: timedelta | None,
+    lock_retries: int,
+    checkpoints: bool,
 ):
     # set up coloring
     if color == "always":
@@ -75,29 +241,215 @@ def migrate_run_cmd(
         # only keep ansi sequences for tty
         init_colorama(strip=None)
 
-    # collect all migrations
-    migrations: list[Migration] = []
-    for pat in migration:
-        migrations.extend([SQLMigration(f) for f in sorted(glob(pat))])
+    if manifest is not None and migration:
+        raise ValueError("--manifest cannot be combined with --migration")
+
+    urls = list(db_url)
+    if url_file is not None:
+        urls.extend(read_url_file(url_file))
+    if not urls:
+        raise ValueError("no database URLs given")
+
+    schemas = list(schema_names)
+    if schema_file is not None:
+        schemas.extend(read_url_file(schema_file))
+    if schemas and len(urls) > 1:
+        raise ValueError("schemas can only be migrated in a single database")
+
+    with ExitStack() as stack:
+        cache: StatementCache | None = None
+        hash_cache: HashCache | None = None
+        if cache_dir is not None:
+            cache = StatementCache(cache_dir)
+            hash_cache = HashCache(os.path.join(cache_dir, HASH_CACHE_FILE))
+        elif len(urls) > 1:
+            # share the split statements between the databases
+            cache = StatementCache(stack.enter_context(tempfile.TemporaryDirectory()))
+
+        # the migrations are only built once for each splitter, and are
+        # shared by all databases so each file is hashed and split once
+        loaded_manifest = Manifest.load(manifest) if manifest is not None else None
+        built: dict[Dialect | None, list[Migration]] = {}
+        build_lock = threading.Lock()
 
+        def build_migrations(dialect: Dialect | None) -> list[Migration]:
+            statement_splitter: Splitter = SqlparseSplitter()
+            if dialect is not None:
+                statement_splitter = ScanningSplitter(dialect)
+
+            if loaded_manifest is not None:
+                assert manifest is not None
+                return list(
+                    loaded_manifest.migrations(
+                        os.path.dirname(manifest),
+                        splitter=statement_splitter,
+                        cache=cache,
+                    )
+                )
+
+            # collect all migrations from the glob patterns, where CSV
+            # files are loaded into the table they are named after. Either
+            # may be compressed
+            migrations: list[Migration] = []
+            for pat in migration:
+                migrations.extend(
+                    file_migration(
+                        f,
+                        splitter=statement_splitter,
+                        cache=cache,
+                        algorithm=hash_algorithm,
+                        hash_cache=hash_cache,
+                    )
+                    for f in sorted(glob(pat))
+                )
+            return migrations
+
+        def make_migrator(database: peewee.Database) -> Migrator:
+            # set up the statement splitter for the database dialect
+            dialect = Dialect.from_database(database) if splitter == "scan" else None
+            with build_lock:
+                if dialect not in built:
+                    built[dialect] = build_migrations(dialect)
+                migrations = built[dialect]
+            loaded_baseline: Baseline | None = None
+            if baseline is not None:
+                baseline_splitter: Splitter = SqlparseSplitter()
+                if dialect is not None:
+                    baseline_splitter = ScanningSplitter(dialect)
+                loaded_baseline = Baseline(baseline, splitter=baseline_splitter)
+            return Migrator(
+                migrations,
+                table_name=table_name,
+                text_type=text_type,
+                fix_warnings=fix,
+                lock=lock,
+                lock_timeout=lock_timeout,
+                statement_timeout=statement_timeout,
+                lock_retries=lock_retries,
+                checkpoints=checkpoints,
+                baseline=loaded_baseline,
+            )
+
+        failed = 0
+        if len(urls) == 1:
+            database = connect(urls[0])
+            migrator = make_migrator(database)
+            migrator.hooks = _make_hooks(migrator, verbose, profile, timings)
+            # the migrator manages its own transactions, so that it can
+            # take the migration lock when the transaction begins
+            with database.connection_context():
+                if schemas:
+                    report = migrator.migrate_schemas(database, schemas, batch_size)
+                    if verbose >= 2:
+                        print(
+                            Fore.CYAN
+                            + f"Migrated {report.schemas} schemas in "
+                            + format_timedelta(report.elapsed)
+                            + f" ({report.schemas_per_second:.1f} schemas/s)"
+                            + Style.RESET_ALL
+                        )
+                else:
+                    migrator.migrate(database)
+        else:
+            results = migrate_databases(urls, make_migrator, jobs)
+            _print_results(results, verbose)
+            failed = sum(1 for result in results if result.error is not None)
+
+        # remember the hashes of the migrations, and evict the cached
+        # statements of migrations which no longer exist
+        if hash_cache is not None:
+            hash_cache.save()
+        if cache is not None and cache_dir is not None:
+            cache.prune(
+                m.hash()
+                for migrations in built.values()
+                for m in migrations
+                if isinstance(m, SQLMigration)
+            )
+
+    if failed:
+        raise RuntimeError(f"{failed} of {len(urls)} databases failed to migrate")
+
+
+def _make_hooks(
+    migrator: Migrator,
+    verbose: int,
+    profile: int,
+    timings: str | None,
+) -> MigrationHooksBase:
     # set up hooks based on verbosity level
-    hooks = MigrationHooksBase()
+    hooks_type: type[MigrationHooksBase] = MigrationHooksBase
+    hooks_kwargs: dict[str, t.Any] = {}
     if verbose == 1:
-        hooks = MigrationHooksWarnings()
+        hooks_type = MigrationHooksWarnings
     elif verbose == 2:
-        hooks = MigrationHooksSummary()
+        hooks_type = MigrationHooksSummary
     elif verbose >= 3:
-        hooks = MigrationHooksVerbose()
-
-    # initialise the migrator
-    migrator = Migrator(
-        migrations,
-        table_name=table_name,
-        text_type=text_type,
-        fix_warnings=fix,
-        hooks=hooks,
-    )
-
-    # perform migrations
-    with connect(db_url) as database:
-        migrator.migrate(database)
+        hooks_type = MigrationHooksVerbose
+        if timings is not None:
+            # only the migrations being run count towards the estimate
+            names = {m.name() for m in migrator.migrations}
+            hooks_kwargs["timings"] = {
+                name: duration
+                for name, duration in load_timings(timings).items()
+                if name in names
+            }
+
+    hooks = hooks_type(**hooks_kwargs)
+    if profile > 0:
+        return MigrationHooksProfiler(hooks, top=profile)
+    return hooks
+
+
+def _print_results(results: list[DatabaseResult], verbose: int):
+    "prints the outcome of migrating several databases as one summary"
+    if verbose >= 2:
+        for result in results:
+            hooks = result.hooks
+            if result.error is not None:
+                continue
+            elapsed = format_timedelta(hooks.elapsed) if hooks.elapsed else "-"
+            print(
+                result.redacted_url
+                + ": "
+                + Fore.BLUE
+                + str(hooks.skipped)
+                + " skipped"
+                + Style.RESET_ALL
+                + ", "
+                + Fore.YELLOW
+                + str(hooks.warned)
+                + " warnings"
+                + Style.RESET_ALL
+                + ", "
+                + Fore.GREEN
+                + str(hooks.applied)
+                + " applied"
+                + Style.RESET_ALL
+                + " in "
+                + elapsed
+            )
+
+    if verbose >= 1:
+        for result in results:
+            for warning in result.hooks.warnings:
+                print(
+                    Fore.YELLOW + result.redacted_url + ": " + warning + Style.RESET_ALL
+                )
+
+    failures = [result for result in results if result.error is not None]
+    if verbose >= 2 or failures:
+        print(
+            Fore.CYAN
+            + f"Migrated {len(results) - len(failures)} of {len(results)} databases"
+            + Style.RESET_ALL
+        )
+    for result in failures:
+        print(
+            Fore.RED
+            + "failed: "
+            + result.redacted_url
+            + ": "
+            + str(result.error)
+            + Style.RESET_ALL
+        )
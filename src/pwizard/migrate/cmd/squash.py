@@ -0,0 +1,85 @@
+import os
+import typing as t
+from glob import glob
+
+import click
+from playhouse.db_url import connect
+
+from pwizard.migrate import Migrator
+from pwizard.migrate.manifest import Manifest
+from pwizard.migrate.migration import Migration, file_migration
+from pwizard.migrate.squash import dump_database, write_baseline
+from pwizard.utils.catch import catch_exception
+
+
+@click.command("squash")
+@click.option(
+    "--migration",
+    "-m",
+    multiple=True,
+    help="A glob pattern for files to be used as migrations",
+)
+@click.option(
+    "--manifest",
+    "-M",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="A manifest written by `migrate manifest` to use instead of -m patterns",
+)
+@click.option(
+    "--through",
+    default=None,
+    help="The name of the last migration to squash, which defaults to all of them",
+)
+@click.option(
+    "--output",
+    "-o",
+    default="-",
+    type=click.File("w"),
+    help="The file to write the baseline to, which defaults to stdout",
+)
+@click.option(
+    "--table-name",
+    "-t",
+    default="migrations",
+    help="The name of the migrations table, which is left out of the baseline",
+)
+@click.argument("db_url", type=str)
+@catch_exception(Exception)
+def migrate_squash_cmd(
+    db_url: str,
+    migration: list[str],
+    manifest: str | None,
+    through: str | None,
+    output: t.TextIO,
+    table_name: str,
+):
+    # the migrations are applied to the empty database DB_URL and what
+    # they produced is dumped, so the baseline is in the dialect of that
+    # database and should be taken from the kind it will be applied to
+    if manifest is not None and migration:
+        raise ValueError("--manifest cannot be combined with --migration")
+
+    # collect all migrations in the same order as `migrate run`
+    migrations: list[Migration] = []
+    if manifest is not None:
+        migrations.extend(Manifest.load(manifest).migrations(os.path.dirname(manifest)))
+    for pat in migration:
+        migrations.extend(file_migration(f) for f in sorted(glob(pat)))
+
+    if through is not None:
+        names = [m.name() for m in migrations]
+        if through not in names:
+            raise ValueError(f"no migration named {through}")
+        migrations = migrations[: names.index(through) + 1]
+    if not migrations:
+        raise ValueError("no migrations to squash")
+
+    database = connect(db_url)
+    with database.connection_context():
+        if database.get_tables():
+            raise ValueError("the database to squash into must be empty")
+        migrator = Migrator(migrations, table_name=table_name)
+        migrator.migrate(database)
+        statements = dump_database(database, {table_name, migrator.state_table_name})
+        write_baseline(output, migrations, statements)
@@ -0,0 +1,43 @@
+import hashlib
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from pwizard.migrate.migration import Migration
+
+
+def chain_digest(migrations: t.Iterable[Migration]) -> str:
+    """
+    Computes a rolling digest over the name, hash and parent of each
+    migration in the chain, so that two chains have the same digest
+    only if they would be recorded identically in the migrations table
+    """
+    return digest_chain(
+        (migration.name(), migration.hash()) for migration in migrations
+    )
+
+
+def digest_chain(links: t.Iterable[tuple[str, str]]) -> str:
+    "computes the chain digest from the name and hash of each migration"
+    digest = hashlib.sha256()
+    parent: str | None = None
+    for name, hash in links:
+        for part in (name, hash, parent or ""):
+            encoded = part.encode()
+            digest.update(len(encoded).to_bytes(4, "big"))
+            digest.update(encoded)
+        parent = name
+    return digest.hexdigest()
+
+
+def hash_migrations(
+    migrations: t.Sequence[Migration], max_workers: int | None = None
+) -> list[str]:
+    """
+    Hashes the migrations using a pool of threads, which speeds up reading
+    and hashing many files since hashlib releases the GIL. Migrations
+    memoize their hashes, so later calls to hash are free
+    """
+    if len(migrations) <= 1 or max_workers == 1:
+        return [migration.hash() for migration in migrations]
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(lambda migration: migration.hash(), migrations))
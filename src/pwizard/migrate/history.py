@@ -0,0 +1,39 @@
+import json
+import typing as t
+from datetime import timedelta
+
+from pwizard.migrate.internal import MigrationRecord
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+
+def dump_history(records: t.Iterable[MigrationRecord], f: t.TextIO):
+    "writes the history as JSON, which can be loaded by load_timings"
+    data = [
+        {
+            "name": record.name,
+            "parent": record.parent,
+            "hash": record.hash,
+            "applied_at": record.applied_at.isoformat(),
+            "duration": (
+                record.duration.total_seconds() if record.duration is not None else None
+            ),
+            "statement_count": record.statement_count,
+            "pwizard_version": record.pwizard_version,
+        }
+        for record in records
+    ]
+    json.dump(data, f, indent=2)
+    f.write("\n")
+
+
+def load_timings(path: "StrOrBytesPath") -> dict[str, timedelta]:
+    "returns the recorded duration of each migration in an exported history"
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        record["name"]: timedelta(seconds=record["duration"])
+        for record in data
+        if record.get("duration") is not None
+    }
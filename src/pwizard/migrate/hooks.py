@@ -1,5 +1,6 @@
-import typing as t
+import heapq
 import logging
+import typing as t
 from datetime import timedelta
 
 from colorama import Fore, Style
@@ -16,12 +17,27 @@ class MigrationHooksBase:
     and implementations provided.
     """
 
+    def on_begin_schema(self, schema: str) -> None:
+        "called before migrating each schema with Migrator.migrate_schemas"
+        pass
+
     def on_begin_migrations(self, num_migrations: int) -> None:
         pass
 
+    def on_lock_acquired(self, waited: timedelta) -> None:
+        "called once the migration lock is held, with the time spent waiting"
+        pass
+
     def on_check_migration_table_exists(self) -> None:
         pass
 
+    def on_baseline_applied(self, squashed: int, elapsed: timedelta) -> None:
+        """
+        called after a baseline was applied to an empty database, with the
+        number of migrations it squashes, which are then skipped
+        """
+        pass
+
     def on_checked_migration_table_exists(self, created: bool) -> None:
         pass
 
@@ -46,6 +62,74 @@ class MigrationHooksBase:
     ) -> None:
         pass
 
+    def on_migration_timed(
+        self,
+        migration: Migration,
+        applied: bool,
+        elapsed: timedelta,
+    ) -> None:
+        "called after on_after_migration with the time taken by the migration"
+        pass
+
+    def on_migration_attempt(
+        self,
+        migration: Migration,
+        attempt: int,
+        elapsed: timedelta,
+        error: Exception | None,
+        retry_in: timedelta | None,
+    ) -> None:
+        """
+        called after each attempt to apply a migration, where error is
+        None if it succeeded, and retry_in is the delay before the next
+        attempt if it timed out waiting for a lock and will be retried
+        """
+        pass
+
+    def on_migration_resumed(self, migration: Migration, skipped: int) -> None:
+        """
+        called before a partly applied migration is resumed from its
+        checkpoint, with the number of statements which are skipped, or
+        of rows already updated by a backfill
+        """
+        pass
+
+    def on_backfill_batch(
+        self,
+        migration: Migration,
+        rows: int,
+        total: int,
+        elapsed: timedelta,
+    ) -> None:
+        """
+        called after each batch of a backfill is committed, with the rows
+        updated by the batch and so far, and the time taken by the batch
+        """
+        pass
+
+    def on_before_statement(
+        self,
+        migration: Migration,
+        index: int,
+        statement: str,
+    ) -> None:
+        "called before each statement of an SQL migration is executed"
+        pass
+
+    def on_after_statement(
+        self,
+        migration: Migration,
+        index: int,
+        statement: str,
+        rowcount: int,
+        elapsed: timedelta,
+    ) -> None:
+        """
+        called after each statement of an SQL migration is executed, where
+        rowcount is -1 if the database does not report the rows affected
+        """
+        pass
+
 
 class MigrationHooksWarningsAsErrors(MigrationHooksBase):
     """
@@ -148,11 +232,39 @@ class MigrationHooksSummary(MigrationHooksBase):
 class MigrationHooksVerbose(MigrationHooksBase):
     """
     Migration hooks which print warnings, a summary and
-    progress for each individual migration
+    progress for each individual migration. If the durations of the
+    migrations are known, e.g. from the history of another environment,
+    an estimate of the time remaining is also shown
     """
 
+    def __init__(self, timings: t.Mapping[str, timedelta] | None = None):
+        self.timings = dict(timings or {})
+        self._index = 0
+        self._total = 0
+        self._remaining = timedelta()
+        # rows and time of the backfill being applied
+        self._backfill_rows = 0
+        self._backfill_elapsed = timedelta()
+
+    @t.override
+    def on_begin_schema(self, schema: str):
+        print(Fore.CYAN + "Schema " + schema + Style.RESET_ALL)
+
+    @t.override
+    def on_lock_acquired(self, waited: timedelta):
+        print("acquired migration lock after " + format_timedelta(waited))
+
+    @t.override
+    def on_baseline_applied(self, squashed: int, elapsed: timedelta):
+        print(
+            f"applied baseline of {squashed} migrations in " + format_timedelta(elapsed)
+        )
+
     @t.override
     def on_begin_migrations(self, num_migrations: int):
+        self._index = 0
+        self._total = num_migrations
+        self._remaining = sum(self.timings.values(), timedelta())
         print(
             Fore.CYAN
             + "Starting "
@@ -183,9 +295,56 @@ class MigrationHooksVerbose(MigrationHooksBase):
             + Style.RESET_ALL
         )
 
+    @t.override
+    def on_migration_attempt(
+        self,
+        migration: Migration,
+        attempt: int,
+        elapsed: timedelta,
+        error: Exception | None,
+        retry_in: timedelta | None,
+    ):
+        if retry_in is not None:
+            print(
+                Fore.YELLOW
+                + f"timed out waiting for a lock on attempt {attempt}, "
+                + "retrying in "
+                + format_timedelta(retry_in)
+                + Style.RESET_ALL,
+                end="...",
+            )
+
+    @t.override
+    def on_migration_resumed(self, migration: Migration, skipped: int):
+        print(
+            Fore.YELLOW
+            + f"resuming from checkpoint ({skipped} done)"
+            + Style.RESET_ALL,
+            end="...",
+        )
+
+    @t.override
+    def on_backfill_batch(
+        self,
+        migration: Migration,
+        rows: int,
+        total: int,
+        elapsed: timedelta,
+    ):
+        self._backfill_rows = total
+        self._backfill_elapsed += elapsed
+
     @t.override
     def on_before_migration(self, migration: Migration):
-        print("applying " + migration.name(), end="...")
+        self._index += 1
+        progress = ""
+        if self._remaining > timedelta():
+            progress = (
+                f" ({self._index}/{self._total}, about "
+                + format_timedelta(self._remaining)
+                + " left)"
+            )
+        print("applying " + migration.name() + progress, end="...")
 
     @t.override
     def on_after_migration(
@@ -195,8 +354,11 @@ class MigrationHooksVerbose(MigrationHooksBase):
         warning: MigrationWarning | None,
         fixed: bool,
     ):
-        _ = migration
-        if applied:
+        self._remaining -= self.timings.get(migration.name(), timedelta())
+        if applied and self._backfill_elapsed > timedelta():
+            rate = _rows_per_second(self._backfill_rows, self._backfill_elapsed)
+            print(f"applied ({self._backfill_rows} rows, {rate})")
+        elif applied:
             print("applied")
         else:
             print("skipped")
@@ -207,6 +369,48 @@ class MigrationHooksVerbose(MigrationHooksBase):
                 + warning.describe()
                 + Style.RESET_ALL
             )
+        self._backfill_rows = 0
+        self._backfill_elapsed = timedelta()
+
+
+class MigrationHooksCollector(MigrationHooksBase):
+    """
+    Migration hooks which record the outcome of the migrations rather
+    than printing it, so that the outcomes of several runs can be
+    reported together
+    """
+
+    def __init__(self):
+        self.skipped = 0
+        self.warned = 0
+        self.applied = 0
+        self.elapsed: timedelta | None = None
+        self.warnings: list[str] = []
+
+    @t.override
+    def on_after_migration(
+        self,
+        migration: Migration,
+        applied: bool,
+        warning: MigrationWarning | None,
+        fixed: bool,
+    ):
+        if warning is not None:
+            self.warnings.append(
+                ("fixed: " if fixed else "warning: ")
+                + migration.name()
+                + ": "
+                + warning.describe()
+            )
+
+    @t.override
+    def on_finish_migrations(
+        self, skipped: int, warned: int, applied: int, elapsed: timedelta
+    ):
+        self.skipped = skipped
+        self.warned = warned
+        self.applied = applied
+        self.elapsed = elapsed
 
 
 class MigrationHooksLogger(MigrationHooksBase):
@@ -218,6 +422,22 @@ class MigrationHooksLogger(MigrationHooksBase):
     def __init__(self, logger: logging.Logger):
         self.logger = logger
 
+    @t.override
+    def on_begin_schema(self, schema: str):
+        self.logger.info("migrating schema %s", schema)
+
+    @t.override
+    def on_lock_acquired(self, waited: timedelta):
+        self.logger.info("acquired migration lock after %s", format_timedelta(waited))
+
+    @t.override
+    def on_baseline_applied(self, squashed: int, elapsed: timedelta):
+        self.logger.info(
+            "applied baseline of %d migrations in %s",
+            squashed,
+            format_timedelta(elapsed),
+        )
+
     @t.override
     def on_begin_migrations(self, num_migrations: int):
         self.logger.info("starting %d migrations", num_migrations)
@@ -238,6 +458,47 @@ class MigrationHooksLogger(MigrationHooksBase):
     def on_before_migration(self, migration: Migration):
         self.logger.info("applying: %s", migration.name())
 
+    @t.override
+    def on_migration_attempt(
+        self,
+        migration: Migration,
+        attempt: int,
+        elapsed: timedelta,
+        error: Exception | None,
+        retry_in: timedelta | None,
+    ):
+        if retry_in is not None:
+            self.logger.warning(
+                "%s: timed out waiting for a lock on attempt %d after %s, "
+                "retrying in %s",
+                migration.name(),
+                attempt,
+                format_timedelta(elapsed),
+                format_timedelta(retry_in),
+            )
+
+    @t.override
+    def on_migration_resumed(self, migration: Migration, skipped: int):
+        self.logger.warning(
+            "%s: resuming from checkpoint (%d done)", migration.name(), skipped
+        )
+
+    @t.override
+    def on_backfill_batch(
+        self,
+        migration: Migration,
+        rows: int,
+        total: int,
+        elapsed: timedelta,
+    ):
+        self.logger.info(
+            "%s: updated %d rows (%d so far) at %s",
+            migration.name(),
+            rows,
+            total,
+            _rows_per_second(rows, elapsed),
+        )
+
     @t.override
     def on_after_migration(
         self,
@@ -258,3 +519,176 @@ class MigrationHooksLogger(MigrationHooksBase):
                 migration.name(),
                 warning.describe(),
             )
+
+
+class MigrationHooksProfiler(MigrationHooksBase):
+    """
+    Migration hooks which record the time taken by each applied migration
+    and statement, and print the slowest at the end of the migrations along
+    with any retries after lock timeouts.
+    Every hook is forwarded to the inner hooks first, so the profiler can
+    wrap the hooks of any verbosity level
+    """
+
+    def __init__(self, inner: MigrationHooksBase | None = None, top: int = 10):
+        self.inner = inner if inner is not None else MigrationHooksBase()
+        self.top = top
+        self._counter = 0
+        # min-heaps holding the slowest migrations and statements so far
+        self._migrations: list[tuple[timedelta, int, str]] = []
+        self._statements: list[tuple[timedelta, int, str, int, str, int]] = []
+        # retries and time lost to lock timeouts, by migration name
+        self._contention: dict[str, tuple[int, timedelta]] = {}
+
+    def _push(self, heap: list, item: tuple):
+        if len(heap) < self.top:
+            heapq.heappush(heap, item)
+        else:
+            heapq.heappushpop(heap, item)
+
+    @t.override
+    def on_begin_schema(self, schema: str):
+        self.inner.on_begin_schema(schema)
+
+    @t.override
+    def on_begin_migrations(self, num_migrations: int):
+        self.inner.on_begin_migrations(num_migrations)
+
+    @t.override
+    def on_lock_acquired(self, waited: timedelta):
+        self.inner.on_lock_acquired(waited)
+
+    @t.override
+    def on_check_migration_table_exists(self):
+        self.inner.on_check_migration_table_exists()
+
+    @t.override
+    def on_baseline_applied(self, squashed: int, elapsed: timedelta):
+        self.inner.on_baseline_applied(squashed, elapsed)
+
+    @t.override
+    def on_checked_migration_table_exists(self, created: bool):
+        self.inner.on_checked_migration_table_exists(created)
+
+    @t.override
+    def on_before_migration(self, migration: Migration):
+        self.inner.on_before_migration(migration)
+
+    @t.override
+    def on_after_migration(
+        self,
+        migration: Migration,
+        applied: bool,
+        warning: MigrationWarning | None,
+        fixed: bool,
+    ):
+        self.inner.on_after_migration(migration, applied, warning, fixed)
+
+    @t.override
+    def on_migration_resumed(self, migration: Migration, skipped: int):
+        self.inner.on_migration_resumed(migration, skipped)
+
+    @t.override
+    def on_backfill_batch(
+        self,
+        migration: Migration,
+        rows: int,
+        total: int,
+        elapsed: timedelta,
+    ):
+        self.inner.on_backfill_batch(migration, rows, total, elapsed)
+
+    @t.override
+    def on_before_statement(self, migration: Migration, index: int, statement: str):
+        self.inner.on_before_statement(migration, index, statement)
+
+    @t.override
+    def on_migration_timed(
+        self,
+        migration: Migration,
+        applied: bool,
+        elapsed: timedelta,
+    ):
+        self.inner.on_migration_timed(migration, applied, elapsed)
+        if applied:
+            self._counter += 1
+            self._push(self._migrations, (elapsed, self._counter, migration.name()))
+
+    @t.override
+    def on_migration_attempt(
+        self,
+        migration: Migration,
+        attempt: int,
+        elapsed: timedelta,
+        error: Exception | None,
+        retry_in: timedelta | None,
+    ):
+        self.inner.on_migration_attempt(migration, attempt, elapsed, error, retry_in)
+        if retry_in is not None:
+            retries, lost = self._contention.get(migration.name(), (0, timedelta()))
+            self._contention[migration.name()] = (
+                retries + 1,
+                lost + elapsed + retry_in,
+            )
+
+    @t.override
+    def on_after_statement(
+        self,
+        migration: Migration,
+        index: int,
+        statement: str,
+        rowcount: int,
+        elapsed: timedelta,
+    ):
+        self.inner.on_after_statement(migration, index, statement, rowcount, elapsed)
+        self._counter += 1
+        item = (elapsed, self._counter, migration.name(), index, statement, rowcount)
+        self._push(self._statements, item)
+
+    @t.override
+    def on_finish_migrations(
+        self, skipped: int, warned: int, applied: int, elapsed: timedelta
+    ):
+        self.inner.on_finish_migrations(skipped, warned, applied, elapsed)
+        if not self._migrations:
+            return
+
+        print(Fore.CYAN + "Slowest migrations:" + Style.RESET_ALL)
+        for took, _, name in sorted(self._migrations, reverse=True):
+            print(f"  {format_timedelta(took):>10}  {name}")
+
+        print(Fore.CYAN + "Slowest statements:" + Style.RESET_ALL)
+        for took, _, name, index, statement, rowcount in sorted(
+            self._statements, reverse=True
+        ):
+            rows = f", {rowcount} rows" if rowcount >= 0 else ""
+            print(
+                f"  {format_timedelta(took):>10}  {name} #{index + 1}{rows}: "
+                + _summarise_statement(statement)
+            )
+
+        if self._contention:
+            print(Fore.CYAN + "Lock contention:" + Style.RESET_ALL)
+            for name, (retries, lost) in sorted(
+                self._contention.items(), key=lambda item: item[1][1], reverse=True
+            ):
+                print(f"  {format_timedelta(lost):>10}  {name}, {retries} retries")
+
+        self._counter = 0
+        self._migrations.clear()
+        self._statements.clear()
+        self._contention.clear()
+
+
+def _rows_per_second(rows: int, elapsed: timedelta) -> str:
+    seconds = elapsed.total_seconds()
+    if seconds <= 0:
+        return "- rows/s"
+    return f"{rows / seconds:.0f} rows/s"
+
+
+def _summarise_statement(statement: str, width: int = 60) -> str:
+    summary = " ".join(statement.split())
+    if len(summary) > width:
+        summary = summary[: width - 3] + "..."
+    return summary
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 @dataclass
@@ -7,3 +7,15 @@ class AppliedMigration:
     parent: str | None
     hash: str
     applied_at: datetime
+
+
+@dataclass
+class MigrationRecord:
+    name: str
+    parent: str | None
+    hash: str
+    applied_at: datetime
+    # null for migrations applied by older versions of pwizard
+    duration: timedelta | None
+    statement_count: int | None
+    pwizard_version: str | None
@@ -0,0 +1,43 @@
+import hashlib
+import typing as t
+from contextlib import contextmanager
+
+import peewee
+
+
+def advisory_lock_key(name: str) -> int:
+    "derives a signed 64-bit key for pg_advisory_lock from a lock name"
+    digest = hashlib.sha256(b"pwizard:" + name.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+@contextmanager
+def migration_lock(database: peewee.Database, name: str) -> t.Iterator[None]:
+    """
+    Holds a session level lock named after the migrations table, which
+    blocks until any other process holding it has finished. PostgreSQL
+    uses an advisory lock and MySQL a named lock. Other databases are not
+    locked here, as SQLite is instead locked by beginning the migration
+    transaction with BEGIN IMMEDIATE. That lock is released whenever the
+    chain transaction is committed for a migration which is not applied
+    in it, so it only serialises runs of migrations in the chain mode
+    """
+    if isinstance(database, peewee.PostgresqlDatabase):
+        key = advisory_lock_key(name)
+        database.execute_sql("SELECT pg_advisory_lock(%s)", (key,))
+        try:
+            yield
+        finally:
+            database.execute_sql("SELECT pg_advisory_unlock(%s)", (key,))
+    elif isinstance(database, peewee.MySQLDatabase):
+        # lock names are limited to 64 characters
+        lock_name = "pwizard:" + hashlib.sha256(name.encode()).hexdigest()[:48]
+        cursor = database.execute_sql("SELECT GET_LOCK(%s, -1)", (lock_name,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("failed to acquire the migration lock")
+        try:
+            yield
+        finally:
+            database.execute_sql("SELECT RELEASE_LOCK(%s)", (lock_name,))
+    else:
+        yield
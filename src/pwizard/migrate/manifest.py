@@ -0,0 +1,103 @@
+import json
+import os
+import typing as t
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pwizard.migrate.digest import digest_chain
+from pwizard.migrate.migration import FileMigration, file_migration
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestEntry:
+    name: str
+    # path of the migration relative to the manifest, using forward slashes
+    path: str
+    hash: str
+    parent: str | None
+
+
+@dataclass
+class Manifest:
+    """
+    An ordered list of file migrations along with their hashes and the
+    chain digest, which can be shipped with an application so that the
+    migrations directory does not have to be globbed or hashed
+    """
+
+    entries: list[ManifestEntry]
+    chain_digest: str
+
+    @classmethod
+    def from_migrations(
+        cls,
+        migrations: t.Iterable[FileMigration],
+        base_dir: "StrOrBytesPath" = ".",
+    ) -> "Manifest":
+        base = os.path.abspath(os.fsdecode(base_dir))
+        entries: list[ManifestEntry] = []
+        parent: str | None = None
+        for migration in migrations:
+            path = os.path.relpath(os.path.abspath(migration.path), base)
+            entries.append(
+                ManifestEntry(
+                    migration.name(),
+                    Path(path).as_posix(),
+                    migration.hash(),
+                    parent,
+                )
+            )
+            parent = migration.name()
+        return cls(entries, _digest(entries))
+
+    @classmethod
+    def load(cls, path: "StrOrBytesPath") -> "Manifest":
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"unsupported manifest version {data.get('version')}")
+
+        entries = [ManifestEntry(**entry) for entry in data["migrations"]]
+        parent: str | None = None
+        for entry in entries:
+            if entry.parent != parent:
+                raise ValueError(f"manifest entry {entry.name} has the wrong parent")
+            parent = entry.name
+        manifest = cls(entries, data["chain_digest"])
+        if _digest(entries) != manifest.chain_digest:
+            raise ValueError("manifest chain digest does not match its entries")
+        return manifest
+
+    def dump(self, f: t.TextIO):
+        data = {
+            "version": MANIFEST_VERSION,
+            "chain_digest": self.chain_digest,
+            "migrations": [asdict(entry) for entry in self.entries],
+        }
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+    def migrations(
+        self, base_dir: "StrOrBytesPath" = ".", **kwargs
+    ) -> list[FileMigration]:
+        """
+        returns the migrations of the manifest, which only open their
+        files when they are applied. The keyword arguments are passed to
+        file_migration, so CSV files are loaded as they are by `migrate run`
+        """
+        base = Path(os.fsdecode(base_dir))
+        return [
+            file_migration(
+                base / entry.path, name=entry.name, hash=entry.hash, **kwargs
+            )
+            for entry in self.entries
+        ]
+
+
+def _digest(entries: list[ManifestEntry]) -> str:
+    return digest_chain((entry.name, entry.hash) for entry in entries)
@@ -1,20 +1,82 @@
 import abc
+import csv
+import enum
 import hashlib
 import importlib.util
+import io
 import os
 import re
+import sqlite3
+import time
 import typing as t
+from contextlib import nullcontext
+from datetime import timedelta
 from pathlib import Path
+from time import perf_counter_ns
 from types import ModuleType
 
 import peewee
-import sqlparse
+
+from pwizard.migrate.cache import HashCache, StatementCache, StatementWriter
+from pwizard.migrate.checkpoint import BackfillCheckpoint, Checkpoint, statement_hash
+from pwizard.migrate.schemas import quote_name
+from pwizard.migrate.splitter import Splitter, SqlparseSplitter
+from pwizard.utils.compression import open_decompressed, strip_compression_suffix
+from pwizard.utils.duration import parse_duration
+from pwizard.utils.hashing import (
+    DEFAULT_ALGORITHM,
+    HashingReader,
+    file_hash,
+    hash_algorithm,
+)
 
 if t.TYPE_CHECKING:
     from _typeshed import StrOrBytesPath
 
+    from pwizard.migrate.hooks import MigrationHooksBase
+
 NULLHASH = "0000000000000000000000000000000000000000"
 
+CHUNK_SIZE = 1 << 16
+
+# the most rows inserted by one statement when loading data, and the
+# number of such statements sent together with executemany
+MAX_ROWS_PER_STATEMENT = 1000
+STATEMENTS_PER_BATCH = 16
+
+# placeholders allowed in one statement when the driver cannot say
+SQLITE_DEFAULT_PARAMETER_LIMIT = 999
+MYSQL_PARAMETER_LIMIT = 65535
+
+# a leading ordering prefix of a data file name, e.g. "0003_"
+_ORDER_PREFIX = re.compile(r"^\d+[_\-.]*")
+
+# a directive in the comments at the top of an SQL migration, such as
+# "-- pwizard: transaction=none"
+_DIRECTIVE = re.compile(r"--\s*pwizard:\s*(\w+)\s*=\s*(\S+)\s*$", re.IGNORECASE)
+
+
+class TransactionMode(enum.Enum):
+    "how a migration is wrapped in a transaction when it is applied"
+
+    # shares the transaction of the neighbouring migrations
+    Chain = "chain"
+    # commits on its own, so that the locks it takes are released early
+    Own = "own"
+    # runs outside any transaction, e.g. for CREATE INDEX CONCURRENTLY
+    Disabled = "none"
+
+    @classmethod
+    def parse(cls, value: "str | TransactionMode", migration: str) -> "TransactionMode":
+        if isinstance(value, TransactionMode):
+            return value
+        try:
+            return cls(value.lower())
+        except ValueError:
+            raise ValueError(
+                f"migration {migration} has an unknown transaction mode {value!r}"
+            ) from None
+
 
 class Migration(abc.ABC):
     @abc.abstractmethod
@@ -26,39 +88,338 @@ class Migration(abc.ABC):
     @abc.abstractmethod
     def execute(self, database: peewee.Database): ...
 
+    def hash_with(self, algorithm: str) -> str:
+        """
+        returns the hash computed with the given algorithm, which is used
+        to compare against hashes recorded with a different algorithm
+        """
+        return self.hash()
 
-class SQLMigration(Migration):
-    def __init__(self, path: "StrOrBytesPath", name: str | None = None):
+    def transaction_mode(self) -> TransactionMode:
+        "returns how the migration is wrapped in a transaction when applied"
+        return TransactionMode.Chain
+
+    def lock_timeout(self) -> timedelta | None:
+        "returns the lock timeout to use instead of that of the migrator"
+        return None
+
+    def statement_timeout(self) -> timedelta | None:
+        "returns the statement timeout to use instead of that of the migrator"
+        return None
+
+
+class FileMigration(Migration):
+    """
+    A migration read from a file, whose hash is that of the file. Files
+    compressed with gzip, bzip2 or xz are decompressed as they are read,
+    and are named and hashed as if they were not compressed, so that
+    compressing a migration which was already applied does not change it
+    """
+
+    def __init__(
+        self,
+        path: "StrOrBytesPath",
+        name: str | None = None,
+        algorithm: str = DEFAULT_ALGORITHM,
+        hash_cache: HashCache | None = None,
+        hash: str | None = None,
+    ):
         self.path = Path(os.fsdecode(path))
-        self._name = self.path.name if name is None else name
-        self._hash: str | None = None
+        if name is None:
+            name = strip_compression_suffix(self.path.name)
+        self._name = name
+        # a known hash (e.g. from a manifest) means the file is only
+        # opened if the migration is applied
+        self._hash = hash
+        self.algorithm = hash_algorithm(hash) if hash is not None else algorithm
+        self.hash_cache = hash_cache
 
     def name(self) -> str:
         return self._name
 
     def hash(self) -> str:
         if self._hash is None:
-            with open(self.path, "rb") as f:
-                self._hash = hashlib.sha256(f.read()).hexdigest()
+            self._hash = self.hash_with(self.algorithm)
         return self._hash
 
-    def execute(self, database: peewee.Database):
-        with open(self.path, "r") as f:
-            statements = sqlparse.split(f.read())
-        for statement in statements:
+    def hash_with(self, algorithm: str) -> str:
+        if algorithm == self.algorithm and self._hash is not None:
+            return self._hash
+        if self.hash_cache is not None:
+            return self.hash_cache.hash(self.path, algorithm)
+        return file_hash(self.path, algorithm)
+
+    def _check_hash(self, reader: HashingReader) -> str:
+        "checks and returns the hash of a file read through the reader"
+        actual = reader.formatted()
+        if self._hash is None:
+            self._hash = actual
+        elif actual != self._hash:
+            raise RuntimeError(
+                f"migration {self._name} has changed since it was hashed"
+            )
+        return actual
+
+
+class SQLMigration(FileMigration):
+    def __init__(
+        self,
+        path: "StrOrBytesPath",
+        name: str | None = None,
+        splitter: Splitter | None = None,
+        cache: StatementCache | None = None,
+        algorithm: str = DEFAULT_ALGORITHM,
+        hash_cache: HashCache | None = None,
+        hash: str | None = None,
+    ):
+        super().__init__(path, name, algorithm, hash_cache, hash)
+        self.splitter = splitter if splitter is not None else SqlparseSplitter()
+        self.cache = cache
+        self._directives: dict[str, str] | None = None
+
+    def directives(self) -> dict[str, str]:
+        """
+        returns the "-- pwizard: name=value" directives in the comments
+        at the top of the file, which is only read for migrations which
+        are applied
+        """
+        if self._directives is None:
+            self._directives = _read_directives(self.path)
+        return self._directives
+
+    def transaction_mode(self) -> TransactionMode:
+        value = self.directives().get("transaction", TransactionMode.Chain)
+        return TransactionMode.parse(value, self._name)
+
+    def lock_timeout(self) -> timedelta | None:
+        return _parse_timeout(self.directives().get("lock_timeout"), self._name)
+
+    def statement_timeout(self) -> timedelta | None:
+        return _parse_timeout(self.directives().get("statement_timeout"), self._name)
+
+    def execute(
+        self,
+        database: peewee.Database,
+        hooks: "MigrationHooksBase | None" = None,
+        resume: Checkpoint | None = None,
+        record: t.Callable[[int, str], None] | None = None,
+    ) -> int:
+        """
+        executes the migration and returns the number of statements in it.
+        If resume is given then the statements up to and including the
+        checkpoint are skipped, and record is called after each statement
+        which is executed
+        """
+        key = self.splitter.key()
+        if self.cache is not None:
+            # the cache is keyed by the hash, so it is needed before the
+            # statements are read, which costs a pass over the file unless
+            # it is known or found in the hash cache
+            cached = self.cache.get(self.hash(), key)
+            if cached is not None:
+                with cached:
+                    for index, statement in enumerate(cached):
+                        self._execute_statement(
+                            database, index, statement, hooks, resume, record
+                        )
+                return cached.count
+
+        # the file is hashed as it is read, so that a migration which
+        # has not been hashed yet is only read once
+        caching: t.ContextManager[StatementWriter | None] = nullcontext()
+        if self.cache is not None:
+            caching = self.cache.writer(key)
+        count = 0
+        with open_decompressed(self.path) as f, caching as writer:
+            reader = HashingReader(f, self.algorithm)
+            text = io.TextIOWrapper(io.BufferedReader(reader, CHUNK_SIZE))
+            chunks = iter(lambda: text.read(CHUNK_SIZE), "")
+            for index, statement in enumerate(self.splitter.split(chunks)):
+                self._execute_statement(
+                    database, index, statement, hooks, resume, record
+                )
+                count += 1
+                if writer is not None:
+                    writer.write(statement)
+            digest = self._check_hash(reader)
+            if writer is not None:
+                writer.commit(digest)
+        return count
+
+    def _execute_statement(
+        self,
+        database: peewee.Database,
+        index: int,
+        statement: str,
+        hooks: "MigrationHooksBase | None",
+        resume: Checkpoint | None,
+        record: t.Callable[[int, str], None] | None,
+    ):
+        if resume is not None and index <= resume.index:
+            # the file hash matched, but a different splitter could still
+            # have put the statement boundaries somewhere else
+            if index == resume.index and statement_hash(statement) != (
+                resume.statement_hash
+            ):
+                raise RuntimeError(
+                    f"migration {self._name} cannot be resumed as statement "
+                    f"{index + 1} differs from the one which was applied"
+                )
+            return
+
+        if hooks is None:
             database.execute_sql(statement)
+        else:
+            hooks.on_before_statement(self, index, statement)
+            start = perf_counter_ns()
+            cursor = database.execute_sql(statement)
+            elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+            hooks.on_after_statement(self, index, statement, cursor.rowcount, elapsed)
+        if record is not None:
+            record(index, statement)
+
+
+class DataLoadMigration(FileMigration):
+    """
+    Loads the rows of a CSV file, whose first row names the columns, into
+    a table, which by default is named after the file without its
+    extension or any leading number. The file is streamed, hashing it as
+    it is read, so memory use does not depend on its size. PostgreSQL
+    loads it with COPY FROM STDIN, and other databases with multi-row
+    INSERT statements sized to the parameter limit of the driver, sent in
+    groups with executemany. Empty fields are loaded as NULL
+    """
+
+    def __init__(
+        self,
+        path: "StrOrBytesPath",
+        table: str | None = None,
+        name: str | None = None,
+        algorithm: str = DEFAULT_ALGORITHM,
+        hash_cache: HashCache | None = None,
+        hash: str | None = None,
+    ):
+        super().__init__(path, name, algorithm, hash_cache, hash)
+        if table is None:
+            stem = Path(strip_compression_suffix(self.path.name)).stem
+            table = _ORDER_PREFIX.sub("", stem) or stem
+        self.table = table
+
+    def execute(self, database: peewee.Database) -> int:
+        "loads the file and returns the number of rows loaded"
+        with open_decompressed(self.path) as f:
+            reader = HashingReader(f, self.algorithm)
+            stream = io.BufferedReader(reader, CHUNK_SIZE)
+            header = stream.readline().decode("utf-8-sig")
+            columns = next(csv.reader([header]), [])
+            if not columns:
+                raise ValueError(f"migration {self._name} has no header row")
+            if isinstance(database, peewee.PostgresqlDatabase):
+                count = self._copy(database, columns, stream)
+            else:
+                text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+                count = self._insert(database, columns, csv.reader(text))
+            # the rest of the file is read so that all of it is hashed
+            while stream.read(CHUNK_SIZE):
+                pass
+            self._check_hash(reader)
+        return count
+
+    def _copy(
+        self, database: peewee.Database, columns: list[str], stream: t.BinaryIO
+    ) -> int:
+        names = ", ".join(quote_name(database, c) for c in columns)
+        stmt = (
+            f"COPY {quote_name(database, self.table)} ({names}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NULL ({names}))"
+        )
+        cursor = database.cursor()
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(stmt, stream, size=CHUNK_SIZE)
+        else:
+            # psycopg 3
+            with cursor.copy(stmt) as copy:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    copy.write(chunk)
+        return cursor.rowcount
+
+    def _insert(
+        self,
+        database: peewee.Database,
+        columns: list[str],
+        rows: t.Iterator[list[str]],
+    ) -> int:
+        width = len(columns)
+        per_statement = _parameter_limit(database) // width
+        per_statement = max(1, min(per_statement, MAX_ROWS_PER_STATEMENT))
+        names = ", ".join(quote_name(database, c) for c in columns)
+        placeholders = "(" + ", ".join([database.param] * width) + ")"
+
+        def insert_sql(n: int) -> str:
+            return (
+                f"INSERT INTO {quote_name(database, self.table)} ({names}) "
+                + "VALUES "
+                + ", ".join([placeholders] * n)
+            )
+
+        full_sql = insert_sql(per_statement)
+        cursor = database.cursor()
+        count = 0
+        # the parameters of the statement being filled, and of the filled
+        # statements which have not been sent yet
+        params: list[str | None] = []
+        batch: list[list[str | None]] = []
+        for line, row in enumerate(rows, 2):
+            if not row:
+                continue
+            if len(row) != width:
+                raise ValueError(
+                    f"migration {self._name} has {len(row)} fields on line "
+                    f"{line}, but {width} columns"
+                )
+            params.extend(value if value != "" else None for value in row)
+            count += 1
+            if len(params) == per_statement * width:
+                batch.append(params)
+                params = []
+                if len(batch) == STATEMENTS_PER_BATCH:
+                    cursor.executemany(full_sql, batch)
+                    batch = []
+        if batch:
+            cursor.executemany(full_sql, batch)
+        if params:
+            cursor.execute(insert_sql(len(params) // width), params)
+        return count
 
 
 class FunctionMigration(Migration):
     def __init__(
-        self, fn: t.Callable[[peewee.Database], None], name: str | None = None
+        self,
+        fn: t.Callable[[peewee.Database], None],
+        name: str | None = None,
+        transaction: TransactionMode | str = TransactionMode.Chain,
+        lock_timeout: timedelta | None = None,
+        statement_timeout: timedelta | None = None,
     ):
         self._fn = fn
         self._name = name if name is not None else fn.__qualname__
+        self._transaction = TransactionMode.parse(transaction, self._name)
+        self._lock_timeout = lock_timeout
+        self._statement_timeout = statement_timeout
 
     def name(self) -> str:
         return self._name
 
+    def transaction_mode(self) -> TransactionMode:
+        return self._transaction
+
+    def lock_timeout(self) -> timedelta | None:
+        return self._lock_timeout
+
+    def statement_timeout(self) -> timedelta | None:
+        return self._statement_timeout
+
     def hash(self) -> str:
         return NULLHASH
 
@@ -82,6 +443,18 @@ class ModuleMigration(Migration):
     def name(self) -> str:
         return self._name
 
+    def transaction_mode(self) -> TransactionMode:
+        # modules declare their mode and timeouts with attributes
+        value = getattr(self.module, "TRANSACTION", TransactionMode.Chain)
+        return TransactionMode.parse(value, self._name)
+
+    def lock_timeout(self) -> timedelta | None:
+        return _parse_timeout(getattr(self.module, "LOCK_TIMEOUT", None), self._name)
+
+    def statement_timeout(self) -> timedelta | None:
+        value = getattr(self.module, "STATEMENT_TIMEOUT", None)
+        return _parse_timeout(value, self._name)
+
     def hash(self) -> str:
         return NULLHASH
 
@@ -101,3 +474,197 @@ class ScriptMigration(ModuleMigration):
         spec.loader.exec_module(module)
 
         super().__init__(module, name=name)
+
+
+class BackfillMigration(Migration):
+    """
+    Updates the rows of a table in batches, walking the table in order of
+    a unique key so that each batch is found with an index lookup rather
+    than an offset. The update is either the SET clause of an UPDATE
+    statement, or a function called with the exclusive lower and inclusive
+    upper key of each batch (None at either end of the table) which
+    returns the number of rows it updated. Each batch is committed on its
+    own, so that locks are held briefly and the log is not flooded, and
+    the migrator records a checkpoint with each batch so that an
+    interrupted backfill continues where it stopped
+    """
+
+    def __init__(
+        self,
+        name: str,
+        table: str,
+        update: str | t.Callable[[peewee.Database, t.Any, t.Any], int],
+        key: str = "id",
+        where: str | None = None,
+        batch_size: int = 1000,
+        sleep: timedelta | None = None,
+        max_rows_per_second: float | None = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self._name = name
+        self.table = table
+        self.update = update
+        self.key = key
+        # only the rows matching the condition are counted towards a batch
+        self.where = where
+        self.batch_size = batch_size
+        # the pause after each batch, which is lengthened if needed so that
+        # the rows updated per second stays under the limit
+        self.sleep = sleep
+        self.max_rows_per_second = max_rows_per_second
+
+    def name(self) -> str:
+        return self._name
+
+    def transaction_mode(self) -> TransactionMode:
+        # each batch begins and commits its own transaction
+        return TransactionMode.Disabled
+
+    def hash(self) -> str:
+        # the batching does not change the outcome, so is not hashed
+        if callable(self.update):
+            return NULLHASH
+        digest = hashlib.sha256()
+        for part in (self.table, self.key, self.update, self.where or ""):
+            encoded = part.encode()
+            digest.update(len(encoded).to_bytes(4, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def execute(
+        self,
+        database: peewee.Database,
+        hooks: "MigrationHooksBase | None" = None,
+        resume: BackfillCheckpoint | None = None,
+        record: t.Callable[[BackfillCheckpoint], None] | None = None,
+    ) -> int:
+        """
+        updates the table batch by batch and returns the number of rows
+        updated. If resume is given then the backfill continues after the
+        checkpoint, and record is called within the transaction of each
+        batch so that the checkpoint commits along with it
+        """
+        after = resume.after if resume is not None else None
+        total = resume.rows if resume is not None else 0
+        while True:
+            start = perf_counter_ns()
+            with database.atomic():
+                upper = self._batch_end(database, after)
+                rows = self._update_batch(database, after, upper)
+                total += rows
+                if record is not None and upper is not None:
+                    record(BackfillCheckpoint(upper, total, self.hash()))
+            elapsed = timedelta(microseconds=(perf_counter_ns() - start) / 1e3)
+            if hooks is not None:
+                hooks.on_backfill_batch(self, rows, total, elapsed)
+            if upper is None:
+                return total
+            after = upper
+            self._pause(rows, elapsed)
+
+    def _batch_end(self, database: peewee.Database, after: t.Any) -> t.Any:
+        "returns the key of the last row of the batch, or None if it is the last"
+        key = quote_name(database, self.key)
+        conditions, params = self._conditions(database, after, None)
+        stmt = (
+            f"SELECT {key} FROM {quote_name(database, self.table)}"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "")
+            + f" ORDER BY {key} LIMIT 1 OFFSET {self.batch_size - 1}"
+        )
+        row = database.execute_sql(stmt, params).fetchone()
+        return row[0] if row is not None else None
+
+    def _update_batch(
+        self, database: peewee.Database, after: t.Any, upper: t.Any
+    ) -> int:
+        if callable(self.update):
+            return self.update(database, after, upper)
+        conditions, params = self._conditions(database, after, upper)
+        stmt = f"UPDATE {quote_name(database, self.table)} SET {self.update}"
+        if conditions:
+            stmt += " WHERE " + " AND ".join(conditions)
+        cursor = database.execute_sql(stmt, params)
+        return max(cursor.rowcount, 0)
+
+    def _conditions(
+        self, database: peewee.Database, after: t.Any, upper: t.Any
+    ) -> tuple[list[str], list[t.Any]]:
+        key = quote_name(database, self.key)
+        conditions: list[str] = []
+        params: list[t.Any] = []
+        if after is not None:
+            conditions.append(f"{key} > {database.param}")
+            params.append(after)
+        if upper is not None:
+            conditions.append(f"{key} <= {database.param}")
+            params.append(upper)
+        if self.where is not None:
+            conditions.append(f"({self.where})")
+        return conditions, params
+
+    def _pause(self, rows: int, elapsed: timedelta):
+        pause = self.sleep.total_seconds() if self.sleep is not None else 0.0
+        if self.max_rows_per_second:
+            throttle = rows / self.max_rows_per_second - elapsed.total_seconds()
+            pause = max(pause, throttle)
+        if pause > 0:
+            time.sleep(pause)
+
+
+def file_migration(
+    path: "StrOrBytesPath",
+    name: str | None = None,
+    splitter: Splitter | None = None,
+    cache: StatementCache | None = None,
+    algorithm: str = DEFAULT_ALGORITHM,
+    hash_cache: HashCache | None = None,
+    hash: str | None = None,
+) -> FileMigration:
+    """
+    returns the migration for a file, where CSV files are loaded into the
+    table they are named after and any other file is executed as SQL.
+    Either may be compressed
+    """
+    if strip_compression_suffix(os.fsdecode(path)).lower().endswith(".csv"):
+        return DataLoadMigration(
+            path, name=name, algorithm=algorithm, hash_cache=hash_cache, hash=hash
+        )
+    return SQLMigration(path, name, splitter, cache, algorithm, hash_cache, hash)
+
+
+def _parameter_limit(database: peewee.Database) -> int:
+    "returns the number of placeholders allowed in one statement"
+    if isinstance(database, peewee.MySQLDatabase):
+        return MYSQL_PARAMETER_LIMIT
+    connection = database.connection()
+    if isinstance(connection, sqlite3.Connection) and hasattr(connection, "getlimit"):
+        return connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    return SQLITE_DEFAULT_PARAMETER_LIMIT
+
+
+def _read_directives(path: "StrOrBytesPath") -> dict[str, str]:
+    "returns the directives in the comments at the top of an SQL file"
+    directives: dict[str, str] = {}
+    with io.TextIOWrapper(open_decompressed(path)) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("--"):
+                break
+            match = _DIRECTIVE.match(line)
+            if match is not None:
+                directives[match[1].lower()] = match[2]
+    return directives
+
+
+def _parse_timeout(value: "str | timedelta | None", migration: str) -> timedelta | None:
+    if value is None or isinstance(value, timedelta):
+        return value
+    try:
+        return parse_duration(value)
+    except ValueError:
+        raise ValueError(
+            f"migration {migration} has an invalid timeout {value!r}"
+        ) from None
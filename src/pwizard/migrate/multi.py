@@ -0,0 +1,78 @@
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit
+
+import peewee
+from playhouse.db_url import connect
+
+from pwizard.migrate import Migrator
+from pwizard.migrate.hooks import MigrationHooksCollector
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+
+@dataclass
+class DatabaseResult:
+    url: str
+    hooks: MigrationHooksCollector = field(default_factory=MigrationHooksCollector)
+    error: Exception | None = None
+
+    @property
+    def redacted_url(self) -> str:
+        return redact_url(self.url)
+
+
+def migrate_databases(
+    urls: t.Sequence[str],
+    make_migrator: t.Callable[[peewee.Database], Migrator],
+    max_workers: int | None = None,
+) -> list[DatabaseResult]:
+    """
+    Migrates each database concurrently using a pool of threads, and
+    returns the result of each in the order of the urls. The migrator for
+    each database is created by make_migrator, which should share the
+    migrations between databases so that they are only hashed and read
+    once. A failure only affects its own database
+    """
+
+    def migrate(url: str) -> DatabaseResult:
+        result = DatabaseResult(url)
+        try:
+            database = connect(url)
+            migrator = make_migrator(database)
+            migrator.hooks = result.hooks
+            with database.connection_context():
+                migrator.migrate(database)
+        except Exception as e:
+            result.error = e
+        return result
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(migrate, urls))
+
+
+def read_url_file(path: "StrOrBytesPath") -> list[str]:
+    """
+    reads database urls (or other names) one per line, ignoring blank
+    lines and # comments
+    """
+    lines: list[str] = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                lines.append(line)
+    return lines
+
+
+def redact_url(url: str) -> str:
+    "returns the url with any password removed, so that it can be printed"
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = parts.netloc.rpartition("@")[2]
+    if parts.username is not None:
+        netloc = parts.username + ":***@" + netloc
+    return urlunsplit(parts._replace(netloc=netloc))
@@ -0,0 +1,526 @@
+import re
+import typing as t
+from dataclasses import dataclass
+
+from pwizard.migrate.splitter import Dialect, Splitter
+from pwizard.migrate.tokens import (
+    BRACKET_END_RE,
+    BRACKET_RE,
+    FINAL_QUOTE_RES,
+    FLAGS,
+    NEWLINE_RE,
+    QUOTE_RES,
+)
+
+# keywords which affect how statements are split, along with the
+# multi-word keywords which would otherwise be mistaken for them
+_KEYWORD = r"""
+    (?P<keyword>(?<!\w)(?:
+        CREATE(?:\s+OR\s+REPLACE)?\b
+        | END(?:\s+(?:IF|LOOP|WHILE))?\b
+        | CASE\b
+        | IF\s+(?:NOT\s+)?EXISTS\b
+        | HANDLER\s+FOR\b
+        | GO\s\d+\b
+        | (?:BEGIN|DECLARE|IF|FOR|WHILE|GO
+            |TRANSACTION|WORK|DEFERRED|IMMEDIATE|EXCLUSIVE)(?![$\#\w])
+    ))
+"""
+
+# characters which turn a following word into a name
+_NAME_PREFIX_CHARS = frozenset("$#@:?\\")
+
+# characters of sqlparse operator tokens which continue into a comment
+_OPERATOR_CHARS = frozenset("+/@#%^&|")
+
+_TRANSACTION_KEYWORDS = frozenset(
+    ["TRANSACTION", "WORK", "DEFERRED", "IMMEDIATE", "EXCLUSIVE"]
+)
+_BLOCK_KEYWORDS = frozenset(["IF", "FOR", "WHILE", "CASE"])
+_END_BLOCK_KEYWORDS = frozenset(["END IF", "END FOR", "END WHILE"])
+
+# keywords which may be the start of a multi-word keyword, and the words
+# which may follow them up to the end of the buffer while it is cut off
+_MULTI_WORD_STARTS = frozenset(["CREATE", "END", "IF", "GO"])
+_CUT_OFF_WORDS_RE = re.compile(r"\s+\w*(?:\s+\w*)?\Z")
+
+_WORD_RE = re.compile(r"\w+")
+_NON_SPACE_RE = re.compile(r"\S")
+_NAME_LOOKAHEAD_RE = re.compile(r"\(|\s*\.")
+_HORIZONTAL_SPACE_RE = re.compile(r"[^\S\r\n]*")
+_MULTILINE_END_RE = re.compile(r"\*/")
+_NESTED_MULTILINE_RE = re.compile(r"/\*|\*/")
+
+
+@dataclass(frozen=True)
+class _Rules:
+    "the lexical rules of a dialect"
+
+    token_re: re.Pattern
+    line_comment_re: re.Pattern
+    # possessive patterns for each quote opener, which only match when
+    # the result cannot change as more input arrives
+    quote_res: dict[str, re.Pattern]
+    # fallback patterns once all input has arrived
+    final_quote_res: dict[str, list[re.Pattern]]
+    nested_comments: bool
+    # flags used to match the closing tag of a dollar quoted string
+    dollar_flags: int
+    # comments which end a statement rather than being attached to it
+    hint_comments: bool
+    # comment openers may be swallowed by a preceding word or operator
+    continued_openers: bool
+
+
+def _compile_token_re(
+    comment: str,
+    multiline: str,
+    quote: str,
+    dollar: bool,
+    bracket: bool,
+    placeholder: bool,
+) -> re.Pattern:
+    alternatives = [
+        r"(?P<semicolon>;)",
+        r"(?P<open>\()",
+        r"(?P<close>\))",
+        r"(?P<comment>" + comment + ")",
+        r"(?P<multiline>" + multiline + ")",
+        r"(?P<quote>" + quote + ")",
+    ]
+    if dollar:
+        alternatives.append(r"""(?P<dollar>(?<![\w"$])\$(?:[_A-ZÀ-Ü]\w*)?\$)""")
+    if bracket:
+        alternatives.append(r"(?P<bracket>(?<![\w\])])\[)")
+    if placeholder:
+        alternatives.append(r"(?P<placeholder>%\(\w+\)s)")
+    alternatives.append(_KEYWORD)
+    return re.compile("|".join(alternatives), FLAGS | re.VERBOSE)
+
+
+def _quote_re(quote: str, escapes: bool) -> re.Pattern:
+    q = re.escape(quote)
+    if escapes:
+        body = rf"[^{q}\\]|\\[\s\S]|{q}{q}"
+    else:
+        body = rf"[^{q}]|{q}{q}"
+    return re.compile(rf"{q}(?:{body})*+{q}", FLAGS)
+
+
+_RULES = {
+    # mirrors the rules of the sqlparse lexer
+    Dialect.Generic: _Rules(
+        token_re=_compile_token_re(
+            comment=r"--|\#\ ",
+            multiline=r"/\*",
+            quote=r"""['"`´]""",
+            dollar=True,
+            bracket=True,
+            placeholder=True,
+        ),
+        line_comment_re=re.compile(r"--|\#\ "),
+        quote_res=QUOTE_RES,
+        final_quote_res=FINAL_QUOTE_RES,
+        nested_comments=False,
+        dollar_flags=FLAGS,
+        hint_comments=True,
+        continued_openers=True,
+    ),
+    Dialect.Postgresql: _Rules(
+        token_re=_compile_token_re(
+            comment=r"--",
+            multiline=r"/\*",
+            quote=r"""(?<![\w$])[eE]'|['"]""",
+            dollar=True,
+            bracket=False,
+            placeholder=False,
+        ),
+        line_comment_re=re.compile(r"--"),
+        quote_res={
+            "'": _quote_re("'", escapes=False),
+            "e'": re.compile(r"[eE]'(?:[^'\\]|\\[\s\S]|'')*+'"),
+            '"': _quote_re('"', escapes=False),
+        },
+        final_quote_res={},
+        nested_comments=True,
+        dollar_flags=0,
+        hint_comments=False,
+        continued_openers=False,
+    ),
+    Dialect.MySQL: _Rules(
+        token_re=_compile_token_re(
+            comment=r"--(?=\s)|\#",
+            multiline=r"/\*",
+            quote=r"""['"`]""",
+            dollar=False,
+            bracket=False,
+            placeholder=False,
+        ),
+        line_comment_re=re.compile(r"--(?=\s)|\#"),
+        quote_res={
+            "'": _quote_re("'", escapes=True),
+            '"': _quote_re('"', escapes=True),
+            "`": _quote_re("`", escapes=False),
+        },
+        final_quote_res={},
+        nested_comments=False,
+        dollar_flags=0,
+        hint_comments=False,
+        continued_openers=False,
+    ),
+    Dialect.SQLite: _Rules(
+        token_re=_compile_token_re(
+            comment=r"--",
+            multiline=r"/\*",
+            quote=r"""['"`]""",
+            dollar=False,
+            bracket=True,
+            placeholder=False,
+        ),
+        line_comment_re=re.compile(r"--"),
+        quote_res={
+            "'": _quote_re("'", escapes=False),
+            '"': _quote_re('"', escapes=False),
+            "`": _quote_re("`", escapes=False),
+        },
+        final_quote_res={},
+        nested_comments=False,
+        dollar_flags=0,
+        hint_comments=False,
+        continued_openers=False,
+    ),
+}
+
+
+class ScanningSplitter(Splitter):
+    """
+    Splits statements with a purpose-built scanner, which only examines
+    the parts of the input which can affect where a statement ends
+    (semicolons, parentheses, strings, comments and the keywords which
+    open and close blocks) rather than fully tokenizing it.
+
+    With the generic dialect the output mirrors sqlparse, while the
+    other dialects follow the quoting and comment rules of the database
+    """
+
+    def __init__(self, dialect: Dialect | str = Dialect.Generic):
+        self.dialect = Dialect(dialect)
+
+    def split(self, chunks: t.Iterable[str]) -> t.Iterator[str]:
+        return _Scanner(_RULES[self.dialect]).run(chunks)
+
+    def key(self) -> str:
+        return f"{super().key()}-{self.dialect.value}"
+
+
+class _Incomplete(Exception):
+    "raised when a token may continue past the end of the buffer"
+
+
+class _Scanner:
+    def __init__(self, rules: _Rules):
+        self.rules = rules
+        self.buffer = ""
+        self.final = False
+        # start of the current statement and the scan position
+        self.start = 0
+        self.pos = 0
+        # position after which the current statement ends, once any
+        # trailing whitespace and comments on the same line are consumed
+        self.consume: int | None = None
+        self._reset()
+
+    def _reset(self):
+        "mirrors the state of the sqlparse statement splitter"
+        self.level = 0
+        self.begin_depth = 0
+        self.in_case = False
+        self.is_create = False
+        self.seen_begin = False
+
+    def run(self, chunks: t.Iterable[str]) -> t.Iterator[str]:
+        pending: list[str] = []
+        pending_len = 0
+        for chunk in chunks:
+            pending.append(chunk)
+            pending_len += len(chunk)
+            # wait until the new input is at least as long as the
+            # unfinished statement, so that the unfinished statement is
+            # copied and rescanned a bounded number of times
+            if pending_len < len(self.buffer) - self.start:
+                continue
+            self._extend(pending)
+            pending = []
+            pending_len = 0
+            yield from self._scan()
+
+        self._extend(pending)
+        self.final = True
+        yield from self._scan()
+        rest = self.buffer[self.start :].strip()
+        if rest:
+            yield rest
+
+    def _extend(self, chunks: list[str]):
+        start = self.start
+        self.buffer = self.buffer[start:] + "".join(chunks)
+        self.start = 0
+        self.pos -= start
+        if self.consume is not None:
+            self.consume -= start
+
+    def _scan(self) -> t.Iterator[str]:
+        buffer = self.buffer
+        token_re = self.rules.token_re
+        try:
+            while True:
+                if self.consume is not None:
+                    end = self._consume(self.consume)
+                    yield buffer[self.start : end].strip()
+                    self.start = self.pos = end
+                    self.consume = None
+                    self._reset()
+
+                m = token_re.search(buffer, self.pos)
+                if m is None:
+                    if not self.final:
+                        trailing = self._trailing_token(self.pos)
+                        if _NON_SPACE_RE.search(buffer, self.pos, trailing):
+                            self.seen_begin = False
+                        self.pos = trailing
+                    return
+
+                gap_start = self.pos
+                token_start = m.start()
+                if _NON_SPACE_RE.search(buffer, gap_start, token_start):
+                    self.seen_begin = False
+                self.pos = token_start
+                self.pos, ends = self._process(m, gap_start)
+                if ends:
+                    self.consume = self.pos
+        except _Incomplete:
+            pass
+
+    def _trailing_token(self, pos: int) -> int:
+        "returns the start of any token which may continue with more input"
+        buffer = self.buffer
+        i = len(buffer)
+        while i > pos and not buffer[i - 1].isspace():
+            i -= 1
+        return i
+
+    def _consume(self, pos: int) -> int:
+        """
+        consumes the whitespace and single line comments after the end
+        of a statement, returning the position the next statement starts
+        """
+        buffer = self.buffer
+        while True:
+            m = _HORIZONTAL_SPACE_RE.match(buffer, pos)
+            assert m is not None
+            pos = m.end()
+            if len(buffer) - pos < 3 and not self.final:
+                # may be the start of a comment
+                raise _Incomplete()
+            comment = self.rules.line_comment_re.match(buffer, pos)
+            if comment is None or (
+                self.rules.hint_comments and buffer.startswith("+", comment.end())
+            ):
+                return pos
+            pos = self._line_comment_end(comment.end())
+
+    def _line_comment_end(self, pos: int) -> int:
+        buffer = self.buffer
+        m = NEWLINE_RE.search(buffer, pos)
+        if m is None:
+            if self.final:
+                return len(buffer)
+            raise _Incomplete()
+        if m.group() == "\r" and m.end() == len(buffer) and not self.final:
+            # may be the start of a \r\n sequence
+            raise _Incomplete()
+        return m.end()
+
+    def _multiline_end(self, pos: int) -> int | None:
+        buffer = self.buffer
+        if not self.rules.nested_comments:
+            m = _MULTILINE_END_RE.search(buffer, pos)
+            return None if m is None else m.end()
+
+        depth = 1
+        for m in _NESTED_MULTILINE_RE.finditer(buffer, pos):
+            depth += 1 if m.group() == "/*" else -1
+            if depth == 0:
+                return m.end()
+        return None
+
+    def _quote_end(self, quote: str, pos: int) -> int | None:
+        buffer = self.buffer
+        key = quote.lower() if len(quote) > 1 else quote
+        m = self.rules.quote_res[key].match(buffer, pos)
+        if m is not None and (m.end() < len(buffer) or self.final):
+            return m.end()
+        if not self.final:
+            raise _Incomplete()
+        for rex in self.rules.final_quote_res.get(key, []):
+            if m := rex.match(buffer, pos):
+                return m.end()
+        return None
+
+    def _process(self, m: re.Match, gap_start: int) -> tuple[int, bool]:
+        """
+        processes a matched token, returning the position after it and
+        whether it ends the current statement
+        """
+        buffer = self.buffer
+        kind = m.lastgroup
+        start, end = m.span()
+
+        if (
+            self.rules.continued_openers
+            and (kind == "comment" or kind == "multiline")
+            and start > gap_start
+            and self._continues_into(buffer[start - 1], m.group())
+        ):
+            # part of the preceding token rather than a comment
+            self.seen_begin = False
+            return start + 1, False
+
+        if kind == "semicolon":
+            if self.seen_begin:
+                self.begin_depth = max(0, self.begin_depth - 1)
+            self.seen_begin = False
+            return end, self.level <= 0 and self.begin_depth == 0
+
+        if kind == "open" or kind == "close":
+            self.level += 1 if kind == "open" else -1
+            self.seen_begin = False
+            return end, False
+
+        if kind == "comment":
+            if self.rules.hint_comments and buffer.startswith("+", end):
+                self.seen_begin = False
+            return self._line_comment_end(end), False
+
+        if kind == "keyword":
+            if start > gap_start and buffer[start - 1] in _NAME_PREFIX_CHARS:
+                # part of a name, placeholder or command
+                self.seen_begin = False
+                return end, False
+            return self._keyword(m)
+
+        # any other token is not whitespace or a comment
+        if kind == "multiline":
+            if self.rules.hint_comments and buffer.startswith("+", end):
+                self.seen_begin = False
+            token_end = self._multiline_end(end)
+            if token_end is None and self.final:
+                # never terminated, so just an operator
+                self.seen_begin = False
+        else:
+            self.seen_begin = False
+            if kind == "quote":
+                token_end = self._quote_end(m.group(), start)
+            elif kind == "dollar":
+                tag = re.compile(re.escape(m.group()), self.rules.dollar_flags)
+                found = tag.search(buffer, end)
+                token_end = None if found is None else found.end()
+            elif kind == "bracket":
+                found = BRACKET_RE.match(buffer, start)
+                if found is not None:
+                    token_end = found.end()
+                elif self.final or BRACKET_END_RE.search(buffer, end):
+                    # not a bracketed name, just punctuation
+                    token_end = end
+                else:
+                    token_end = None
+            else:
+                token_end = end
+
+        if token_end is None:
+            if not self.final:
+                raise _Incomplete()
+            # never terminated, so carry on after the opening character
+            token_end = start + 1
+        return token_end, False
+
+    def _continues_into(self, prev: str, opener: str) -> bool:
+        "checks whether a preceding character swallows a comment opener"
+        if prev in _OPERATOR_CHARS:
+            return True
+        if opener == "# ":
+            return prev.isalnum() or prev in "_$"
+        return False
+
+    def _keyword(self, m: re.Match) -> tuple[int, bool]:
+        buffer = self.buffer
+        start, end = m.span()
+        value = m.group()
+        unified = value.upper()
+
+        # the keyword may be continued or followed by a name lookahead
+        if not self.final and _NON_SPACE_RE.search(buffer, end) is None:
+            raise _Incomplete()
+        # a single word may be the start of a longer keyword whose other
+        # words are cut off, such as "END I" followed by "F"
+        if (
+            not self.final
+            and unified in _MULTI_WORD_STARTS
+            and _CUT_OFF_WORDS_RE.match(buffer, end)
+        ):
+            raise _Incomplete()
+
+        # words used as names are not keywords, except for CASE which the
+        # sqlparse lexer always treats as a keyword
+        if unified != "CASE":
+            word_end = _WORD_RE.match(buffer, start)
+            assert word_end is not None
+            if (start > 0 and buffer[start - 1] == ".") or _NAME_LOOKAHEAD_RE.match(
+                buffer, word_end.end()
+            ):
+                self.seen_begin = False
+                return end, False
+
+        self.level += self._change_level(unified)
+
+        if value.split()[0] == "GO":
+            return end, True
+        if unified != "BEGIN":
+            self.seen_begin = False
+        return end, False
+
+    def _change_level(self, unified: str) -> int:
+        "mirrors the level changes of the sqlparse statement splitter"
+        if unified.startswith("CREATE"):
+            self.is_create = True
+            return 0
+
+        if unified == "DECLARE" and self.is_create and self.begin_depth == 0:
+            return 1
+
+        if unified == "BEGIN":
+            self.begin_depth += 1
+            self.seen_begin = True
+            return 1 if self.is_create else 0
+
+        if self.seen_begin and unified in _TRANSACTION_KEYWORDS:
+            self.begin_depth = max(0, self.begin_depth - 1)
+            self.seen_begin = False
+            return 0
+
+        if unified == "END":
+            if not self.in_case:
+                self.begin_depth = max(0, self.begin_depth - 1)
+            else:
+                self.in_case = False
+            return -1
+
+        if unified in _BLOCK_KEYWORDS and self.is_create and self.begin_depth > 0:
+            if unified == "CASE":
+                self.in_case = True
+            return 1
+
+        if unified in _END_BLOCK_KEYWORDS:
+            return -1
+
+        return 0
@@ -0,0 +1,69 @@
+import typing as t
+from dataclasses import dataclass
+from datetime import timedelta
+
+import peewee
+
+
+@dataclass
+class SchemaMigrationReport:
+    schemas: int
+    elapsed: timedelta
+
+    @property
+    def schemas_per_second(self) -> float:
+        seconds = self.elapsed.total_seconds()
+        return self.schemas / seconds if seconds > 0 else float("inf")
+
+
+def quote_name(database: peewee.Database, name: str) -> str:
+    "quotes an identifier using the quote characters of the database"
+    start, end = database.quote[0], database.quote[1]
+    return start + name.replace(end, end + end) + end
+
+
+class SchemaSwitcher:
+    """
+    Switches which schema unqualified names refer to on a connection,
+    creating the schema if it does not exist, and restores the original
+    setting afterwards
+    """
+
+    def __init__(self, database: peewee.Database):
+        self.database = database
+        if isinstance(database, peewee.PostgresqlDatabase):
+            cursor = database.execute_sql("SHOW search_path")
+        elif isinstance(database, peewee.MySQLDatabase):
+            cursor = database.execute_sql("SELECT DATABASE()")
+        else:
+            raise ValueError("schemas are only supported by PostgreSQL and MySQL")
+        self._original: str | None = cursor.fetchone()[0]
+
+    def use(self, schema: str):
+        quoted = quote_name(self.database, schema)
+        if isinstance(self.database, peewee.PostgresqlDatabase):
+            # the original search path is kept after the schema, so that
+            # objects such as extensions in public can still be found
+            self.database.execute_sql(f"CREATE SCHEMA IF NOT EXISTS {quoted}")
+            search_path = quoted
+            if self._original:
+                search_path += ", " + self._original
+            self.database.execute_sql(f"SET search_path TO {search_path}")
+        else:
+            self.database.execute_sql(f"CREATE DATABASE IF NOT EXISTS {quoted}")
+            self.database.execute_sql(f"USE {quoted}")
+
+    def restore(self):
+        if isinstance(self.database, peewee.PostgresqlDatabase):
+            self.database.execute_sql(
+                f"SET search_path TO {self._original or 'DEFAULT'}"
+            )
+        elif self._original is not None:
+            self.database.execute_sql(
+                f"USE {quote_name(self.database, self._original)}"
+            )
+
+
+def batched(items: t.Sequence[str], size: int) -> t.Iterator[t.Sequence[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -0,0 +1,242 @@
+import abc
+import re
+import typing as t
+from enum import Enum
+
+import peewee
+from sqlparse import lexer
+from sqlparse.engine import StatementSplitter
+
+from pwizard.migrate.tokens import (
+    BRACKET_END_RE,
+    BRACKET_RE,
+    FINAL_QUOTE_RES,
+    FLAGS,
+    NEWLINE_RE,
+    QUOTE_RES,
+)
+
+# tokens which may contain a semicolon which does not terminate a
+# statement, mirroring the corresponding rules of the sqlparse lexer
+_OPENER_RE = re.compile(
+    r"""
+    (?P<semicolon>;)
+    | (?P<comment>--|\#\ )
+    | (?P<multiline>/\*)
+    | (?P<dollar>(?<![\w"$])\$(?:[_A-ZÀ-Ü]\w*)?\$)
+    | (?P<quote>['"`´])
+    | (?P<bracket>(?<![\w\])])\[)
+    """,
+    FLAGS | re.VERBOSE,
+)
+
+# the start of an opener which may be completed by more input
+_PARTIAL_RE = re.compile(r"[-\#/]|\$(?:[_A-ZÀ-Ü]\w*)?", FLAGS)
+
+# characters which may belong to a token that continues into a comment
+# opener, in which case the sqlparse lexer has to decide
+_AMBIGUOUS_CHARS = frozenset("_$#+/@%^&|-")
+
+
+class Dialect(str, Enum):
+    Generic = "generic"
+    Postgresql = "postgresql"
+    MySQL = "mysql"
+    SQLite = "sqlite"
+
+    @classmethod
+    def from_database(cls, database: peewee.Database) -> "Dialect":
+        if isinstance(database, peewee.PostgresqlDatabase):
+            return cls.Postgresql
+        elif isinstance(database, peewee.MySQLDatabase):
+            return cls.MySQL
+        elif isinstance(database, peewee.SqliteDatabase):
+            return cls.SQLite
+        return cls.Generic
+
+
+class Splitter(abc.ABC):
+    "Splits SQL text into individual statements"
+
+    @abc.abstractmethod
+    def split(self, chunks: t.Iterable[str]) -> t.Iterator[str]:
+        """
+        Splits SQL text provided as a sequence of chunks, yielding each
+        statement as soon as it is complete
+        """
+        ...
+
+    def key(self) -> str:
+        """
+        Identifies how statements are split, so that statements split
+        by one splitter are not reused by another which splits differently
+        """
+        return type(self).__qualname__
+
+
+class SqlparseSplitter(Splitter):
+    "Splits statements using the sqlparse lexer and statement splitter"
+
+    def split(self, chunks: t.Iterable[str]) -> t.Iterator[str]:
+        return split_statements(chunks)
+
+
+def split_statements(chunks: t.Iterable[str]) -> t.Iterator[str]:
+    """
+    Splits SQL text provided as a sequence of chunks into individual
+    statements, yielding each statement as soon as it is complete. The
+    output is identical to calling sqlparse.split on the concatenated
+    chunks, but only the current statement is held in memory
+    """
+    splitter = StatementSplitter()
+    for statement in splitter.process(_tokenize(chunks)):
+        yield str(statement).strip()
+
+
+def _tokenize(chunks: t.Iterable[str]) -> t.Iterator[tuple[t.Any, str]]:
+    for segment in _segments(chunks):
+        yield from lexer.tokenize(segment)
+
+
+def _segments(chunks: t.Iterable[str]) -> t.Iterator[str]:
+    """
+    Yields the input cut immediately after each semicolon which is not
+    inside a string, identifier or comment. These positions are always
+    token boundaries for the sqlparse lexer, so lexing the segments
+    separately produces the same tokens as lexing the whole input
+    """
+    scanner = _BoundaryScanner()
+    for chunk in chunks:
+        scanner.buffer += chunk
+        if cut := scanner.scan(final=False):
+            yield scanner.take(cut)
+    scanner.scan(final=True)
+    if scanner.buffer:
+        yield scanner.take(len(scanner.buffer))
+
+
+class _BoundaryScanner:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        # end of the last token known to be a lexer token boundary
+        self.boundary = 0
+        # buffer length at which to retry an incomplete token, doubling
+        # each time so that long tokens are not rescanned quadratically
+        self.retry_at = 0
+
+    def take(self, cut: int) -> str:
+        segment = self.buffer[:cut]
+        self.buffer = self.buffer[cut:]
+        self.pos -= cut
+        self.boundary -= cut
+        self.retry_at = max(0, self.retry_at - cut)
+        return segment
+
+    def scan(self, final: bool) -> int:
+        "scans the buffer and returns the position of the last safe cut"
+        buffer = self.buffer
+        if not final and len(buffer) < self.retry_at:
+            return 0
+
+        cut = 0
+        while m := _OPENER_RE.search(buffer, self.pos):
+            kind = m.lastgroup
+            start, end = m.span()
+            if kind == "semicolon":
+                cut = self.pos = self.boundary = end
+                continue
+
+            if kind in ("comment", "multiline"):
+                if not self._is_opener(start):
+                    self.pos = start + 1
+                    continue
+
+            if kind == "comment":
+                found = NEWLINE_RE.search(buffer, end)
+                if found is None or (
+                    # a final \r may be the start of a \r\n sequence
+                    found.group() == "\r"
+                    and found.end() == len(buffer)
+                    and not final
+                ):
+                    token_end = None
+                else:
+                    token_end = found.end()
+            elif kind == "multiline":
+                found_at = buffer.find("*/", end)
+                token_end = found_at + 2 if found_at >= 0 else None
+            elif kind == "dollar":
+                tag = re.compile(re.escape(m.group()), FLAGS)
+                found = tag.search(buffer, end)
+                token_end = found.end() if found is not None else None
+            elif kind == "quote":
+                token_end = self._match_quote(m.group(), start, final)
+            else:
+                token_end = self._match_bracket(start, final)
+
+            if token_end is None:
+                if not final:
+                    # incomplete token, wait for more input
+                    self.pos = start
+                    self.retry_at = max(len(buffer) * 2, len(buffer) + 1)
+                    return cut
+                # never terminated, so the lexer treats the opener as
+                # a single character and carries on after it
+                token_end = start + 1
+            self.pos = self.boundary = token_end
+
+        scanned = self.pos
+        self.pos = len(buffer)
+        if not final:
+            # rescan a trailing partial opener once more input arrives
+            dollar = buffer.rfind("$", scanned)
+            for partial in (max(scanned, len(buffer) - 1), dollar):
+                if partial >= 0 and _PARTIAL_RE.fullmatch(buffer, partial):
+                    self.pos = partial
+                    break
+        self.retry_at = 0
+        return cut
+
+    def _is_opener(self, start: int) -> bool:
+        """
+        checks whether the lexer starts a new token at the start of a
+        comment opener, rather than continuing a word or operator into it
+        """
+        buffer = self.buffer
+        if start == 0 or not (
+            buffer[start - 1].isalnum() or buffer[start - 1] in _AMBIGUOUS_CHARS
+        ):
+            return True
+
+        pos = self.boundary
+        for _, value in lexer.tokenize(buffer[self.boundary : start + 2]):
+            if pos == start:
+                return True
+            pos += len(value)
+            if pos > start:
+                break
+        return False
+
+    def _match_quote(self, quote: str, start: int, final: bool) -> int | None:
+        buffer = self.buffer
+        if final:
+            for rex in FINAL_QUOTE_RES[quote]:
+                if m := rex.match(buffer, start):
+                    return m.end()
+            return None
+
+        # the result is only certain if the following character is known
+        m = QUOTE_RES[quote].match(buffer, start)
+        if m is None or m.end() >= len(buffer):
+            return None
+        return m.end()
+
+    def _match_bracket(self, start: int, final: bool) -> int | None:
+        buffer = self.buffer
+        if m := BRACKET_RE.match(buffer, start):
+            return m.end()
+        if final or BRACKET_END_RE.search(buffer, start + 1) is not None:
+            # not a bracketed name, treat as punctuation
+            return start + 1
+        return None
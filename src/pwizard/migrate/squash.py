@@ -0,0 +1,117 @@
+import os
+import re
+import subprocess
+import typing as t
+
+import peewee
+
+from pwizard.migrate.digest import chain_digest
+from pwizard.migrate.migration import Migration, SQLMigration
+from pwizard.migrate.splitter import Splitter
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+# statements of a pg_dump which change the settings of the session, such
+# as emptying the search path, and would leak into later migrations
+_PG_SESSION_STATEMENT = re.compile(r"^(SET |SELECT pg_catalog\.set_config\()")
+
+
+class Baseline:
+    """
+    A snapshot of the schema and data produced by the first migrations of
+    a chain, which is applied to empty databases in place of them. The
+    file is an SQL migration whose leading directives record how many
+    migrations it squashes and their chain digest, so that a baseline is
+    only used with the migrations it was taken from
+    """
+
+    def __init__(self, path: "StrOrBytesPath", splitter: Splitter | None = None):
+        self.migration = SQLMigration(path, splitter=splitter)
+        directives = self.migration.directives()
+        try:
+            self.squashed = int(directives["squashed"])
+            self.chain_digest = directives["chain_digest"]
+        except (KeyError, ValueError):
+            raise ValueError(f"{os.fsdecode(path)} is not a baseline") from None
+
+    def matches(self, migrations: t.Sequence[Migration]) -> bool:
+        "returns whether the baseline was taken from the start of the chain"
+        if len(migrations) < self.squashed:
+            return False
+        return chain_digest(migrations[: self.squashed]) == self.chain_digest
+
+
+def write_baseline(
+    f: t.TextIO,
+    migrations: t.Sequence[Migration],
+    statements: t.Iterable[str],
+):
+    "writes a baseline of the given migrations with the statements of a dump"
+    f.write(f"-- baseline of {len(migrations)} migrations, written by pwizard\n")
+    f.write(f"-- pwizard: squashed={len(migrations)}\n")
+    f.write(f"-- pwizard: chain_digest={chain_digest(migrations)}\n")
+    for statement in statements:
+        f.write(statement.rstrip().rstrip(";") + ";\n")
+
+
+def dump_database(
+    database: peewee.Database, exclude: t.Collection[str]
+) -> t.Iterator[str]:
+    """
+    Yields the statements which recreate the tables, views, indexes and
+    rows of a database, apart from the excluded tables. SQLite is dumped
+    by the driver, and PostgreSQL with pg_dump, which must be installed
+    """
+    if isinstance(database, peewee.SqliteDatabase):
+        yield from _dump_sqlite(database, exclude)
+    elif isinstance(database, peewee.PostgresqlDatabase):
+        yield from _dump_postgresql(database, exclude)
+    else:
+        raise ValueError(f"cannot squash {type(database).__name__} databases")
+
+
+def _dump_sqlite(
+    database: peewee.SqliteDatabase, exclude: t.Collection[str]
+) -> t.Iterator[str]:
+    cursor = database.execute_sql("SELECT name, sql FROM sqlite_master")
+    excluded_sql = {sql for name, sql in cursor.fetchall() if name in exclude}
+    excluded_inserts = tuple(
+        f"INSERT INTO {database.quote[0]}{name}{database.quote[1]} " for name in exclude
+    )
+    for statement in database.connection().iterdump():
+        # the dump is applied inside the transaction of the migrator
+        if statement in ("BEGIN TRANSACTION;", "COMMIT;"):
+            continue
+        if statement.rstrip(";") in excluded_sql:
+            continue
+        if statement.startswith(excluded_inserts):
+            continue
+        yield statement
+
+
+def _dump_postgresql(
+    database: peewee.PostgresqlDatabase, exclude: t.Collection[str]
+) -> t.Iterator[str]:
+    params = database.connect_params
+    args = ["pg_dump", "--no-owner", "--no-privileges", "--inserts"]
+    for option, key in (("--host", "host"), ("--port", "port"), ("--username", "user")):
+        if params.get(key) is not None:
+            args.append(f"{option}={params[key]}")
+    args.extend(f"--exclude-table={name}" for name in exclude)
+    args.append(f"--dbname={database.database}")
+    env = dict(os.environ)
+    if params.get("password") is not None:
+        env["PGPASSWORD"] = str(params["password"])
+    result = subprocess.run(args, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"pg_dump failed: {result.stderr.strip()}")
+
+    # psql meta-commands and session settings are left out, the rest is
+    # passed on whole as the splitter of the baseline separates it
+    lines: list[str] = []
+    for line in result.stdout.splitlines():
+        if line.startswith("\\") or _PG_SESSION_STATEMENT.match(line):
+            continue
+        lines.append(line)
+    yield "\n".join(lines)
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import typing as t
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+import peewee
+
+from pwizard.migrate import Migrator
+from pwizard.migrate.cache import DEFAULT_CACHE_DIR
+from pwizard.migrate.digest import chain_digest, hash_migrations
+from pwizard.migrate.migration import NULLHASH
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+TEMPLATE_DIR = "templates"
+
+
+class TemplateDatabase:
+    """
+    A SQLite database which is migrated once and cached on disk, keyed by
+    the chain digest of the migrations, and cloned into memory for each
+    test with SQLite's backup API. Changing any migration changes the
+    digest, so a stale template is never used. The code of function and
+    module migrations is not hashed, so a chain with any of them is not
+    cached, and each clone is migrated instead
+    """
+
+    def __init__(
+        self,
+        migrator: Migrator,
+        cache_dir: "StrOrBytesPath" = os.path.join(DEFAULT_CACHE_DIR, TEMPLATE_DIR),
+    ):
+        self.migrator = migrator
+        self.cache_dir = Path(os.fsdecode(cache_dir))
+
+    def cacheable(self) -> bool:
+        "returns whether every migration is hashed, so the template can be cached"
+        hashes = hash_migrations(self.migrator.migrations, self.migrator.hash_workers)
+        return NULLHASH not in hashes
+
+    def path(self) -> Path:
+        "returns the path of the template for the current migrations"
+        hash_migrations(self.migrator.migrations, self.migrator.hash_workers)
+        digest = chain_digest(self.migrator.migrations)
+        return self.cache_dir / f"{self.migrator.table_name}-{digest}.sqlite"
+
+    def ensure(self) -> Path:
+        "migrates the template if it is not cached yet and returns its path"
+        if not self.cacheable():
+            raise RuntimeError(
+                "the template cannot be cached as some migrations are not hashed"
+            )
+        path = self.path()
+        if path.exists():
+            return path
+
+        # migrate into a temporary file which is renamed into place, so
+        # that test processes running in parallel never see a partial one
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            database = peewee.SqliteDatabase(tmp)
+            with database.connection_context():
+                self.migrator.migrate(database)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return path
+
+    def clone(
+        self, database: peewee.SqliteDatabase | None = None
+    ) -> peewee.SqliteDatabase:
+        """
+        copies the template into a database, by default a new in-memory
+        one, which is left connected as an in-memory database is lost
+        when its connection closes. A chain which cannot be cached is
+        migrated into the database instead
+        """
+        if database is None:
+            database = peewee.SqliteDatabase(":memory:")
+        if not self.cacheable():
+            self.migrator.migrate(database)
+            return database
+        with closing(sqlite3.connect(self.ensure())) as source:
+            source.backup(database.connection())
+        return database
+
+
+@contextmanager
+def rolled_back(database: peewee.Database) -> t.Iterator[peewee.Database]:
+    """
+    Rolls back everything done to the database within the block, so that
+    one migrated database can be shared by many tests. Nested transactions
+    become savepoints, so the code under test may still use them. For
+    example, as a pytest fixture:
+
+        @pytest.fixture
+        def db(migrated_db):
+            with rolled_back(migrated_db) as db:
+                yield db
+    """
+    with database.atomic() as transaction:
+        yield database
+        transaction.rollback()
@@ -0,0 +1,115 @@
+import math
+import random
+import typing as t
+from contextlib import contextmanager
+from datetime import timedelta
+
+import peewee
+
+# the longest a retry waits, however many attempts have failed
+MAX_RETRY_DELAY = timedelta(seconds=30)
+
+# SQLSTATE lock_not_available, raised when lock_timeout expires
+_PG_LOCK_NOT_AVAILABLE = "55P03"
+# ER_LOCK_WAIT_TIMEOUT, raised for both row and metadata locks
+_MYSQL_LOCK_WAIT_TIMEOUT = 1205
+
+
+@contextmanager
+def session_timeouts(
+    database: peewee.Database,
+    lock_timeout: timedelta | None,
+    statement_timeout: timedelta | None,
+) -> t.Iterator[None]:
+    """
+    Limits how long statements wait for locks and how long they run,
+    restoring the previous limits afterwards. PostgreSQL sets lock_timeout
+    and statement_timeout, local to the transaction if there is one. MySQL
+    sets innodb_lock_wait_timeout and lock_wait_timeout, in whole seconds,
+    and max_execution_time, which only limits SELECT statements. SQLite
+    sets its busy timeout and has no statement timeout
+    """
+    settings: dict[str, str | int] = {}
+    if isinstance(database, peewee.PostgresqlDatabase):
+        if lock_timeout is not None:
+            settings["lock_timeout"] = f"{_milliseconds(lock_timeout)}ms"
+        if statement_timeout is not None:
+            settings["statement_timeout"] = f"{_milliseconds(statement_timeout)}ms"
+    elif isinstance(database, peewee.MySQLDatabase):
+        if lock_timeout is not None:
+            seconds = max(1, math.ceil(lock_timeout.total_seconds()))
+            settings["innodb_lock_wait_timeout"] = seconds
+            settings["lock_wait_timeout"] = seconds
+        if statement_timeout is not None:
+            settings["max_execution_time"] = _milliseconds(statement_timeout)
+    elif isinstance(database, peewee.SqliteDatabase):
+        if lock_timeout is not None:
+            settings["busy_timeout"] = _milliseconds(lock_timeout)
+
+    if not settings:
+        yield
+        return
+
+    # a failed transaction is rolled back, which on PostgreSQL also
+    # restores settings which are local to it
+    local = database.in_transaction()
+    previous = {name: _get(database, name) for name in settings}
+    for name, value in settings.items():
+        _set(database, name, value, local)
+    try:
+        yield
+    except BaseException:
+        if not (local and isinstance(database, peewee.PostgresqlDatabase)):
+            for name, value in previous.items():
+                _set(database, name, value, local)
+        raise
+    for name, value in previous.items():
+        _set(database, name, value, local)
+
+
+def is_lock_timeout(database: peewee.Database, error: peewee.DatabaseError) -> bool:
+    "returns whether the error was caused by a statement waiting too long for a lock"
+    # peewee passes the exception of the driver as the first argument
+    cause = error.args[0] if error.args else None
+    if isinstance(database, peewee.PostgresqlDatabase):
+        code = getattr(cause, "pgcode", None) or getattr(cause, "sqlstate", None)
+        return code == _PG_LOCK_NOT_AVAILABLE
+    if isinstance(database, peewee.MySQLDatabase):
+        args: tuple = getattr(cause, "args", ())
+        return bool(args) and args[0] == _MYSQL_LOCK_WAIT_TIMEOUT
+    if isinstance(database, peewee.SqliteDatabase):
+        return "locked" in str(error)
+    return False
+
+
+def jittered_delay(attempt: int, base: timedelta) -> timedelta:
+    """
+    returns how long to wait before retrying after the given attempt,
+    chosen at random up to an exponentially growing limit so that
+    processes contending for the same lock do not retry in step
+    """
+    limit = min(base * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+    return limit * random.random()
+
+
+def _milliseconds(d: timedelta) -> int:
+    return max(1, math.ceil(d.total_seconds() * 1000))
+
+
+def _get(database: peewee.Database, name: str) -> str | int:
+    if isinstance(database, peewee.PostgresqlDatabase):
+        cursor = database.execute_sql("SELECT current_setting(%s)", (name,))
+    elif isinstance(database, peewee.MySQLDatabase):
+        cursor = database.execute_sql(f"SELECT @@SESSION.{name}")
+    else:
+        cursor = database.execute_sql(f"PRAGMA {name}")
+    return cursor.fetchone()[0]
+
+
+def _set(database: peewee.Database, name: str, value: str | int, local: bool):
+    if isinstance(database, peewee.PostgresqlDatabase):
+        database.execute_sql("SELECT set_config(%s, %s, %s)", (name, value, local))
+    elif isinstance(database, peewee.MySQLDatabase):
+        database.execute_sql(f"SET SESSION {name} = %s", (value,))
+    else:
+        database.execute_sql(f"PRAGMA {name} = {int(value)}")
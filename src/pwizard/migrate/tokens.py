@@ -0,0 +1,32 @@
+import re
+
+# the rules shared by the statement splitters, which mirror those of the
+# sqlparse lexer so that they agree on where tokens end
+
+FLAGS = re.IGNORECASE | re.UNICODE
+
+# possessive versions of the sqlparse string rules, which only match
+# when the result cannot change as more input arrives
+QUOTE_RES = {
+    "'": re.compile(r"'(?:''|\\'|[^'])*+'", FLAGS),
+    '"': re.compile(r'"(?:""|\\"|[^"])*+"', FLAGS),
+    "`": re.compile(r"`(?:``|[^`])*+`", FLAGS),
+    "´": re.compile(r"´(?:´´|[^´])*+´", FLAGS),
+}
+
+# the sqlparse string rules, which are used once all input has arrived
+FINAL_QUOTE_RES = {
+    "'": [re.compile(r"'(''|\\'|[^'])*'", FLAGS)],
+    '"': [
+        re.compile(r'"(""|\\"|[^"])*"', FLAGS),
+        re.compile(r'(""|".*?[^\\]")', FLAGS),
+    ],
+    "`": [re.compile(r"`(``|[^`])*`", FLAGS)],
+    "´": [re.compile(r"´(´´|[^´])*´", FLAGS)],
+}
+
+# the end of a line comment, and a bracketed name or what ends the search
+# for one
+NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+BRACKET_RE = re.compile(r"\[[^\]\[]+\]")
+BRACKET_END_RE = re.compile(r"[\]\[]")
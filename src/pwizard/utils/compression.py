@@ -0,0 +1,40 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import typing as t
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+# the compressed formats recognised by their file extension
+COMPRESSION_SUFFIXES: dict[str, t.Callable[[str], io.BufferedIOBase]] = {
+    ".gz": gzip.GzipFile,
+    ".bz2": bz2.BZ2File,
+    ".xz": lzma.LZMAFile,
+}
+
+
+def compression_suffix(path: "StrOrBytesPath") -> str | None:
+    "returns the extension of the compressed format of the file, if any"
+    _, ext = os.path.splitext(os.fsdecode(path))
+    ext = ext.lower()
+    return ext if ext in COMPRESSION_SUFFIXES else None
+
+
+def strip_compression_suffix(name: str) -> str:
+    "returns the file name without the extension of its compressed format"
+    suffix = compression_suffix(name)
+    return name[: -len(suffix)] if suffix is not None else name
+
+
+def open_decompressed(path: "StrOrBytesPath") -> t.BinaryIO:
+    """
+    opens a file for reading in binary mode, decompressing it as it is
+    read if its extension names a compressed format
+    """
+    suffix = compression_suffix(path)
+    if suffix is None:
+        return open(path, "rb")
+    return t.cast(t.BinaryIO, COMPRESSION_SUFFIXES[suffix](os.fsdecode(path)))
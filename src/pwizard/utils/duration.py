@@ -1,8 +1,18 @@
+import re
 from datetime import timedelta
 
 SEC_TO_MIN = 60
 SEC_TO_HOUR = SEC_TO_MIN * 60
 
+_DURATION = re.compile(r"\s*(\d+(?:\.\d*)?)\s*(ms|s|m|min|h)?\s*$")
+_UNIT_TO_SEC = {
+    "ms": 1e-3,
+    "s": 1,
+    "m": SEC_TO_MIN,
+    "min": SEC_TO_MIN,
+    "h": SEC_TO_HOUR,
+}
+
 
 def format_timedelta(d: timedelta) -> str:
     prefix = ""
@@ -38,3 +48,11 @@ def format_timedelta(d: timedelta) -> str:
 
 def _float_to_str(f: float) -> str:
     return "{:.3f}".format(f).rstrip("0").rstrip(".")
+
+
+def parse_duration(s: str) -> timedelta:
+    "parses a duration such as 500ms, 5s, 2m or 1h, defaulting to seconds"
+    match = _DURATION.match(s)
+    if match is None:
+        raise ValueError(f"invalid duration {s!r}")
+    return timedelta(seconds=float(match[1]) * _UNIT_TO_SEC[match[2] or "s"])
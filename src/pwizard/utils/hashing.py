@@ -0,0 +1,59 @@
+import hashlib
+import io
+import typing as t
+
+from pwizard.utils.compression import open_decompressed
+
+if t.TYPE_CHECKING:
+    from _typeshed import StrOrBytesPath
+
+DEFAULT_ALGORITHM = "sha256"
+
+
+class HashingReader(io.RawIOBase):
+    "raw binary stream which hashes everything read through it"
+
+    def __init__(self, stream: t.BinaryIO, algorithm: str = DEFAULT_ALGORITHM):
+        self._stream = stream
+        self._algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: t.Any) -> int:
+        data = self._stream.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self._hash.update(data)
+        return n
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def formatted(self) -> str:
+        return format_hash(self._algorithm, self.hexdigest())
+
+
+def format_hash(algorithm: str, hexdigest: str) -> str:
+    """
+    returns a digest in the form it is recorded, which is prefixed by
+    the algorithm unless it is the default, so that hashes recorded
+    before other algorithms were supported remain valid
+    """
+    if algorithm == DEFAULT_ALGORITHM:
+        return hexdigest
+    return f"{algorithm}:{hexdigest}"
+
+
+def hash_algorithm(hash: str) -> str:
+    "returns the algorithm of a hash in the form returned by format_hash"
+    algorithm, sep, _ = hash.partition(":")
+    return algorithm if sep else DEFAULT_ALGORITHM
+
+
+def file_hash(path: "StrOrBytesPath", algorithm: str = DEFAULT_ALGORITHM) -> str:
+    "hashes a file, over its decompressed content if it is compressed"
+    with open_decompressed(path) as f:
+        digest = hashlib.file_digest(t.cast(io.BufferedIOBase, f), algorithm)
+        return format_hash(algorithm, digest.hexdigest())
@@ -7,8 +7,8 @@ def split_relist(v: str) -> list[str | re.Pattern]:
     for elem in v.splitlines():
         e = elem.strip()
         if e:
-            if e[:1] == e[-1:] == "/":
-                res.append(re.compile(e))
+            if len(e) > 1 and e[:1] == e[-1:] == "/":
+                res.append(re.compile(e[1:-1]))
             else:
                 res.append(e)
     return res
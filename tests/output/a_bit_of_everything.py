@@ -0,0 +1,310 @@
+# pwizard fingerprint: b192af039c8f1d793c1bb85edd7db66c42173502e83997b7714f91ed9646c203
+from peewee import (
+    DecimalField,
+    CharField,
+    Model,
+    IntegerField,
+    TimeField,
+    BlobField,
+    BigIntegerField,
+    FloatField,
+    CompositeKey,
+    ForeignKeyField,
+    BooleanField,
+    DateField,
+    AutoField,
+    TextField,
+    SqliteDatabase,
+    BareField,
+    DateTimeField,
+)
+
+_db = SqliteDatabase(None)
+
+
+class ABitOfEverything(Model):
+    "ABitOfEverything represents a row from the a_bit_of_everything table"
+
+    a_bigint = BigIntegerField()
+    a_bigint_nullable = BigIntegerField(null=True)
+    a_blob = BlobField()
+    a_blob_nullable = BlobField(null=True)
+    a_bool = BooleanField()
+    a_bool_nullable = BooleanField(null=True)
+    a_boolean = BooleanField()
+    a_boolean_nullable = BooleanField(null=True)
+    a_date = DateField()
+    a_date_nullable = DateField(null=True)
+    a_datetime = DateTimeField()
+    a_datetime_nullable = DateTimeField(null=True)
+    a_decimal = DecimalField()
+    a_decimal_nullable = DecimalField(null=True)
+    a_float = FloatField()
+    a_float_nullable = FloatField(null=True)
+    a_int = IntegerField()
+    a_int_nullable = IntegerField(null=True)
+    a_integer = IntegerField()
+    a_integer_nullable = IntegerField(null=True)
+    a_numeric = DecimalField()
+    a_numeric_nullable = DecimalField(null=True)
+    a_real = FloatField()
+    a_real_nullable = FloatField(null=True)
+    a_smallint = IntegerField()
+    a_smallint_nullable = IntegerField(null=True)
+    a_text = TextField()
+    a_text_nullable = TextField(null=True)
+    a_time = TimeField()
+    a_time_nullable = TimeField(null=True)
+    a_varchar = CharField()
+    a_varchar_nullable = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_bit_of_everything"
+        primary_key = False
+
+
+class AIndex(Model):
+    "AIndex represents a row from the a_index table"
+
+    a_key = IntegerField(null=True, index=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_index"
+        primary_key = False
+
+
+class AIndexComposite(Model):
+    "AIndexComposite represents a row from the a_index_composite table"
+
+    a_key1 = IntegerField(null=True)
+    a_key2 = IntegerField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_index_composite"
+        indexes = ((("a_key1", "a_key2"), False),)
+        primary_key = False
+
+
+class AManualTable(Model):
+    "AManualTable represents a row from the a_manual_table table"
+
+    a_text = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_manual_table"
+        primary_key = False
+
+
+class APrimary(Model):
+    "APrimary represents a row from the a_primary table"
+
+    a_key = AutoField()
+
+    class Meta:
+        database = _db
+        table_name = "a_primary"
+
+
+class AForeignKey(Model):
+    "AForeignKey represents a row from the a_foreign_key table"
+
+    a_key = ForeignKeyField(
+        null=True, column_name="a_key", model=APrimary, field="a_key"
+    )
+
+    class Meta:
+        database = _db
+        table_name = "a_foreign_key"
+        primary_key = False
+
+
+class APrimaryComposite(Model):
+    "APrimaryComposite represents a row from the a_primary_composite table"
+
+    a_key1 = IntegerField()
+    a_key2 = IntegerField()
+
+    class Meta:
+        database = _db
+        table_name = "a_primary_composite"
+        indexes = ((("a_key1", "a_key2"), True),)
+        primary_key = CompositeKey("a_key1', 'a_key2")
+
+
+class AForeignKeyComposite(Model):
+    "AForeignKeyComposite represents a row from the a_foreign_key_composite table"
+
+    a_key1 = ForeignKeyField(
+        null=True, column_name="a_key1", model=APrimaryComposite, field="a_key1"
+    )
+    a_key2 = ForeignKeyField(
+        null=True,
+        column_name="a_key2",
+        model=APrimaryComposite,
+        field="a_key2",
+        backref="a_primary_composite_a_key2_set",
+    )
+
+    class Meta:
+        database = _db
+        table_name = "a_foreign_key_composite"
+        primary_key = False
+
+
+class APrimaryMulti(Model):
+    "APrimaryMulti represents a row from the a_primary_multi table"
+
+    a_key = AutoField()
+    a_text = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_primary_multi"
+
+
+class ASequence(Model):
+    "ASequence represents a row from the a_sequence table"
+
+    a_seq = AutoField()
+
+    class Meta:
+        database = _db
+        table_name = "a_sequence"
+
+
+class ASequenceMulti(Model):
+    "ASequenceMulti represents a row from the a_sequence_multi table"
+
+    a_seq = AutoField()
+    a_text = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_sequence_multi"
+
+
+class AUniqueIndex(Model):
+    "AUniqueIndex represents a row from the a_unique_index table"
+
+    a_key = IntegerField(null=True, unique=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_unique_index"
+        primary_key = False
+
+
+class AUniqueIndexComposite(Model):
+    "AUniqueIndexComposite represents a row from the a_unique_index_composite table"
+
+    a_key1 = IntegerField(null=True)
+    a_key2 = IntegerField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_unique_index_composite"
+        indexes = ((("a_key1", "a_key2"), True),)
+        primary_key = False
+
+
+class AViewOfEverything(Model):
+    "AViewOfEverything represents a row from the a_view_of_everything table"
+
+    a_bigint = BigIntegerField(null=True)
+    a_bigint_nullable = BigIntegerField(null=True)
+    a_blob = BlobField(null=True)
+    a_blob_nullable = BlobField(null=True)
+    a_bool = BooleanField(null=True)
+    a_bool_nullable = BooleanField(null=True)
+    a_boolean = BooleanField(null=True)
+    a_boolean_nullable = BooleanField(null=True)
+    a_date = DateField(null=True)
+    a_date_nullable = DateField(null=True)
+    a_datetime = DateTimeField(null=True)
+    a_datetime_nullable = DateTimeField(null=True)
+    a_decimal = DecimalField(null=True)
+    a_decimal_nullable = DecimalField(null=True)
+    a_float = FloatField(null=True)
+    a_float_nullable = FloatField(null=True)
+    a_int = IntegerField(null=True)
+    a_int_nullable = IntegerField(null=True)
+    a_integer = IntegerField(null=True)
+    a_integer_nullable = IntegerField(null=True)
+    a_numeric = DecimalField(null=True)
+    a_numeric_nullable = DecimalField(null=True)
+    a_real = FloatField(null=True)
+    a_real_nullable = FloatField(null=True)
+    a_smallint = IntegerField(null=True)
+    a_smallint_nullable = IntegerField(null=True)
+    a_text = TextField(null=True)
+    a_text_nullable = TextField(null=True)
+    a_time = TimeField(null=True)
+    a_time_nullable = TimeField(null=True)
+    a_varchar = CharField(null=True)
+    a_varchar_nullable = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_view_of_everything"
+        primary_key = False
+
+
+class AViewOfEverythingSome(Model):
+    "AViewOfEverythingSome represents a row from the a_view_of_everything_some table"
+
+    a_bool = BooleanField(null=True)
+    a_text = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "a_view_of_everything_some"
+        primary_key = False
+
+
+class Migrations(Model):
+    "Migrations represents a row from the migrations table"
+
+    name = TextField(primary_key=True)
+    parent = TextField(null=True)
+    hash = TextField()
+    applied_at = TextField()
+    duration_ms = IntegerField(null=True)
+    statement_count = IntegerField(null=True)
+    pwizard_version = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations"
+
+
+class MigrationsState(Model):
+    "MigrationsState represents a row from the migrations_state table"
+
+    name = TextField(primary_key=True)
+    value = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations_state"
+
+
+class SqliteSequence(Model):
+    "SqliteSequence represents a row from the sqlite_sequence table"
+
+    name = BareField(null=True)
+    seq = BareField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "sqlite_sequence"
+        primary_key = False
+
+
+def connect(url: str, **connect_params) -> SqliteDatabase:
+    _db.init(url, **connect_params)
+    _db.connect()
+    return _db
@@ -0,0 +1,90 @@
+# pwizard fingerprint: 61864cf0687b61b7c4775594532ad0f5d90101401881d634171d67451c6ff852
+from peewee import (
+    SqliteDatabase,
+    CharField,
+    Model,
+    IntegerField,
+    AutoField,
+    TextField,
+    ForeignKeyField,
+    BareField,
+    DateTimeField,
+)
+
+_db = SqliteDatabase(None)
+
+
+class Authors(Model):
+    "Authors represents a row from the authors table"
+
+    author_id = AutoField()
+    name = CharField(constraints=[SQL("DEFAULT ''")], index=True)
+
+    class Meta:
+        database = _db
+        table_name = "authors"
+
+
+class Books(Model):
+    "Books represents a row from the books table"
+
+    book_id = AutoField()
+    author = ForeignKeyField(column_name="author_id", model=Authors, field="author_id")
+    isbn = CharField(constraints=[SQL("DEFAULT ''")], unique=True)
+    title = CharField(constraints=[SQL("DEFAULT ''")])
+    year = IntegerField(constraints=[SQL("DEFAULT 2000")])
+    available = DateTimeField(
+        constraints=[SQL("DEFAULT STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'NOW')")]
+    )
+    description = TextField(constraints=[SQL("DEFAULT ''")])
+    tags = TextField(constraints=[SQL("DEFAULT '{}'")])
+
+    class Meta:
+        database = _db
+        table_name = "books"
+        indexes = ((("title", "year"), False),)
+
+
+class Migrations(Model):
+    "Migrations represents a row from the migrations table"
+
+    name = TextField(primary_key=True)
+    parent = TextField(null=True)
+    hash = TextField()
+    applied_at = TextField()
+    duration_ms = IntegerField(null=True)
+    statement_count = IntegerField(null=True)
+    pwizard_version = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations"
+
+
+class MigrationsState(Model):
+    "MigrationsState represents a row from the migrations_state table"
+
+    name = TextField(primary_key=True)
+    value = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations_state"
+
+
+class SqliteSequence(Model):
+    "SqliteSequence represents a row from the sqlite_sequence table"
+
+    name = BareField(null=True)
+    seq = BareField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "sqlite_sequence"
+        primary_key = False
+
+
+def connect(url: str, **connect_params) -> SqliteDatabase:
+    _db.init(url, **connect_params)
+    _db.connect()
+    return _db
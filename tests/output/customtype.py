@@ -0,0 +1,50 @@
+# pwizard fingerprint: 0c48249ccc432ee6f66524a032f040c0a61b697816ef081a6207eacf8e197d43
+from peewee import TextField, Model, SqliteDatabase, IntegerField
+from playhouse.reflection import UnknownField
+
+_db = SqliteDatabase(None)
+
+
+class Custom(Model):
+    "Custom represents a row from the custom table"
+
+    name = UnknownField(primary_key=True)
+    favourite_colour = UnknownField()
+    status = UnknownField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "custom"
+
+
+class Migrations(Model):
+    "Migrations represents a row from the migrations table"
+
+    name = TextField(primary_key=True)
+    parent = TextField(null=True)
+    hash = TextField()
+    applied_at = TextField()
+    duration_ms = IntegerField(null=True)
+    statement_count = IntegerField(null=True)
+    pwizard_version = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations"
+
+
+class MigrationsState(Model):
+    "MigrationsState represents a row from the migrations_state table"
+
+    name = TextField(primary_key=True)
+    value = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations_state"
+
+
+def connect(url: str, **connect_params) -> SqliteDatabase:
+    _db.init(url, **connect_params)
+    _db.connect()
+    return _db
@@ -0,0 +1,297 @@
+# pwizard fingerprint: 111ac3a47799677a352f4115e3b0a9963d7f81a267d7df635ebe6c8c523f544c
+from peewee import (
+    CharField,
+    Model,
+    IntegerField,
+    BlobField,
+    FloatField,
+    CompositeKey,
+    ForeignKeyField,
+    AutoField,
+    DateField,
+    TextField,
+    SqliteDatabase,
+)
+
+_db = SqliteDatabase(None)
+
+
+class Categories(Model):
+    "Categories represents a row from the categories table"
+
+    category_id = AutoField()
+    category_name = CharField()
+    description = TextField(null=True)
+    picture = BlobField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "categories"
+
+
+class CustomerDemographics(Model):
+    "CustomerDemographics represents a row from the customer_demographics table"
+
+    customer_type_id = CharField(primary_key=True)
+    customer_desc = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "customer_demographics"
+
+
+class Customers(Model):
+    "Customers represents a row from the customers table"
+
+    customer_id = CharField(primary_key=True)
+    company_name = CharField()
+    contact_name = CharField(null=True)
+    contact_title = CharField(null=True)
+    address = CharField(null=True)
+    city = CharField(null=True)
+    region = CharField(null=True)
+    postal_code = CharField(null=True)
+    country = CharField(null=True)
+    phone = CharField(null=True)
+    fax = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "customers"
+
+
+class CustomerCustomerDemo(Model):
+    "CustomerCustomerDemo represents a row from the customer_customer_demo table"
+
+    customer = ForeignKeyField(
+        column_name="customer_id", model=Customers, field="customer_id"
+    )
+    customer_type = ForeignKeyField(
+        column_name="customer_type_id",
+        model=CustomerDemographics,
+        field="customer_type_id",
+    )
+
+    class Meta:
+        database = _db
+        table_name = "customer_customer_demo"
+        indexes = ((("customer", "customer_type"), True),)
+        primary_key = CompositeKey("customer', 'customer_type")
+
+
+class Employees(Model):
+    "Employees represents a row from the employees table"
+
+    employee_id = AutoField()
+    last_name = CharField()
+    first_name = CharField()
+    title = CharField(null=True)
+    title_of_courtesy = CharField(null=True)
+    birth_date = DateField(null=True)
+    hire_date = DateField(null=True)
+    address = CharField(null=True)
+    city = CharField(null=True)
+    region = CharField(null=True)
+    postal_code = CharField(null=True)
+    country = CharField(null=True)
+    home_phone = CharField(null=True)
+    extension = CharField(null=True)
+    photo = BlobField(null=True)
+    notes = TextField(null=True)
+    reports_to = ForeignKeyField(
+        null=True, column_name="reports_to", model="self", field="employee_id"
+    )
+    photo_path = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "employees"
+
+
+class Migrations(Model):
+    "Migrations represents a row from the migrations table"
+
+    name = TextField(primary_key=True)
+    parent = TextField(null=True)
+    hash = TextField()
+    applied_at = TextField()
+    duration_ms = IntegerField(null=True)
+    statement_count = IntegerField(null=True)
+    pwizard_version = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations"
+
+
+class MigrationsState(Model):
+    "MigrationsState represents a row from the migrations_state table"
+
+    name = TextField(primary_key=True)
+    value = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "migrations_state"
+
+
+class Region(Model):
+    "Region represents a row from the region table"
+
+    region_id = AutoField()
+    region_description = CharField()
+
+    class Meta:
+        database = _db
+        table_name = "region"
+
+
+class Shippers(Model):
+    "Shippers represents a row from the shippers table"
+
+    shipper_id = AutoField()
+    company_name = CharField()
+    phone = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "shippers"
+
+
+class Orders(Model):
+    "Orders represents a row from the orders table"
+
+    order_id = AutoField()
+    customer = ForeignKeyField(
+        null=True, column_name="customer_id", model=Customers, field="customer_id"
+    )
+    employee = ForeignKeyField(
+        null=True, column_name="employee_id", model=Employees, field="employee_id"
+    )
+    order_date = DateField(null=True)
+    required_date = DateField(null=True)
+    shipped_date = DateField(null=True)
+    ship_via = ForeignKeyField(
+        null=True, column_name="ship_via", model=Shippers, field="shipper_id"
+    )
+    freight = FloatField(null=True)
+    ship_name = CharField(null=True)
+    ship_address = CharField(null=True)
+    ship_city = CharField(null=True)
+    ship_region = CharField(null=True)
+    ship_postal_code = CharField(null=True)
+    ship_country = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "orders"
+
+
+class Suppliers(Model):
+    "Suppliers represents a row from the suppliers table"
+
+    supplier_id = AutoField()
+    company_name = CharField()
+    contact_name = CharField(null=True)
+    contact_title = CharField(null=True)
+    address = CharField(null=True)
+    city = CharField(null=True)
+    region = CharField(null=True)
+    postal_code = CharField(null=True)
+    country = CharField(null=True)
+    phone = CharField(null=True)
+    fax = CharField(null=True)
+    homepage = TextField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "suppliers"
+
+
+class Products(Model):
+    "Products represents a row from the products table"
+
+    product_id = AutoField()
+    product_name = CharField()
+    supplier = ForeignKeyField(
+        null=True, column_name="supplier_id", model=Suppliers, field="supplier_id"
+    )
+    category = ForeignKeyField(
+        null=True, column_name="category_id", model=Categories, field="category_id"
+    )
+    quantity_per_unit = CharField(null=True)
+    unit_price = FloatField(null=True)
+    units_in_stock = IntegerField(null=True)
+    units_on_order = IntegerField(null=True)
+    reorder_level = IntegerField(null=True)
+    discontinued = IntegerField()
+
+    class Meta:
+        database = _db
+        table_name = "products"
+
+
+class OrderDetails(Model):
+    "OrderDetails represents a row from the order_details table"
+
+    order = ForeignKeyField(column_name="order_id", model=Orders, field="order_id")
+    product = ForeignKeyField(
+        column_name="product_id", model=Products, field="product_id"
+    )
+    unit_price = FloatField()
+    quantity = IntegerField()
+    discount = FloatField()
+
+    class Meta:
+        database = _db
+        table_name = "order_details"
+        indexes = ((("order", "product"), True),)
+        primary_key = CompositeKey("order', 'product")
+
+
+class Territories(Model):
+    "Territories represents a row from the territories table"
+
+    territory_id = CharField(primary_key=True)
+    territory_description = CharField()
+    region = ForeignKeyField(column_name="region_id", model=Region, field="region_id")
+
+    class Meta:
+        database = _db
+        table_name = "territories"
+
+
+class EmployeeTerritories(Model):
+    "EmployeeTerritories represents a row from the employee_territories table"
+
+    employee = ForeignKeyField(
+        column_name="employee_id", model=Employees, field="employee_id"
+    )
+    territory = ForeignKeyField(
+        column_name="territory_id", model=Territories, field="territory_id"
+    )
+
+    class Meta:
+        database = _db
+        table_name = "employee_territories"
+        indexes = ((("employee", "territory"), True),)
+        primary_key = CompositeKey("employee', 'territory")
+
+
+class UsStates(Model):
+    "UsStates represents a row from the us_states table"
+
+    state_id = AutoField()
+    state_name = CharField(null=True)
+    state_abbr = CharField(null=True)
+    state_region = CharField(null=True)
+
+    class Meta:
+        database = _db
+        table_name = "us_states"
+
+
+def connect(url: str, **connect_params) -> SqliteDatabase:
+    _db.init(url, **connect_params)
+    _db.connect()
+    return _db
@@ -1,13 +1,20 @@
+from click.testing import CliRunner
 from enum import Enum, IntEnum
 from pathlib import Path
 from glob import glob
-from peewee import Field, SqliteDatabase, TextField
+from peewee import Field, ForeignKeyField, SqliteDatabase, TextField
 from pathlib import Path
 
 from pwizard.generate import Generator
+from pwizard.generate.cmd import generate_cmd
+from pwizard.generate.filters import TableFilter
+from pwizard.generate.introspect import BulkIntrospector
+from playhouse.reflection import Introspector
 from pwizard.migrate import Migrator
 from pwizard.migrate.migration import SQLMigration
 import importlib.util
+import pytest
+import re
 import sys
 
 dir = Path(__file__).parent
@@ -117,3 +124,263 @@ def test_custom_types(tmp_path: Path):
     )
     assert res.favourite_colour is Colour.Red
     assert res.status is Status.Active
+
+
+def test_bulk_introspection():
+    # the bulk introspector reads the same metadata as playhouse's
+    def describe(metadata):
+        columns = {
+            table: [
+                (col.name, col.field_class, col.get_field_parameters())
+                for col in cols.values()
+            ]
+            for table, cols in metadata.columns.items()
+        }
+        return (
+            columns,
+            metadata.primary_keys,
+            metadata.foreign_keys,
+            metadata.model_names,
+            metadata.indexes,
+        )
+
+    for schema in glob("*.sql", root_dir=schemas_dir):
+        database = SqliteDatabase(":memory:")
+        migrator = Migrator([SQLMigration(schemas_dir / schema)])
+        migrator.migrate(database)
+
+        for include_views in (False, True):
+            expected = Introspector.from_database(database).introspect(
+                include_views=include_views
+            )
+            actual = BulkIntrospector.from_database(database).introspect(
+                include_views=include_views
+            )
+            assert describe(actual) == describe(expected)
+
+
+def test_filtered_introspection(tmp_path: Path):
+    database = SqliteDatabase(":memory:")
+    migrator = Migrator([SQLMigration(schemas_dir / "northwind.sql")])
+    migrator.migrate(database)
+
+    # only the selected tables and those they reference are reflected
+    metadata = BulkIntrospector.from_database(database).introspect(
+        table_names=["order_details", "region"]
+    )
+    assert set(metadata.columns) == {
+        "order_details",
+        "region",
+        "orders",
+        "products",
+        "customers",
+        "employees",
+        "shippers",
+        "suppliers",
+        "categories",
+    }
+
+    generator = Generator(
+        tmp_path / "northwind.py",
+        include_tables=["products", "suppliers", "categories", "region"],
+        exclude_tables=["region"],
+    )
+    generator.generate(database)
+    output = (tmp_path / "northwind.py").read_text()
+    assert "class Products(" in output
+    assert "class Categories(" in output
+    assert "class Region(" not in output
+    assert "class Orders(" not in output
+
+    # a referenced table which is filtered out is still reflected, but
+    # cannot be left out of the output
+    generator = Generator(
+        tmp_path / "northwind.py",
+        include_tables=["products", "suppliers"],
+    )
+    with pytest.raises(RuntimeError, match="cannot exclude table 'categories'"):
+        generator.generate(database)
+
+
+def load_module(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    assert spec.loader is not None
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_reference_cycles(tmp_path: Path):
+    database = SqliteDatabase(":memory:")
+    database.execute_sql(
+        "CREATE TABLE author (id INTEGER PRIMARY KEY, "
+        "favourite_id INTEGER REFERENCES book(id))"
+    )
+    database.execute_sql(
+        "CREATE TABLE book (id INTEGER PRIMARY KEY, "
+        "author_id INTEGER REFERENCES author(id), "
+        "sequel_id INTEGER REFERENCES book(id))"
+    )
+    database.execute_sql(
+        "CREATE TABLE review (id INTEGER PRIMARY KEY, "
+        "book_id INTEGER REFERENCES book(id))"
+    )
+
+    # the cycle is broken by deferring the foreign key of the author
+    generator = Generator(tmp_path / "cycle.py")
+    generator.generate(database)
+    cycle = load_module("cycle", tmp_path / "cycle.py")
+    assert isinstance(cycle.Author.favourite, ForeignKeyField)
+    assert cycle.Author.favourite.rel_model is cycle.Book
+    assert cycle.Book.author.rel_model is cycle.Author
+    assert cycle.Book.sequel.rel_model is cycle.Book
+    assert cycle.Review.book.rel_model is cycle.Book
+
+
+def test_overlapping_cycles(tmp_path: Path):
+    # a chain of tables each referencing the previous one, where two
+    # references to later tables close overlapping cycles
+    database = SqliteDatabase(":memory:")
+    later = {3: 15, 10: 20}
+    for n in range(1, 21):
+        columns = ["id INTEGER PRIMARY KEY"]
+        if n > 1:
+            columns.append(f"prev_id INTEGER REFERENCES t{n - 1}(id)")
+        if n in later:
+            columns.append(f"next_id INTEGER REFERENCES t{later[n]}(id)")
+        database.execute_sql(f"CREATE TABLE t{n} ({', '.join(columns)})")
+
+    # only the references closing a cycle are deferred
+    generator = Generator(tmp_path / "cycles.py")
+    metadata = BulkIntrospector.from_database(database).introspect()
+    order, deferred = generator._order_tables(metadata)
+    assert deferred == {("t3", "next_id"), ("t10", "next_id")}
+    assert order == [f"t{n}" for n in range(1, 21)]
+
+
+def test_deep_references(tmp_path: Path):
+    # a chain of foreign keys deeper than the recursion limit
+    database = SqliteDatabase(":memory:")
+    depth = sys.getrecursionlimit() + 100
+    database.execute_sql("CREATE TABLE t0 (id INTEGER PRIMARY KEY)")
+    for n in range(1, depth):
+        database.execute_sql(
+            f"CREATE TABLE t{n} (id INTEGER PRIMARY KEY, "
+            f"parent_id INTEGER REFERENCES t{n - 1}(id))"
+        )
+
+    generator = Generator(tmp_path / "deep.py")
+    generator.generate(database)
+    output = (tmp_path / "deep.py").read_text()
+    assert output.index("class T0(") < output.index("class T1(")
+    assert output.index("class T1(") < output.index(f"class T{depth - 1}(")
+
+
+def test_table_filter():
+    table_filter = TableFilter(
+        ["users", re.compile(r"audit_\w+"), re.compile("(?i)LOG_.*"), "posts"],
+        [re.compile(r"audit_old_.*"), "posts"],
+    )
+    assert not table_filter.skip("users")
+    assert not table_filter.skip("audit_events")
+    assert not table_filter.skip("log_entries")
+    assert table_filter.skip("audit_old_events")
+    assert table_filter.skip("posts")
+    assert table_filter.skip("comments")
+
+    # the rule which decided each table is reported
+    decision = table_filter.decide("audit_events")
+    assert not decision.skipped
+    assert decision.rule == re.compile(r"audit_\w+")
+    assert str(decision) == r"included by /audit_\w+/ in include_tables"
+    decision = table_filter.decide("audit_old_events")
+    assert decision.skipped
+    assert str(decision) == "excluded by /audit_old_.*/ in exclude_tables"
+    decision = table_filter.decide("comments")
+    assert decision.skipped and decision.rule is None
+    assert str(TableFilter().decide("comments")) == "included as no filters are set"
+
+    # patterns naming their groups or referring to them are matched on
+    # their own, as their names would clash once joined
+    table_filter = TableFilter(
+        [
+            re.compile(r"(?P<prefix>audit)_\w+"),
+            re.compile(r"(?P<prefix>log)_\w+"),
+            re.compile(r"(<)?tmp(?(1)>)"),
+            re.compile(r"old_\w+"),
+        ]
+    )
+    assert len(table_filter.include.separate) == 3
+    assert not table_filter.skip("audit_events")
+    assert not table_filter.skip("log_entries")
+    assert not table_filter.skip("<tmp>")
+    assert not table_filter.skip("old_users")
+    assert table_filter.skip("users")
+
+
+def test_table_filter_config(tmp_path: Path):
+    database = SqliteDatabase(tmp_path / "filtered.db")
+    for table in [
+        "a_special_table",
+        "important_users",
+        "important_but_should_not_generate",
+        "other",
+    ]:
+        database.execute_sql(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY)")
+    database.close()
+
+    config = tmp_path / "pwizard.ini"
+    config.write_text(
+        "[db]\n"
+        "driver = sqlite\n"
+        "[models]\n"
+        "include_tables =\n"
+        "    a_special_table\n"
+        "    /important_.*/\n"
+        "exclude_tables =\n"
+        "    important_but_should_not_generate\n"
+        "[templates]\n"
+        "[output]\n"
+        f"output_path = {tmp_path / 'filtered.py'}\n"
+    )
+
+    # the slashes delimit patterns and are not part of them
+    generator = Generator.from_config(config)
+    assert generator.include_tables == ["a_special_table", re.compile("important_.*")]
+
+    result = CliRunner().invoke(
+        generate_cmd, ["--explain", str(config), f"sqlite:///{tmp_path}/filtered.db"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "a_special_table: included by a_special_table in include_tables",
+        "important_but_should_not_generate: excluded by"
+        " important_but_should_not_generate in exclude_tables",
+        "important_users: included by /important_.*/ in include_tables",
+        "other: skipped as it matches nothing in include_tables",
+    ]
+
+
+def test_incremental_generation(tmp_path: Path):
+    database = SqliteDatabase(":memory:")
+    migrator = Migrator([SQLMigration(schemas_dir / "booktest.sql")])
+    migrator.migrate(database)
+    output = tmp_path / "booktest.py"
+
+    # the output is only rewritten when the schema or options change
+    assert Generator(output).generate(database)
+    assert output.read_text().startswith("# pwizard fingerprint: ")
+    output.write_text(output.read_text() + "# edited\n")
+    assert not Generator(output).generate(database)
+    assert output.read_text().endswith("# edited\n")
+
+    assert Generator(output, snake_case=False).generate(database)
+    assert not output.read_text().endswith("# edited\n")
+    assert not Generator(output, snake_case=False).generate(database)
+    assert Generator(output, snake_case=False).generate(database, force=True)
+
+    database.execute_sql("CREATE TABLE extra (id INTEGER PRIMARY KEY)")
+    assert Generator(output, snake_case=False).generate(database)
+    assert "class Extra(" in output.read_text()
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import sqlparse
+
+from pwizard.migrate.scanner import ScanningSplitter
+from pwizard.migrate.splitter import Dialect, split_statements
+
+dir = Path(__file__).parent
+
+tricky_sql = """
+-- a comment; with a semicolon
+CREATE TABLE a (x TEXT DEFAULT 'it''s; here', y TEXT DEFAULT 'back\\\\'); -- trailing
+/* block; comment */ INSERT INTO a VALUES ("quoted;", `tick;`); # hash; comment
+CREATE FUNCTION f() RETURNS TEXT AS $body$ SELECT ';'; $body$ LANGUAGE sql;
+CREATE TRIGGER t AFTER INSERT ON a BEGIN
+    UPDATE a SET x = 'y';
+    DELETE FROM a;
+END;
+SELECT [odd;name] FROM a;
+SELECT 'unterminated; string
+"""
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def load_corpus() -> list[str]:
+    corpus = [tricky_sql]
+    for path in sorted((dir / "schemas").glob("*.sql")):
+        corpus.append(path.read_text())
+    for path in sorted(dir.glob("migrations_*/*.sql")):
+        corpus.append(path.read_text())
+    return corpus
+
+
+def test_split_statements_matches_sqlparse():
+    for text in load_corpus():
+        expected = sqlparse.split(text)
+        for size in (1, 7, 64, 1 << 16):
+            assert list(split_statements(chunked(text, size))) == expected
+
+
+def test_scanning_splitter_matches_sqlparse():
+    splitter = ScanningSplitter()
+    for text in load_corpus():
+        expected = sqlparse.split(text)
+        for size in (1, 7, 64, 1 << 16):
+            assert list(splitter.split(chunked(text, size))) == expected
+
+
+def test_scanning_splitter_dialects():
+    postgres = ScanningSplitter(Dialect.Postgresql)
+    sql = "SELECT E'it\\'s;'; /* a /* nested; */ comment; */ SELECT $a$;$A$;$a$;"
+    assert list(postgres.split(chunked(sql, 3))) == [
+        "SELECT E'it\\'s;';",
+        "/* a /* nested; */ comment; */ SELECT $a$;$A$;$a$;",
+    ]
+
+    mysql = ScanningSplitter(Dialect.MySQL)
+    sql = "SELECT 'it\\'s;'; #comment;\nSELECT 1--2;"
+    assert list(mysql.split(chunked(sql, 3))) == [
+        "SELECT 'it\\'s;'; #comment;",
+        "SELECT 1--2;",
+    ]
+
+
+def test_scanning_splitter_keywords_across_chunks():
+    # multi-word keywords are recognised when a chunk ends between or
+    # within their words
+    sql = (
+        "CREATE PROCEDURE p() BEGIN\n"
+        "    IF x THEN SELECT 1; END IF;\n"
+        "    LOOP SELECT 2; END LOOP;\n"
+        "    WHILE y DO SELECT 3; END WHILE;\n"
+        "END;\n"
+        "SELECT 4;"
+    )
+    expected = sqlparse.split(sql)
+    for dialect in Dialect:
+        splitter = ScanningSplitter(dialect)
+        for keyword in ("END IF", "END LOOP", "END WHILE"):
+            at = sql.index(keyword)
+            for cut in range(at, at + len(keyword) + 1):
+                chunks = [sql[:cut], sql[cut:]]
+                assert list(splitter.split(chunks)) == expected, (dialect, cut)
+                assert list(split_statements(chunks)) == expected, cut